@@ -0,0 +1,245 @@
+'''
+Bandwidth steering of many host pairs over the electrical and optical trunks.
+
+This module:
+- takes N traffic demands (src host, dst host, rate) and assigns each pair to one of the paths of
+  the topology between them (named paths of topology.json and the MAX_CANDIDATE_PATHS shortest
+  simple paths, registered in the topology as path_<i>), greedily, the demands with the fewest
+  paths and the largest first, on the path whose most loaded link stays the least utilized. A pair keeps its current
+  path unless another one is clearly better (HYSTERESIS), so a new demand does not move every flow
+- allocates the priorities: every reroute installs the new path one priority above the old one,
+  so the traffic moves as soon as the new rules are in the switches (make before break)
+- applies all the reroutes together: the new rules of all the pairs are posted concurrently, confirmed
+  on the switches all together (flow_verification.py), then all the old rules are deleted
+  concurrently. A pair whose new path is not confirmed keeps its old path.
+
+Links without a capacity in the topology file count as DEFAULT_CAPACITY. The rules of a path match both
+directions of the pair, so a demand loads its links whatever the direction.
+
+Usage (see ssh_flow_management.py):
+    demands = [Demand('vm1', 'vm4', 4e9), Demand('vm2', 'vm3', 6e9, paths=['long', 'long_backup'])]
+    bandwidth_steering.steer(demands, disabled_links=['ots_br2_br1', 'ots_br4_br3'])
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import threading
+import time
+from collections import namedtuple
+
+from flow_verification import FlowVerifier
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# bits per second of a link without capacity in the topology file
+DEFAULT_CAPACITY = 10e9
+# simple paths of a pair considered besides its named paths, shortest first
+MAX_CANDIDATE_PATHS = 8
+# a pair moves only if another path lowers its peak utilization by more than this
+HYSTERESIS = 0.05
+# priority of the first path of a pair, then +1 at every reroute
+PRIORITY_BASE = 10
+PRIORITY_MAX = 65535
+
+# traffic demand between two hosts, in bits per second. paths: names of the allowed paths, all by default
+Demand = namedtuple('Demand', ['src', 'dst', 'rate', 'paths'], defaults=(None,))
+
+# reroute of one pair. old_path and old_priority are None for a pair without flows yet
+SteeringChange = namedtuple('SteeringChange', ['src', 'dst', 'old_path', 'old_priority', 'new_path', 'new_priority'])
+
+
+class BandwidthSteering:
+    '''
+    Paths and priorities of the steered pairs, {(src, dst): (path name, priority)}
+        topology: topology.Topology
+        client: OfctlClient used to push the rules and read the flow tables
+        reconciler: FlowReconciler whose shadow is kept up to date
+        payload_function: builds the payload of one rule, same arguments as ofctl_flow_payload
+        verifier: FlowVerifier confirming the new paths, one on client by default
+    '''
+
+    def __init__(self, topology, client, reconciler, payload_function, verifier=None):
+        self.topology = topology
+        self.client = client
+        self.verifier = verifier if verifier is not None else FlowVerifier(client)
+        self.reconciler = reconciler
+        self.payload_function = payload_function
+        self.routes = {}
+        # candidate path names of every pair, {(src, dst): [path names]}
+        self.paths = {}
+        # utilization of every link after the last assignment, {link name: load / capacity}
+        self.utilization = {}
+        self.lock = threading.Lock()
+
+    def capacity(self, link_name):
+        capacity = self.topology.links[link_name].capacity
+        return capacity if capacity is not None else DEFAULT_CAPACITY
+
+    # take over pairs routed by someone else, [(src, dst, path name, priority)] as given to reconcile_flows.
+    # replace: forget the other pairs, their flows were removed
+    def adopt(self, routes, replace=False):
+        with self.lock:
+            if replace:
+                self.routes = {}
+            for src, dst, path_name, priority in routes:
+                self.routes[(src, dst)] = (path_name, priority)
+
+    # named paths and shortest simple paths between two hosts, each path once, computed once.
+    # the names of the topology file come before shortest and backup, which may be the same paths
+    def pair_paths(self, src, dst):
+        if (src, dst) not in self.paths:
+            for i, links in enumerate(self.topology.host_paths(src, dst, max_paths=MAX_CANDIDATE_PATHS)):
+                self.topology.add_route(src, dst, 'path_' + str(i), links)
+            routes = self.topology.routes[(src, dst)]
+            names, seen = [], set()
+            for name in sorted(routes, key=lambda name: name in ('shortest', 'backup') or name.startswith('path_')):
+                if tuple(routes[name]) not in seen:
+                    seen.add(tuple(routes[name]))
+                    names.append(name)
+            self.paths[(src, dst)] = names
+        return self.paths[(src, dst)]
+
+    # path names allowed for a demand, without the disabled links
+    def candidates(self, demand, disabled_links=()):
+        routes = self.topology.routes[(demand.src, demand.dst)]
+        names = demand.paths if demand.paths is not None else self.pair_paths(demand.src, demand.dst)
+        return [name for name in names if not set(routes[name]) & set(disabled_links)]
+
+    # path of every demand, {(src, dst): path name}. A demand that fits nowhere goes to its least
+    # loaded path, a demand without any path is left out
+    def assign(self, demands, disabled_links=(), hysteresis=HYSTERESIS):
+        pairs = [(demand.src, demand.dst) for demand in demands]
+        if len(set(pairs)) != len(pairs):
+            raise ValueError('several demands for the same pair of hosts')
+        load = {link_name: 0.0 for link_name in self.topology.links}
+        assignment = {}
+
+        # peak utilization of the links of a path once the demand is added, shorter paths break the ties
+        def score(demand, path_name):
+            links = self.topology.routes[(demand.src, demand.dst)][path_name]
+            return max((load[link] + demand.rate) / self.capacity(link) for link in links), len(links)
+
+        # the demands with the fewest paths first, then the largest ones
+        candidates = [self.candidates(demand, disabled_links) for demand in demands]
+        for i in sorted(range(len(demands)), key=lambda i: (len(candidates[i]), -demands[i].rate)):
+            demand, names = demands[i], candidates[i]
+            if not names:
+                print('no path available between ' + demand.src + ' and ' + demand.dst)
+                continue
+            best = min(names, key=lambda name: score(demand, name))
+            current = self.routes.get((demand.src, demand.dst), (None, None))[0]
+            if current in names and score(demand, current)[0] <= score(demand, best)[0] + hysteresis:
+                best = current
+            assignment[(demand.src, demand.dst)] = best
+            for link in self.topology.routes[(demand.src, demand.dst)][best]:
+                load[link] += demand.rate
+
+        self.utilization = {link: load[link] / self.capacity(link) for link in load}
+        for link, utilization in sorted(self.utilization.items()):
+            if utilization > 1:
+                print('link ' + link + ' oversubscribed: ' + '{:.0f}'.format(utilization * 100) + '%')
+        return assignment
+
+    # changes needed to go from the current routes to an assignment
+    def changes(self, assignment):
+        changes = []
+        with self.lock:
+            for (src, dst), path_name in sorted(assignment.items()):
+                old_path, old_priority = self.routes.get((src, dst), (None, None))
+                if old_path == path_name:
+                    continue
+                if old_priority is None:
+                    new_priority = PRIORITY_BASE
+                elif old_priority + 1 > PRIORITY_MAX:
+                    # out of priorities, this pair is moved break before make (see apply)
+                    new_priority = PRIORITY_BASE
+                else:
+                    new_priority = old_priority + 1
+                changes.append(SteeringChange(src, dst, old_path, old_priority, path_name, new_priority))
+        return changes
+
+    def rule_priorities(self, src, dst, path_name, priority):
+        return [(rule, priority) for rule in self.topology.rules(src, dst, path_name)]
+
+    def post(self, rule_priorities, action):
+        payloads = [self.payload_function(action=action, dpid=rule.dpid,
+                                          in_port=rule.in_port, out_port=rule.out_port,
+                                          ip_src=rule.ip_src, ip_dst=rule.ip_dst, priority=priority)
+                    for rule, priority in rule_priorities]
+        if action == 'ADD':
+            responses = self.client.add_flows(payloads)
+        else:
+            responses = self.client.delete_flows(payloads)
+        for (rule, priority), response in zip(rule_priorities, responses):
+            self.reconciler.record([rule], action, priority, [response])
+        return responses
+
+    # changes whose new rules are all in the flow tables, the rules of all the changes are verified together
+    def confirm(self, changes, timeout=1.0):
+        expected = [rp for change in changes
+                    for rp in self.rule_priorities(change.src, change.dst, change.new_path, change.new_priority)]
+        missing = set(self.verifier.wait(expected, timeout=timeout).missing)
+        return {change for change in changes
+                if not any(rp in missing
+                           for rp in self.rule_priorities(change.src, change.dst, change.new_path, change.new_priority))}
+
+    # apply the changes of all the pairs together, returns the duration in seconds of each phase
+    def apply(self, changes, confirm_timeout=1.0):
+        timing = {'install': 0.0, 'confirm': 0.0, 'remove': 0.0, 'total': 0.0, 'moved': 0, 'kept': 0}
+        if not changes:
+            return timing
+        start = time.monotonic()
+        # pairs out of priorities lose their old path first
+        wrapped = [change for change in changes
+                   if change.old_priority is not None and change.new_priority <= change.old_priority]
+        self.post([rp for change in wrapped
+                   for rp in self.rule_priorities(change.src, change.dst, change.old_path, change.old_priority)],
+                  'DELETE')
+
+        self.post([rp for change in changes
+                   for rp in self.rule_priorities(change.src, change.dst, change.new_path, change.new_priority)],
+                  'ADD')
+        installed = time.monotonic()
+        timing['install'] = installed - start
+
+        confirmed = self.confirm(changes, timeout=confirm_timeout)
+        checked = time.monotonic()
+        timing['confirm'] = checked - installed
+
+        # old rules of the confirmed pairs, the new rules of the other ones are withdrawn
+        self.post([rp for change in changes if change in confirmed and change not in wrapped
+                   and change.old_path is not None
+                   for rp in self.rule_priorities(change.src, change.dst, change.old_path, change.old_priority)]
+                  + [rp for change in changes if change not in confirmed and change not in wrapped
+                     for rp in self.rule_priorities(change.src, change.dst, change.new_path, change.new_priority)],
+                  'DELETE')
+        timing['remove'] = time.monotonic() - checked
+        timing['total'] = time.monotonic() - start
+
+        with self.lock:
+            for change in changes:
+                if change in confirmed:
+                    self.routes[(change.src, change.dst)] = (change.new_path, change.new_priority)
+                elif change in wrapped:
+                    # the old path is gone, the new rules are left in place
+                    self.routes[(change.src, change.dst)] = (change.new_path, change.new_priority)
+        timing['moved'] = len(confirmed)
+        timing['kept'] = len(changes) - len(confirmed)
+        return timing
+
+    # assign the demands to paths and apply the reroutes, returns (changes, timing)
+    def steer(self, demands, disabled_links=(), confirm_timeout=1.0):
+        changes = self.changes(self.assign(demands, disabled_links=disabled_links))
+        timing = self.apply(changes, confirm_timeout=confirm_timeout)
+        for change in changes:
+            print(change.src + '-' + change.dst + ': ' + str(change.old_path) + ' (' + str(change.old_priority)
+                  + ') -> ' + change.new_path + ' (' + str(change.new_priority) + ')')
+        print('steered ' + str(len(demands)) + ' demands: ' + str(timing['moved']) + ' moved, '
+              + str(timing['kept']) + ' not confirmed, total ' + '{:.2f}'.format(timing['total'] * 1e3) + ' ms')
+        return changes, timing
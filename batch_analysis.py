@@ -0,0 +1,227 @@
+'''
+Batch analysis of all the captures of the experiments.
+
+This script:
+- finds the pcap files by the name given by tcpdump_vm/tcpdump_command:
+  bw)endpoints)test_type)timestamp.pcap, e.g. ')vm2vm3)tx)dual_ost_v3)02_14_2022-10_00_00.pcap'
+- analyzes them with pcap_analysis.analyze_capture in a pool of processes, one capture per process
+- keeps the result of each capture in a JSON cache keyed on its path, size and modification time
+  (and the analysis parameters), so a new run only analyzes the new or modified captures
+- aggregates the results per test type and endpoints: mean and percentiles of the outage and of the
+  recovery time after each reconfiguration, throughput lost, retransmissions.
+
+The endpoints may contain ')' themselves (e.g. 'vm2vm3)tx'), so the name is split from both ends.
+
+Usage:
+    python batch_analysis.py /path/to/captures --reconfiguration 11.05 --output summary.json
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import datetime
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from pcap_analysis import analyze_capture, BIN_SIZE, GAP_THRESHOLD
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+CAPTURE_PATTERN = '*)*)*)*.pcap'
+TIMESTAMP_FORMAT = '%m_%d_%Y-%H_%M_%S'
+CACHE_FILE = 'pcap_analysis_cache.json'
+# reconfiguration times in seconds from the first packet of each capture, RECONFIGURATION_1 of main_3.py.
+# tcpdump starts slightly before the timeline, so this is an upper bound of the real offset
+RECONFIGURATIONS = (11.05,)
+PERCENTILES = (50, 95, 99)
+
+
+# fields of a capture name, None if the name does not follow the convention
+def parse_capture_filename(path):
+    name = os.path.basename(path)
+    if not name.endswith('.pcap'):
+        return None
+    parts = name[:-len('.pcap')].split(')')
+    if len(parts) < 4:
+        return None
+    try:
+        date = datetime.datetime.strptime(parts[-1], TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+    return {'bw': parts[0],
+            'endpoints': ')'.join(parts[1:-2]),
+            'test_type': parts[-2],
+            'date': date.isoformat()}
+
+
+# captures of the directory (and its subdirectories) following the naming convention, oldest first
+def find_captures(directory, test_types=None):
+    captures = []
+    for path in glob.glob(os.path.join(glob.escape(directory), '**', CAPTURE_PATTERN), recursive=True):
+        fields = parse_capture_filename(path)
+        if fields is None or (test_types and fields['test_type'] not in test_types):
+            continue
+        captures.append((fields['date'], path))
+    return [path for date, path in sorted(captures)]
+
+
+def cache_key(path, parameters):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'parameters': parameters}
+
+
+def load_cache(filename):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_cache(cache, filename):
+    # write to a temporary file first, a run interrupted while writing does not lose the cache
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(cache, f)
+    os.replace(filename + '.tmp', filename)
+
+
+# analysis of one capture, run in a worker process. The list of gaps is replaced by its length.
+def analyze_file(path, reconfigurations, bin_size, gap_threshold):
+    summary = analyze_capture(path, reconfigurations=reconfigurations, bin_size=bin_size,
+                              gap_threshold=gap_threshold)
+    summary['gaps'] = len(summary.get('gaps', []))
+    summary.update(parse_capture_filename(path))
+    return summary
+
+
+# results of all the captures, from the cache when the capture did not change.
+# returns {path: summary}
+def analyze_captures(paths, reconfigurations=RECONFIGURATIONS, bin_size=BIN_SIZE, gap_threshold=GAP_THRESHOLD,
+                     cache_file=CACHE_FILE, max_workers=None):
+    parameters = {'reconfigurations': list(reconfigurations), 'bin_size': bin_size, 'gap_threshold': gap_threshold}
+    cache = load_cache(cache_file)
+    results = {}
+    todo = []
+    for path in paths:
+        entry = cache.get(os.path.abspath(path))
+        if entry is not None and entry['key'] == cache_key(path, parameters):
+            results[path] = entry['summary']
+        else:
+            todo.append(path)
+    print(str(len(results)) + ' captures from the cache, ' + str(len(todo)) + ' to analyze')
+
+    if todo:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(analyze_file, path, tuple(reconfigurations), bin_size, gap_threshold): path
+                           for path in todo}
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        results[path] = future.result()
+                    except Exception as e:
+                        print('could not analyze ' + path + ': ' + repr(e))
+                        continue
+                    cache[os.path.abspath(path)] = {'key': cache_key(path, parameters), 'summary': results[path]}
+                    print('analyzed ' + path)
+        finally:
+            save_cache(cache, cache_file)
+    return results
+
+
+def describe(values):
+    values = np.array([value for value in values if value is not None], dtype=np.float64)
+    if not len(values):
+        return None
+    stats = {'n': int(len(values)), 'mean': float(np.mean(values)), 'std': float(np.std(values))}
+    for p in PERCENTILES:
+        stats['p' + str(p)] = float(np.percentile(values, p))
+    stats['max'] = float(np.max(values))
+    return stats
+
+
+# statistics per (test_type, endpoints) of the results {path: summary}
+def aggregate(results):
+    groups = {}
+    for summary in results.values():
+        groups.setdefault(summary['test_type'] + ' ' + summary['endpoints'], []).append(summary)
+
+    aggregated = {}
+    for group, summaries in sorted(groups.items()):
+        n_events = max([len(summary.get('reconfigurations', [])) for summary in summaries] + [0])
+        events = []
+        for i in range(n_events):
+            results_i = [summary['reconfigurations'][i] for summary in summaries
+                         if len(summary.get('reconfigurations', [])) > i]
+            events.append({'time': results_i[0]['time'],
+                           'outage': describe([result['outage'] for result in results_i]),
+                           'recovery_time': describe([result['recovery_time'] for result in results_i]),
+                           # bits not sent during the outage, at the throughput before the reconfiguration
+                           'throughput_loss_bits': describe([result['outage'] * result['baseline_bps']
+                                                             for result in results_i
+                                                             if result['outage'] is not None])})
+        aggregated[group] = {'captures': len(summaries),
+                             'mean_bps': describe([summary.get('mean_bps') for summary in summaries]),
+                             'retransmissions': describe([summary.get('retransmissions') for summary in summaries]),
+                             'max_gap': describe([summary.get('max_gap') for summary in summaries]),
+                             'reconfigurations': events}
+    return aggregated
+
+
+def print_aggregate(aggregated):
+    for group, stats in aggregated.items():
+        print(group + ': ' + str(stats['captures']) + ' captures')
+        if stats['mean_bps'] is not None:
+            print('  throughput mean ' + '{:.3g}'.format(stats['mean_bps']['mean']) + ' bits/s'
+                  + ', retransmissions mean ' + '{:.1f}'.format(stats['retransmissions']['mean']))
+        for event in stats['reconfigurations']:
+            line = '  reconfiguration at ' + '{:.3f}'.format(event['time']) + ' s: '
+            if event['outage'] is None:
+                print(line + 'no traffic around it')
+                continue
+            outage = event['outage']
+            line += 'outage mean ' + '{:.1f}'.format(outage['mean'] * 1e3) + ' ms' \
+                    + ', p50 ' + '{:.1f}'.format(outage['p50'] * 1e3) + ' ms' \
+                    + ', p95 ' + '{:.1f}'.format(outage['p95'] * 1e3) + ' ms'
+            if event['recovery_time'] is not None:
+                line += ', recovery mean ' + '{:.1f}'.format(event['recovery_time']['mean'] * 1e3) + ' ms'
+            if event['throughput_loss_bits'] is not None:
+                line += ', loss mean ' + '{:.3g}'.format(event['throughput_loss_bits']['mean'] / 8) + ' bytes'
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analyze all the experiment captures of a directory')
+    parser.add_argument('directory', help='directory with the pcap files')
+    parser.add_argument('--test-types', nargs='*', default=None, help='only these test types')
+    parser.add_argument('--reconfiguration', type=float, nargs='*', default=list(RECONFIGURATIONS),
+                        help='reconfiguration times, in seconds from the first packet of each capture')
+    parser.add_argument('--bin', type=float, default=BIN_SIZE, help='throughput bin, in seconds')
+    parser.add_argument('--gap', type=float, default=GAP_THRESHOLD, help='minimum gap, in seconds')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, one per CPU by default')
+    parser.add_argument('--cache', default=None, help='cache file, ' + CACHE_FILE + ' in the directory by default')
+    parser.add_argument('--output', default='', help='JSON file for the aggregated statistics')
+    args = parser.parse_args()
+
+    paths = find_captures(args.directory, test_types=args.test_types)
+    results = analyze_captures(paths,
+                               reconfigurations=args.reconfiguration,
+                               bin_size=args.bin,
+                               gap_threshold=args.gap,
+                               cache_file=args.cache if args.cache else os.path.join(args.directory, CACHE_FILE),
+                               max_workers=args.workers)
+    aggregated = aggregate(results)
+    print_aggregate(aggregated)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(aggregated, f, indent=2)
+        print('statistics written to ' + args.output)
@@ -0,0 +1,198 @@
+'''
+Synchronized start of the commands of the experiment (tcpdump, iperf) on several VMs.
+
+Commands sent one VM after the other start with the SSH latency of each VM between them, so the
+reconfiguration, timed from the start of the experiment on this side, does not happen at the same
+offset for all the endpoints. This module:
+- measures the offset of the clock of every VM from the local clock over the SSH sessions already open
+  (VMSessionManager): a remote loop answers each line written to its stdin with `date +%s.%N`, the
+  offset is the remote time minus the middle of the round trip, from the exchange with the shortest
+  round trip (its error is at most half this round trip)
+- chooses a shared start a margin ahead (longer than the time to send the commands) and wraps every
+  command in a wait-until: the VM sleeps until the start converted to its own clock, then prints a
+  marker with its time on stderr and runs the command
+- reads the markers back and reports the residual skew, the actual start of each command minus the
+  shared start, on the local clock.
+
+Usage:
+    clock = SynchronizedStart(sessions)
+    clock.measure()
+    t0 = clock.schedule()
+    clock.run({'2': tcpdump_cmd}, delay=-CAPTURE_LEAD, label='tcpdump')
+    clock.run({'2': iperf_cmd}, label='iperf')
+    scheduler.start(t0=t0)
+    ...
+    clock.print_skew(clock.skew())
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import time
+from collections import namedtuple
+
+import gevent
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# round trips of the clock measurement, the one with the shortest round trip is kept
+SYNC_SAMPLES = 8
+# seconds between the choice of the shared start and the start, the commands must reach the VMs before it
+START_MARGIN = 0.3
+# seconds the captures start before the shared start, tcpdump needs a few ms to open the interface
+CAPTURE_LEAD = 0.1
+# seconds given to the clock measurement and to the markers
+SYNC_TIMEOUT = 5
+# first word of the line printed on stderr by a command when it starts
+START_MARKER = 'sync_start'
+
+# offset: clock of the VM minus the local clock (time.time()), rtt: round trip of the sample kept, in seconds
+ClockOffset = namedtuple('ClockOffset', ['vm_id', 'offset', 'rtt'])
+
+
+# remote loop answering every line of stdin with the time of the VM, samples lines. It is stopped after
+# timeout seconds, so a measurement that did not finish does not leave it waiting on stdin (wait_pending
+# would wait for it forever)
+def clock_command(samples=SYNC_SAMPLES, timeout=SYNC_TIMEOUT):
+    return ('timeout ' + str(timeout) + ' sh -c \'i=0; while [ $i -lt ' + str(samples)
+            + ' ] && read -r line; do date +%s.%N; i=$((i+1)); done\'')
+
+
+# command started when the clock of the VM reaches target (seconds since the epoch on the VM clock).
+# the command is run by the same shell after the wait
+def wait_until_command(command, target):
+    return ('d=$(awk -v t=' + '{:.6f}'.format(target) + ' -v n="$(date +%s.%N)" '
+            + '\'BEGIN { d = t - n; printf "%.6f", (d > 0 ? d : 0) }\'); sleep "$d"; '
+            + 'echo ' + START_MARKER + ' "$(date +%s.%N)" >&2; ' + command)
+
+
+# clock offset of the VMs, {vm_id: ClockOffset}. The VMs that did not answer in time are left out
+def measure_offsets(sessions, vm_ids=None, samples=SYNC_SAMPLES, timeout=SYNC_TIMEOUT):
+    results = sessions.run(clock_command(samples, timeout), vm_ids=vm_ids, wait=False)
+    offsets = {}
+
+    def exchange(vm_id, output):
+        lines = output.stdout
+        best = None
+        for i in range(samples):
+            sent = time.time()
+            output.stdin.write('\n')
+            output.stdin.flush()
+            line = next(lines, None)
+            received = time.time()
+            # the remote loop ended (timeout) before the last sample
+            if line is None:
+                return
+            remote = float(line)
+            if best is None or received - sent < best[1]:
+                best = (remote - (sent + received) / 2, received - sent)
+        offsets[vm_id] = ClockOffset(vm_id, best[0], best[1])
+
+    greenlets = [gevent.spawn(exchange, vm_id, result['output'])
+                 for vm_id, result in results.items() if result['exception'] is None]
+    gevent.joinall(greenlets, timeout=timeout)
+    gevent.killall([greenlet for greenlet in greenlets if not greenlet.ready()])
+    for vm_id in results:
+        if vm_id not in offsets:
+            print('no clock offset for vm' + vm_id + ', its commands start on the local clock')
+    return offsets
+
+
+def print_offsets(offsets):
+    for vm_id, clock_offset in sorted(offsets.items()):
+        print('clock of vm' + vm_id + ': ' + '{:+.3f}'.format(clock_offset.offset * 1e3) + ' ms (+/- '
+              + '{:.3f}'.format(clock_offset.rtt / 2 * 1e3) + ' ms)')
+
+
+class SynchronizedStart:
+    '''
+    Start of the commands of a run at a shared instant on all the VMs.
+        sessions: connected VMSessionManager
+        samples: round trips of the clock measurement of each VM
+        margin: seconds between schedule() and the shared start
+    offsets is {vm_id: ClockOffset}, started {(label, vm_id): (target, HostOutput)} the commands of the
+    current run with their start on the local clock (time.time()).
+    '''
+
+    def __init__(self, sessions, samples=SYNC_SAMPLES, margin=START_MARGIN):
+        self.sessions = sessions
+        self.samples = samples
+        self.margin = margin
+        self.offsets = {}
+        self.start_wall = None
+        self.start_monotonic = None
+        self.started = {}
+
+    # measure the clock offsets of the VMs (all of them by default), e.g. before every run
+    def measure(self, vm_ids=None):
+        start = time.monotonic()
+        self.offsets.update(measure_offsets(self.sessions, vm_ids=vm_ids, samples=self.samples))
+        print('measured vm clocks in ' + '{:.1f}'.format((time.monotonic() - start) * 1e3) + ' ms')
+        return self.offsets
+
+    # choose the shared start, margin seconds from now. returns it in time.monotonic() seconds, e.g. for
+    # the t0 of the experiment and of the scheduler
+    def schedule(self, margin=None):
+        margin = self.margin if margin is None else margin
+        self.start_wall = time.time() + margin
+        self.start_monotonic = time.monotonic() + margin
+        self.started = {}
+        return self.start_monotonic
+
+    # run commands {vm_id: command} delay seconds after the shared start (negative to start before it)
+    def run(self, commands, delay=0.0, label='command'):
+        target = self.start_wall + delay
+        wrapped = {}
+        for vm_id, command in commands.items():
+            offset = self.offsets[vm_id].offset if vm_id in self.offsets else 0.0
+            wrapped[vm_id] = wait_until_command(command, target + offset)
+        results = self.sessions.run(wrapped, wait=False)
+        for vm_id, result in results.items():
+            if result['exception'] is None:
+                self.started[(label, vm_id)] = (target, result['output'])
+        late = time.time() - target
+        if late > 0:
+            print(label + ' commands sent ' + '{:.1f}'.format(late * 1e3) + ' ms after their start, '
+                  + 'the start margin (' + str(self.margin) + ' s) is too short')
+        return results
+
+    # actual start of the commands of the run minus their target, on the local clock, from the markers
+    # printed by the VMs: {(label, vm_id): seconds}. The commands without marker are left out
+    def skew(self, timeout=SYNC_TIMEOUT):
+        skews = {}
+
+        def read_marker(key, target, output):
+            for line in output.stderr:
+                words = line.strip().split()
+                if len(words) == 2 and words[0] == START_MARKER:
+                    offset = self.offsets[key[1]].offset if key[1] in self.offsets else 0.0
+                    skews[key] = float(words[1]) - offset - target
+                    return
+
+        greenlets = [gevent.spawn(read_marker, key, target, output)
+                     for key, (target, output) in self.started.items()]
+        gevent.joinall(greenlets, timeout=timeout)
+        gevent.killall([greenlet for greenlet in greenlets if not greenlet.ready()])
+        return skews
+
+    # time.monotonic() of the actual start of a command, from its skew
+    def started_at(self, key, skews):
+        target = self.started[key][0]
+        return self.start_monotonic + (target - self.start_wall) + skews[key]
+
+    # skew of each command and spread of the starts, with the uncertainty of the clock offsets
+    def print_skew(self, skews):
+        for (label, vm_id), skew in sorted(skews.items()):
+            print(label + ' vm' + vm_id + ' started ' + '{:+.3f}'.format(skew * 1e3) + ' ms from its start')
+        missing = [label + ' vm' + vm_id for label, vm_id in self.started if (label, vm_id) not in skews]
+        if missing:
+            print('no start marker from ' + ', '.join(sorted(missing)))
+        if skews:
+            uncertainty = max([self.offsets[vm_id].rtt / 2 for label, vm_id in skews if vm_id in self.offsets] or [0.0])
+            print('residual skew: ' + '{:.3f}'.format((max(skews.values()) - min(skews.values())) * 1e3)
+                  + ' ms between the commands (clock uncertainty +/- ' + '{:.3f}'.format(uncertainty * 1e3) + ' ms)')
@@ -0,0 +1,428 @@
+'''
+Experiment engine driven by a scenario file, in place of a new main script per experiment.
+main.py, main_2.py and main_3.py are thin wrappers around it (scenario_main.json, scenario_main_2.json).
+
+This script:
+- reads a scenario (JSON): test type, host pairs with their initial path, priority, iperf bandwidth and
+  capture, the timeline of reconfiguration actions, the number of repetitions, see scenario_single_mbb.json
+- keeps the connections warm for all the repetitions: the SSH sessions (VMSessionManager), the
+  keep-alive connection with the controller and the TCP connection with the optical switch
+- runs every repetition through the same phases:
+    prepare   bring the flow tables to the initial paths, reset the optical switch, build the scheduler
+    traffic   start tcpdump and iperf at the same instant on all the VMs (clock_sync.py), then the
+              timeline of actions (TimelineScheduler) from that instant
+    drain     wait for the end of iperf (instead of a fixed sleep of IPERF_TIME+5) and stop tcpdump
+    finish    save the timeline and the telemetry, summarize the captures on the VMs
+- overlaps the finish of a run with the prepare of the next one: the controller and the optical
+  switch are set up in a thread while the captures of the previous run are summarized over SSH.
+
+timeline actions: {"at": seconds from the start, "action": name in ACTIONS, "args": [...], "name": label}
+    transition_path     ["vm2-vm3", "long_backup"]          make before break of a path ID (flow_index.py)
+    install_path        ["id", "vm1", "vm4", "trunk2"]      install a path, priority allocated
+    delete_path         ["id"]
+    edit_route_flows    ["vm2", "vm3", "long", "ADD", 4]    add or delete a path with a given priority
+    ots_connect         [[22, 23], [55, 54]]                connect the ports of the optical switch
+    ots_disconnect      []
+    steer               [["vm1", "vm4", 4e9], ...]           bandwidth steering of the demands
+The path ID of a pair of the scenario is '<src>-<dst>' (see reconcile_flows). "layers": [["trunk2", 7], ...] of a
+flow are other paths or priorities installed with it, e.g. the lower priority paths of a make before break that
+deletes the flows of the initial path. The hosts, paths and bridges are
+the ones of the topology file of credentials.json. "bridges": ["br2", "br3"] limits the flow tables reconciled
+and sampled to these bridges (experiment_sweep.py runs scenarios on disjoint bridges at the same time).
+
+"plan": {"mode": "atomic", "measure": ["vm2", "vm3", "long_backup"]} times the handoffs from the measured latencies
+(reconfiguration_planner.py) instead of their "at": the actions with "handoff": 1 or 2 start at the first or second
+handoff of the plan, dt later with "after_dt": true (the delete of a legacy handoff), around the first OTS action.
+The latencies of every run are added to the profile and the plan is updated for the next run.
+
+Usage:
+    python experiment_runner.py scenario_single_mbb.json
+    python experiment_runner.py scenario_dual_ots.json --repetitions 2
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import json
+import threading
+import time
+
+from ssh_flow_management import *
+from timeline_scheduler import TimelineAction, TimelineScheduler
+from vm_sessions import VMSessionManager
+from ots_client import OtsClient, OtsCommand
+from iperf_stream import IperfStreamCollector
+from experiment_timeline import ExperimentTimeline, timeline_filename
+from flow_telemetry import FlowTelemetry, telemetry_filename
+from clock_sync import SynchronizedStart, CAPTURE_LEAD, START_MARGIN
+from pcap_remote_summary import collect_summaries
+from pcap_analysis import analyze_summary, print_summary
+from reconfiguration_planner import MODES, LatencyProfile, measure_profile, plan_reconfiguration, print_plan
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# values of the scenario when not given in the file
+SCENARIO_DEFAULTS = {'repetitions': 1,
+                     'iperf_time': 20,
+                     'iperf_interval': 0.1,
+                     'iperf_json_stream': True,
+                     # seconds given to iperf to finish after iperf_time, then the run goes on
+                     'iperf_grace': 5,
+                     # seconds of traffic still captured after the end of iperf
+                     'drain_time': 0.5,
+                     'capture': True,
+                     'capture_size': 96,
+                     'vm_nic': 'enp2s0',
+                     # opt-in, summarize the captures on the VMs and pull back only the summaries
+                     'remote_summary': False,
+                     # off by default, the polling of the counters loads the controller during the handoffs
+                     'telemetry': False,
+                     'telemetry_interval': 0.05,
+                     # tcpdump and the iperf clients start at the same instant on all the VMs (clock_sync.py),
+                     # start_margin seconds after the shared start is chosen. Opt-in, by default the commands
+                     # are sent one VM after the other
+                     'synchronized_start': False,
+                     'start_margin': START_MARGIN,
+                     # ports of the optical switch connected before every run, [[in], [out]]
+                     'ots_before': None,
+                     'output_directory': '',
+                     # bridges of the topology owned by the scenario, all of them when None. The flow tables of the
+                     # other bridges are left alone, so that experiments on disjoint bridges can run together
+                     'bridges': None,
+                     'flows': [],
+                     'timeline': [],
+                     # handoffs timed by the reconfiguration planner, see PLAN_DEFAULTS
+                     'plan': None}
+
+# tcpdump directory on the VMs, as in main_3.py
+CAPTURE_DIRECTORY = credentials.get('tcpdump_file_datapath', TCP_TEST_DIRECTORY)
+
+# flow of the scenario: src and dst hosts, initial path and priority, iperf bandwidth (iperf3 -b, '' is unlimited),
+# iperf and capture on the client
+FLOW_DEFAULTS = {'bandwidth': '', 'iperf': True, 'capture': True, 'layers': []}
+
+# plan of the scenario: handoff mode (atomic or legacy), latency profile file, measurements of the profile when it is
+# empty, path installed and deleted to measure the install and delete latencies ([src, dst, path name])
+PLAN_DEFAULTS = {'mode': 'atomic', 'profile': 'latency_profile.json', 'repeats': 20, 'measure': None}
+
+# TimelineAction names available in the scenarios, the OTS actions are bound to the runner
+ACTIONS = {'transition_path': transition_path,
+           'install_path': install_path,
+           'delete_path': delete_path,
+           'edit_route_flows': edit_route_flows,
+           'steer': lambda demands: bandwidth_steering.steer([Demand(*demand) for demand in demands])}
+OTS_ACTIONS = ('ots_connect', 'ots_disconnect')
+
+
+# id of a host in vm_credentials, e.g. 'vm2' -> '2'
+def vm_id(host):
+    return host[2:] if host.startswith('vm') else host
+
+
+def load_scenario(filename):
+    with open(filename) as f:
+        return check_scenario(json.load(f), name=filename)
+
+
+# scenario with the default values, e.g. built by a main script. name is the one in the errors
+def check_scenario(scenario, name='scenario'):
+    scenario = dict(SCENARIO_DEFAULTS, **scenario)
+    if 'test_type' not in scenario:
+        raise ValueError(name + ': the scenario has no test_type')
+    scenario['flows'] = [dict(FLOW_DEFAULTS, **flow) for flow in scenario['flows']]
+    for flow in scenario['flows']:
+        for field in ('src', 'dst', 'path', 'priority'):
+            if field not in flow:
+                raise ValueError(name + ': flow ' + json.dumps(flow) + ' has no ' + field)
+    for action in scenario['timeline']:
+        if action.get('action') not in ACTIONS and action.get('action') not in OTS_ACTIONS:
+            raise ValueError(name + ': unknown action ' + str(action.get('action')))
+        if 'at' not in action:
+            raise ValueError(name + ': action ' + action['action'] + ' has no time (at)')
+    for bridge in scenario['bridges'] or []:
+        if bridge not in TOPOLOGY.bridges:
+            raise ValueError(name + ': unknown bridge ' + bridge)
+    if scenario['plan'] is not None:
+        scenario['plan'] = dict(PLAN_DEFAULTS, **scenario['plan'])
+        if scenario['plan']['mode'] not in MODES:
+            raise ValueError(name + ': unknown plan mode ' + str(scenario['plan']['mode']))
+        if scenario['plan']['measure'] is None or scenario['ots_before'] is None:
+            raise ValueError(name + ': the plan needs a path to measure (measure) and the OTS ports (ots_before)')
+        if reconfiguration_time(scenario) is None:
+            raise ValueError(name + ': the plan needs an ots_connect action in the timeline')
+    return scenario
+
+
+# time of the optical reconfiguration, the first ots_connect of the timeline
+def reconfiguration_time(scenario):
+    times = [action['at'] for action in scenario['timeline'] if action['action'] == 'ots_connect']
+    return min(times) if times else None
+
+
+# paths installed at the start of every run [(src, dst, path name, priority)]. The layers of a flow come first,
+# so the path ID '<src>-<dst>' is registered with the path of the flow itself (reconcile_flows)
+def initial_routes(scenario):
+    return [(flow['src'], flow['dst'], path_name, priority)
+            for flow in scenario['flows']
+            for path_name, priority in flow['layers'] + [[flow['path'], flow['priority']]]]
+
+
+class ExperimentRunner:
+    '''
+    Runs the repetitions of a scenario with the same connections.
+        scenario: dict returned by load_scenario
+        sessions, ots: already connected VMSessionManager and OtsClient, created from credentials.json otherwise
+    '''
+
+    def __init__(self, scenario, sessions=None, ots=None):
+        self.scenario = scenario
+        self.sessions = sessions
+        self.ots = ots
+        self.telemetry = None
+        self.clock = None
+        self.profile = None
+        self.plan = None
+        # seconds spent in each phase of every run, [{phase: seconds}]
+        self.phases = []
+
+    # dpids of the bridges of the scenario
+    def dpids(self):
+        bridges = self.scenario['bridges'] if self.scenario['bridges'] is not None else TOPOLOGY.bridges
+        return [TOPOLOGY.bridges[bridge] for bridge in bridges]
+
+    def uses_ots(self):
+        return self.scenario['ots_before'] is not None \
+            or any(action['action'] in OTS_ACTIONS for action in self.scenario['timeline'])
+
+    # open all the connections once, before the first run
+    def connect(self):
+        if self.sessions is None:
+            self.sessions = VMSessionManager(gateway_credentials=gateway_credentials, vm_credentials=vm_credentials)
+            self.sessions.connect()
+        if self.ots is None and self.uses_ots():
+            self.ots = OtsClient(ip=credentials['ip_ots'], port=credentials['port_ots'])
+        flow_client.warm_up()
+        if self.scenario['synchronized_start']:
+            self.clock = SynchronizedStart(self.sessions, margin=self.scenario['start_margin'])
+        if self.scenario['telemetry']:
+            self.telemetry = FlowTelemetry(telemetry_client, dpids=self.dpids(),
+                                           interval=self.scenario['telemetry_interval'])
+            for flow in self.scenario['flows']:
+                pair = (flow['src'], flow['dst'])
+                for path_name in TOPOLOGY.named_paths.get(pair) or TOPOLOGY.path_names(*pair):
+                    self.telemetry.watch_path(flow['src'] + '-' + flow['dst'] + ' ' + path_name,
+                                              TOPOLOGY.rules(flow['src'], flow['dst'], path_name))
+        if self.scenario['plan'] is not None:
+            self.measure_plan()
+
+    # latency profile of the plan, measured when the profile file is empty, and the plan of the first run
+    def measure_plan(self):
+        plan, ots_before = self.scenario['plan'], self.scenario['ots_before']
+        self.profile = LatencyProfile.load(plan['profile'])
+        if not self.profile.ready():
+            start = time.monotonic()
+            measure_profile(lambda: measure_route_install(*plan['measure'], priority=1),
+                            lambda: self.ots.connect_port(ots_before[0], ots_before[1]),
+                            repeats=plan['repeats'], profile=self.profile)
+            self.profile.save(plan['profile'])
+            print('measured the reconfiguration latencies in ' + '{:.2f}'.format(time.monotonic() - start) + ' s')
+        self.replan()
+
+    # plan of the next run from the profile, with the latencies of the actions of the last run
+    def replan(self, actions=()):
+        plan = self.scenario['plan']
+        if actions:
+            self.profile.add_actions(actions)
+            self.profile.save(plan['profile'])
+        self.plan = plan_reconfiguration(self.profile, reconfiguration_time(self.scenario), mode=plan['mode'])
+        print_plan(self.plan)
+
+    # start of an action of the timeline, from the plan for the handoffs
+    def action_time(self, action):
+        if self.plan is None or action.get('handoff') not in (1, 2):
+            return action['at']
+        at = self.plan.handoff_1 if action['handoff'] == 1 else self.plan.handoff_2
+        return at + self.plan.dt if action.get('after_dt') else at
+
+    def action_function(self, name):
+        if name == 'ots_connect':
+            return self.ots.connect_port
+        if name == 'ots_disconnect':
+            return self.ots.disconnect_all
+        return ACTIONS[name]
+
+    # flow tables, optical switch and scheduler of a run. Only talks to the controller and the
+    # optical switch, so it can run while the previous run is finished over SSH
+    def prepare(self):
+        start = time.monotonic()
+        run = {'experiment': ExperimentTimeline()}
+        flow_client.on_request = run['experiment'].record_rtt
+        reconcile_flows(initial_routes(self.scenario), dpids=self.dpids())
+        if self.scenario['ots_before'] is not None:
+            ots_before = self.scenario['ots_before']
+            if not self.ots.connect_port(port_in=ots_before[0], port_out=ots_before[1]).wait():
+                print('no reply from the optical switch')
+        run['scheduler'] = TimelineScheduler([TimelineAction(self.action_time(action),
+                                                             self.action_function(action['action']),
+                                                             args=tuple(action.get('args', ())),
+                                                             name=action.get('name', action['action']))
+                                              for action in self.scenario['timeline']])
+        run['phases'] = {'prepare': time.monotonic() - start}
+        return run
+
+    # tcpdump and iperf on the VMs, then the timeline, returns once the timeline is done
+    def traffic(self, run):
+        start = time.monotonic()
+        scenario = self.scenario
+        run['captures'] = {}
+        if self.clock is not None:
+            self.clock.measure(vm_ids=sorted({vm_id(flow[end]) for flow in scenario['flows'] for end in ('src', 'dst')}))
+            t0 = self.clock.schedule()
+        if scenario['capture']:
+            commands = {}
+            for flow in scenario['flows']:
+                if flow['capture']:
+                    command, capture = tcpdump_command(endpoints=flow['src'] + flow['dst'] + ')tx',
+                                                       test_type=scenario['test_type'],
+                                                       t=scenario['iperf_time'] + scenario['iperf_grace'],
+                                                       directory=CAPTURE_DIRECTORY,
+                                                       bw=flow['bandwidth'],
+                                                       vm_nic=scenario['vm_nic'],
+                                                       capture_size=scenario['capture_size'])
+                    commands[vm_id(flow['src'])] = background_capture_command(command, capture)
+                    run['captures'][vm_id(flow['src'])] = capture
+            if self.clock is not None:
+                self.clock.run(commands, delay=-CAPTURE_LEAD, label='tcpdump')
+            else:
+                self.sessions.run(commands, wait=False)
+
+        servers = {vm_id(flow['dst']): iperf_s_command() for flow in scenario['flows'] if flow['iperf']}
+        clients = {vm_id(flow['src']): iperf_stream_command(t=scenario['iperf_time'], b=flow['bandwidth'],
+                                                            ip_s=TOPOLOGY.ip(flow['dst']),
+                                                            interval=scenario['iperf_interval'],
+                                                            json_stream=scenario['iperf_json_stream'])
+                   for flow in scenario['flows'] if flow['iperf']}
+        experiment = run['experiment']
+        experiment.mark('iperf start')
+        self.sessions.run(servers, wait=False)
+        if self.clock is not None:
+            results = self.clock.run(clients, label='iperf')
+        else:
+            results = self.sessions.run(clients, wait=False)
+        run['iperf'] = IperfStreamCollector({vm: result['output'] for vm, result in results.items()
+                                             if result['exception'] is None})
+        run['iperf'].start()
+
+        if self.telemetry is not None:
+            self.telemetry.reset()
+            self.telemetry.start()
+        scheduler = run['scheduler']
+        scheduler.start(t0=experiment.start(t0=t0 if self.clock is not None else None))
+        while scheduler.is_alive():
+            self.sessions.idle(0.01)
+        scheduler.print_report()
+        if self.clock is not None:
+            skews = self.clock.skew()
+            self.clock.print_skew(skews)
+            for label, vm in skews:
+                experiment.mark(label + ' vm' + vm + ' start', at=self.clock.started_at((label, vm), skews))
+        for action in scheduler.actions:
+            if isinstance(action.result, OtsCommand) and action.result.wait() and action.result.acked is not None:
+                experiment.mark(action.name + ' ack', at=action.result.acked)
+        run['phases']['traffic'] = time.monotonic() - start
+
+    # wait for the end of iperf, then stop tcpdump after drain_time
+    def drain(self, run):
+        start = time.monotonic()
+        scenario = self.scenario
+        remaining = scenario['iperf_time'] + scenario['iperf_grace'] - (time.monotonic() - run['experiment'].t0)
+        run['iperf'].join(timeout=max(0.0, remaining))
+        if not run['iperf'].finished():
+            print('iperf did not finish within ' + str(scenario['iperf_time'] + scenario['iperf_grace']) + ' s')
+        self.sessions.idle(scenario['drain_time'])
+        if self.telemetry is not None:
+            self.telemetry.stop()
+        if run['captures']:
+            # only the capture of this run, the other tcpdump processes of the VMs are left alone
+            self.sessions.run({vm: stop_capture_command(capture) for vm, capture in run['captures'].items()})
+        self.sessions.wait_pending()
+        run['phases']['drain'] = time.monotonic() - start
+
+    # save the results of a run and summarize its captures on the VMs
+    def finish(self, run):
+        start = time.monotonic()
+        scenario = self.scenario
+        experiment = run['experiment']
+        experiment.add_actions(run['scheduler'].actions)
+        for vm, series in run['iperf'].series.items():
+            print('iperf throughput vm' + vm + ': ' + str(series.summary()))
+            experiment.add_throughput(vm, series)
+            experiment.print_outages(vm)
+        experiment.save(timeline_filename(scenario['test_type'], directory=scenario['output_directory']))
+        if self.telemetry is not None:
+            self.telemetry.print_summary()
+            self.telemetry.save(telemetry_filename(scenario['test_type'], directory=scenario['output_directory']),
+                                t0=experiment.t0)
+        if run['captures'] and scenario['remote_summary']:
+            summaries = collect_summaries(self.sessions, run['captures'], directory=scenario['output_directory'])
+            for vm, remote_summary in summaries.items():
+                print_summary(analyze_summary(remote_summary, filename=run['captures'][vm]))
+        run['phases']['finish'] = time.monotonic() - start
+
+    # prepare in a thread: the run goes in next_run, or the exception in next_run['error'] so that it is
+    # raised by the main thread instead of being lost in the thread
+    def prepare_into(self, next_run):
+        try:
+            next_run.update(self.prepare())
+        except Exception as e:
+            next_run['error'] = e
+
+    # run all the repetitions, the prepare of run i+1 overlaps the finish of run i
+    def run(self, repetitions=None):
+        repetitions = self.scenario['repetitions'] if repetitions is None else repetitions
+        self.connect()
+        run = self.prepare()
+        for i in range(repetitions):
+            start = time.monotonic()
+            print('*****starting experiment ' + str(i + 1) + ' of ' + self.scenario['test_type'] + '*****')
+            self.sessions.ensure_alive()
+            self.traffic(run)
+            self.drain(run)
+            if self.plan is not None:
+                self.replan(run['scheduler'].actions)
+
+            next_run = {}
+            preparing = None
+            if i + 1 < repetitions:
+                preparing = threading.Thread(target=self.prepare_into, args=(next_run,), daemon=True)
+                preparing.start()
+            self.finish(run)
+            if preparing is not None:
+                # keep the SSH sessions served while the controller and the optical switch are set up
+                while preparing.is_alive():
+                    self.sessions.idle(0.01)
+                if 'error' in next_run:
+                    raise next_run['error']
+            run['phases']['total'] = time.monotonic() - start
+            self.phases.append(run['phases'])
+            print('experiment took ' + '{:.2f}'.format(run['phases']['total']) + ' s: '
+                  + ', '.join(phase + ' ' + '{:.2f}'.format(seconds) + ' s'
+                              for phase, seconds in run['phases'].items() if phase != 'total'))
+            print('*****done experiment ' + str(i + 1) + '*****')
+            run = next_run
+        return self.phases
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the repetitions of an experiment scenario')
+    parser.add_argument('scenario', help='scenario file (JSON)')
+    parser.add_argument('--repetitions', type=int, default=None, help='overrides the repetitions of the scenario')
+    args = parser.parse_args()
+
+    ExperimentRunner(load_scenario(args.scenario)).run(repetitions=args.repetitions)
@@ -0,0 +1,395 @@
+'''
+Sweep of experiments over a grid of parameters, running at the same time the experiments that do not share
+any part of the testbed.
+
+This script:
+- reads a sweep file (JSON): the scenarios (one per test type, see experiment_runner.py) and the grid of
+  parameters, and expands it into one job per combination of scenario and values:
+    bandwidth               iperf bandwidth of every flow of the scenario (iperf3 -b, '' is unlimited)
+    reconfiguration_time    time of the reconfiguration (first OTS action, or first action), the whole
+                            timeline moves with it
+    dt                      seconds between the end of the actions before the reconfiguration (the handoff
+                            to the backup path) and the reconfiguration
+  combinations giving the same experiment (e.g. dt for a scenario without handoff) are run once
+- finds the resources owned by each job: the VMs of its flows, the bridges and links of all the paths it
+  may use (initial paths, transitions, installs, candidate paths of the steering) and the optical switch.
+  The optical switch is owned as a whole, :oxc:swit:conn:only drops the connections of the other ports,
+  together with the optical links it reconfigures
+- runs each job in its own experiment_runner.py process, limited to its bridges, several jobs at the same
+  time when their resources are disjoint. Jobs are started in the order of the grid, a job waits for the
+  running jobs and for the earlier waiting jobs it conflicts with, so conflicting jobs run in grid order.
+
+The scenario of each job is written to <output_directory><job>.json and its output to <output_directory><job>.log,
+the test type of the job (names of the timeline, telemetry and capture files) is the one of the scenario followed
+by the values of the parameters, e.g. single_mbb_v4-bw5G-T11.05-dt0.1.
+
+sweep file:
+    {"scenarios": ["scenario_single_mbb.json", "scenario_dual_ots.json"],
+     "grid": {"bandwidth": ["", "5G"], "dt": [0.05, 0.1], "reconfiguration_time": [11.05]},
+     "repetitions": 5, "max_parallel": 4, "output_directory": "sweep/"}
+
+Usage:
+    python experiment_sweep.py sweep_mbb.json --dry-run
+    python experiment_sweep.py sweep_mbb.json --max-parallel 2
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import copy
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from experiment_runner import OTS_ACTIONS, load_scenario
+from bandwidth_steering import MAX_CANDIDATE_PATHS
+from ssh_flow_management import TOPOLOGY
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# values of the sweep when not given in the file, repetitions None keeps the ones of the scenarios
+SWEEP_DEFAULTS = {'scenarios': [],
+                  'grid': {},
+                  'repetitions': None,
+                  'max_parallel': 4,
+                  'output_directory': ''}
+
+RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'experiment_runner.py')
+# seconds between two checks of the running jobs
+POLL_INTERVAL = 0.5
+# seconds of setup of a run added to iperf_time + iperf_grace in the estimate of the duration of a job
+RUN_OVERHEAD = 2.0
+
+
+def set_bandwidth(scenario, bandwidth):
+    for flow in scenario['flows']:
+        flow['bandwidth'] = bandwidth
+    return bool(scenario['flows'])
+
+
+# action of the reconfiguration: the first OTS action, otherwise the first action of the timeline
+def reconfiguration_action(scenario):
+    timeline = sorted(scenario['timeline'], key=lambda action: action['at'])
+    for action in timeline:
+        if action['action'] in OTS_ACTIONS:
+            return action
+    return timeline[0] if timeline else None
+
+
+def set_reconfiguration_time(scenario, reconfiguration_time):
+    reconfiguration = reconfiguration_action(scenario)
+    if reconfiguration is None:
+        return False
+    shift = reconfiguration_time - reconfiguration['at']
+    for action in scenario['timeline']:
+        action['at'] = round(action['at'] + shift, 6)
+    return True
+
+
+# the actions before the reconfiguration move together, the last one ends up dt before it
+def set_dt(scenario, dt):
+    reconfiguration = reconfiguration_action(scenario)
+    if reconfiguration is None:
+        return False
+    before = [action for action in scenario['timeline'] if action['at'] < reconfiguration['at']]
+    if not before:
+        return False
+    shift = reconfiguration['at'] - dt - max(action['at'] for action in before)
+    for action in before:
+        action['at'] = round(action['at'] + shift, 6)
+    return True
+
+
+# parameters of the grid, applied in this order (dt is relative to the reconfiguration time).
+# each function returns False when the parameter does not apply to the scenario, e.g. dt without actions
+# before the reconfiguration, its value is then left out of the name of the job
+PARAMETERS = {'bandwidth': set_bandwidth,
+              'reconfiguration_time': set_reconfiguration_time,
+              'dt': set_dt}
+# prefix of the value of each parameter in the name of a job
+PARAMETER_LABELS = {'bandwidth': 'bw', 'reconfiguration_time': 'T', 'dt': 'dt'}
+
+
+def parameter_label(name, value):
+    if name == 'bandwidth' and value == '':
+        return 'bwmax'
+    return PARAMETER_LABELS[name] + str(value)
+
+
+def load_sweep(filename):
+    with open(filename) as f:
+        sweep = dict(SWEEP_DEFAULTS, **json.load(f))
+    if not sweep['scenarios']:
+        raise ValueError(filename + ': the sweep has no scenarios')
+    for name, values in sweep['grid'].items():
+        if name not in PARAMETERS:
+            raise ValueError(filename + ': unknown parameter ' + name + ', expected one of ' + ', '.join(PARAMETERS))
+        if not isinstance(values, list) or not values:
+            raise ValueError(filename + ': the values of ' + name + ' must be a non empty list')
+    return sweep
+
+
+# bridges and links of a path, every candidate path of the pair when the path is not known before the run
+# (e.g. a path registered by the bandwidth steering)
+def path_resources(src, dst, path_name=None):
+    routes = TOPOLOGY.routes[(src, dst)]
+    if path_name in routes:
+        paths = [routes[path_name]]
+    else:
+        paths = TOPOLOGY.host_paths(src, dst, max_paths=MAX_CANDIDATE_PATHS)
+    resources = {('bridge', TOPOLOGY.hosts[src].bridge), ('bridge', TOPOLOGY.hosts[dst].bridge)}
+    for links in paths:
+        for link_name in links:
+            link = TOPOLOGY.links[link_name]
+            resources |= {('link', link_name), ('bridge', link.bridge_a), ('bridge', link.bridge_b)}
+    return resources
+
+
+def all_bridges():
+    return {('bridge', bridge) for bridge in TOPOLOGY.bridges}
+
+
+# hosts of a path ID: the IDs of the flows and of the install_path actions, or '<src>-<dst>'
+def path_hosts(path_id, path_ids):
+    if path_id in path_ids:
+        return path_ids[path_id]
+    hosts = tuple(path_id.split('-'))
+    if len(hosts) == 2 and all(host in TOPOLOGY.hosts for host in hosts):
+        return hosts
+    return None
+
+
+# resources of a scenario: ('vm', host), ('bridge', name), ('link', name) and ('ots', '*')
+def scenario_resources(scenario):
+    resources = set()
+    path_ids = {}
+    for flow in scenario['flows']:
+        resources |= {('vm', flow['src']), ('vm', flow['dst'])}
+        for path_name in [flow['path']] + [layer[0] for layer in flow['layers']]:
+            resources |= path_resources(flow['src'], flow['dst'], path_name)
+        path_ids[flow['src'] + '-' + flow['dst']] = (flow['src'], flow['dst'])
+
+    uses_ots = scenario['ots_before'] is not None
+    for action in sorted(scenario['timeline'], key=lambda action: action['at']):
+        args = list(action.get('args', ()))
+        if action['action'] in OTS_ACTIONS:
+            uses_ots = True
+        elif action['action'] == 'install_path':
+            path_ids[args[0]] = (args[1], args[2])
+            resources |= path_resources(args[1], args[2], args[3] if len(args) > 3 else 'shortest')
+        elif action['action'] == 'edit_route_flows':
+            resources |= path_resources(args[0], args[1], args[2])
+        elif action['action'] == 'steer':
+            for demand in args[0]:
+                resources |= path_resources(demand[0], demand[1])
+        else:
+            # transition_path and delete_path, all the bridges when the hosts of the path ID are not known
+            hosts = path_hosts(args[0], path_ids) if args else None
+            if hosts is None:
+                resources |= all_bridges()
+            else:
+                resources |= path_resources(hosts[0], hosts[1], args[1] if len(args) > 1 else None)
+
+    if uses_ots:
+        resources.add(('ots', '*'))
+        for link in TOPOLOGY.links.values():
+            if link.type == 'optical':
+                resources |= {('link', link.name), ('bridge', link.bridge_a), ('bridge', link.bridge_b)}
+    return resources
+
+
+def format_resources(resources):
+    return ' '.join(str(name) if kind != 'ots' else 'OTS' for kind, name in sorted(resources, key=str)
+                    if kind != 'link')
+
+
+class SweepJob:
+    '''
+    One experiment of the sweep.
+        name: test type of the job, the one of the scenario followed by the values of the parameters
+        scenario: scenario of experiment_runner.py, with the parameters applied
+        resources: set returned by scenario_resources
+    start and end are time.monotonic() of the process of the job, returncode its exit code.
+    '''
+
+    def __init__(self, name, scenario, resources):
+        self.name = name
+        self.scenario = scenario
+        self.resources = resources
+        self.process = None
+        self.log = None
+        self.start = None
+        self.end = None
+        self.returncode = None
+
+    # duration expected from the scenario, to plan the sweep before running it
+    def estimated_duration(self):
+        return self.scenario['repetitions'] * (self.scenario['iperf_time'] + self.scenario['iperf_grace']
+                                               + self.scenario['drain_time'] + RUN_OVERHEAD)
+
+
+# jobs of a sweep, one per scenario and combination of the values of the grid
+def expand_grid(sweep):
+    names = [name for name in PARAMETERS if name in sweep['grid']]
+    jobs, seen, names_taken = [], set(), set()
+    for filename in sweep['scenarios']:
+        base = load_scenario(filename)
+        for values in itertools.product(*[sweep['grid'][name] for name in names]):
+            scenario = copy.deepcopy(base)
+            applied = [(name, value) for name, value in zip(names, values) if PARAMETERS[name](scenario, value)]
+            if sweep['repetitions'] is not None:
+                scenario['repetitions'] = sweep['repetitions']
+            scenario['output_directory'] = sweep['output_directory']
+            for action in scenario['timeline']:
+                if action['at'] < 0:
+                    raise ValueError(filename + ': action ' + action['action'] + ' moved before the start ('
+                                     + ', '.join(parameter_label(*item) for item in zip(names, values)) + ')')
+            # the same experiment is run once
+            key = json.dumps(scenario, sort_keys=True)
+            if key in seen:
+                continue
+            seen.add(key)
+            resources = scenario_resources(scenario)
+            scenario['bridges'] = sorted(name for kind, name in resources if kind == 'bridge')
+            labels = [parameter_label(*item) for item in applied]
+            name = '-'.join([scenario['test_type']] + labels)
+            # the name is the one of the scenario, log and result files of the job: scenarios with the same
+            # test_type are told apart by their file name, then by a number
+            if name in names_taken:
+                name = '-'.join([scenario['test_type'], os.path.splitext(os.path.basename(filename))[0]] + labels)
+            unique, i = name, 2
+            while unique in names_taken:
+                unique, i = name + '-' + str(i), i + 1
+            names_taken.add(unique)
+            scenario['test_type'] = unique
+            jobs.append(SweepJob(unique, scenario, resources))
+    return jobs
+
+
+class SweepScheduler:
+    '''
+    Runs the jobs of a sweep, the jobs with disjoint resources at the same time.
+        jobs: [SweepJob] in the order of the grid
+        max_parallel: maximum number of jobs running at the same time
+        directory: prefix of the scenario and log files of the jobs
+        runner: script running a scenario file
+    '''
+
+    def __init__(self, jobs, max_parallel=SWEEP_DEFAULTS['max_parallel'], directory='', runner=RUNNER_SCRIPT):
+        self.jobs = jobs
+        self.max_parallel = max_parallel
+        self.directory = directory
+        self.runner = runner
+
+    # jobs of pending that can start now: a job starts if it shares no resource with the running jobs
+    # nor with an earlier pending job, which keeps the grid order between conflicting jobs
+    def ready(self, pending, running):
+        started = []
+        taken = [job.resources for job in running]
+        for job in pending:
+            if len(running) + len(started) >= self.max_parallel:
+                break
+            if not any(job.resources & resources for resources in taken):
+                started.append(job)
+            taken.append(job.resources)
+        return started
+
+    # start and end times of the jobs from their estimated durations, same rules as run
+    def plan(self):
+        pending, running = list(self.jobs), []
+        now, schedule = 0.0, {}
+        while pending or running:
+            for job in self.ready(pending, running):
+                pending.remove(job)
+                running.append(job)
+                schedule[job] = (now, now + job.estimated_duration())
+            now = min(schedule[job][1] for job in running)
+            running = [job for job in running if schedule[job][1] > now]
+        return schedule
+
+    def print_plan(self):
+        schedule = self.plan()
+        for job in self.jobs:
+            start, end = schedule[job]
+            print('{:>8.0f} s {:>8.0f} s  '.format(start, end) + job.name + ': ' + format_resources(job.resources))
+        serial = sum(job.estimated_duration() for job in self.jobs)
+        total = max([end for start, end in schedule.values()] or [0.0])
+        print(str(len(self.jobs)) + ' jobs, about ' + '{:.0f}'.format(total) + ' s instead of '
+              + '{:.0f}'.format(serial) + ' s one after the other')
+
+    def launch(self, job):
+        filename = self.directory + job.name + '.json'
+        with open(filename, 'w') as f:
+            json.dump(job.scenario, f, indent=2)
+        job.log = open(self.directory + job.name + '.log', 'w')
+        job.start = time.monotonic()
+        job.process = subprocess.Popen([sys.executable, self.runner, filename],
+                                       stdout=job.log, stderr=subprocess.STDOUT)
+        print('started ' + job.name + ' on ' + format_resources(job.resources))
+
+    def finished(self, job):
+        job.end = time.monotonic()
+        job.returncode = job.process.returncode
+        job.log.close()
+        print(('done ' if job.returncode == 0 else 'FAILED (exit code ' + str(job.returncode) + ') ')
+              + job.name + ' in ' + '{:.1f}'.format(job.end - job.start) + ' s')
+
+    def run(self):
+        directory = os.path.dirname(self.directory)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        start = time.monotonic()
+        pending, running = list(self.jobs), []
+        try:
+            while pending or running:
+                for job in self.ready(pending, running):
+                    pending.remove(job)
+                    self.launch(job)
+                    running.append(job)
+                time.sleep(POLL_INTERVAL)
+                for job in [job for job in running if job.process.poll() is not None]:
+                    running.remove(job)
+                    self.finished(job)
+        except KeyboardInterrupt:
+            # the runners get the same Ctrl+C
+            print('stopping ' + ', '.join(job.name for job in running))
+            for job in running:
+                job.process.send_signal(signal.SIGINT)
+            for job in running:
+                job.process.wait()
+                self.finished(job)
+            raise
+        total = time.monotonic() - start
+        serial = sum(job.end - job.start for job in self.jobs)
+        failed = [job.name for job in self.jobs if job.returncode != 0]
+        print('sweep of ' + str(len(self.jobs)) + ' jobs took ' + '{:.1f}'.format(total) + ' s, '
+              + '{:.1f}'.format(serial) + ' s of experiments')
+        if failed:
+            print('failed jobs: ' + ', '.join(failed))
+        return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a sweep of experiments, independent ones at the same time')
+    parser.add_argument('sweep', help='sweep file (JSON)')
+    parser.add_argument('--max-parallel', type=int, default=None, help='overrides max_parallel of the sweep')
+    parser.add_argument('--dry-run', action='store_true', help='only print the jobs and their planned start')
+    args = parser.parse_args()
+
+    sweep = load_sweep(args.sweep)
+    scheduler = SweepScheduler(expand_grid(sweep),
+                               max_parallel=args.max_parallel if args.max_parallel is not None else sweep['max_parallel'],
+                               directory=sweep['output_directory'])
+    scheduler.print_plan()
+    if not args.dry_run:
+        scheduler.run()
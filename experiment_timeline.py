@@ -0,0 +1,215 @@
+'''
+Timeline of one experiment run, on a single clock.
+
+This module:
+- collects, on the monotonic clock and relative to the start of the experiment (t0 of the
+  TimelineScheduler), the iperf3 interval samples, the actual firing and end times of the
+  reconfiguration actions (flow add/delete, handoffs, OTS commands) and the round trip time
+  of every request to the controller
+- stores them as NumPy arrays, one array per column, and exports them to a compressed .npz file
+- computes the outage of each handoff from the throughput samples around it, to the millisecond.
+
+The iperf3 intervals are timed by iperf3 itself, from the start of the test. They are moved to the
+experiment clock with the smallest delay between the end of an interval and its arrival over SSH,
+i.e. the interval that arrived the fastest.
+
+Usage:
+    experiment = ExperimentTimeline()
+    flow_client.on_request = experiment.record_rtt
+    experiment.start()
+    scheduler.start(t0=experiment.t0)
+    ...
+    experiment.add_actions(scheduler.actions)
+    experiment.add_throughput('2', iperf_collector.series['2'])
+    experiment.print_outages('2')
+    experiment.save(timeline_filename(TEST_TYPE))
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import datetime
+import threading
+import time
+
+import numpy as np
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# the baseline throughput of a handoff is the median of the intervals in the BASELINE_WINDOW seconds before it
+BASELINE_WINDOW = 1.0
+# the outage of a handoff is searched in the OUTAGE_WINDOW seconds after it
+OUTAGE_WINDOW = 1.0
+# an interval below OUTAGE_THRESHOLD times the baseline is part of the outage
+OUTAGE_THRESHOLD = 0.5
+
+
+# name of the timeline file of a run, same convention as the pcap files
+def timeline_filename(test_type, directory=''):
+    return directory + 'timeline)' + test_type + ')' + datetime.datetime.now().strftime("%m_%d_%Y-%H_%M_%S") + '.npz'
+
+
+class ExperimentTimeline:
+    '''
+    Samples of one experiment run. Times are kept in time.monotonic() seconds and
+    converted to seconds from t0 when the arrays are built.
+        t0: start of the experiment in time.monotonic() seconds, set by start()
+    '''
+
+    def __init__(self, t0=None):
+        self.t0 = t0
+        self.lock = threading.Lock()
+        # (vm_id, start, end, bits_per_second, retransmits), start and end in monotonic seconds
+        self.throughput_rows = []
+        # (name, planned, fired, finished, failed), monotonic seconds
+        self.event_rows = []
+        # (uri, sent, rtt, status_code), sent in monotonic seconds
+        self.rtt_rows = []
+
+    # the experiment starts now, or at t0 (time.monotonic() seconds, e.g. a synchronized start), returns t0
+    # for the scheduler
+    def start(self, t0=None):
+        self.t0 = time.monotonic() if t0 is None else t0
+        return self.t0
+
+    # callback for OfctlClient.on_request, called from the worker threads of the client
+    def record_rtt(self, uri, sent, rtt, status_code):
+        with self.lock:
+            self.rtt_rows.append((uri, sent, rtt, status_code))
+
+    # an instantaneous event, e.g. the start of iperf
+    def mark(self, name, at=None):
+        at = time.monotonic() if at is None else at
+        with self.lock:
+            self.event_rows.append((name, at, at, at, False))
+
+    # the TimelineActions of the scheduler, after the run
+    def add_actions(self, actions, t0=None):
+        t0 = self.t0 if t0 is None else t0
+        with self.lock:
+            for action in actions:
+                if action.fired is None:
+                    continue
+                self.event_rows.append((action.name, t0 + action.planned, t0 + action.fired,
+                                        t0 + action.finished, action.error is not None))
+
+    # the intervals of an iperf_stream.ThroughputSeries of one vm
+    def add_throughput(self, vm_id, series):
+        if not len(series):
+            return
+        end = np.frombuffer(series.end, dtype=np.float64)
+        received = np.frombuffer(series.received, dtype=np.float64)
+        # start of the iperf3 clock on the monotonic clock
+        offset = np.min(received - end)
+        with self.lock:
+            for i in range(len(series)):
+                self.throughput_rows.append((vm_id, offset + series.start[i], offset + series.end[i],
+                                             series.bits_per_second[i], series.retransmits[i]))
+
+    # all the samples as NumPy arrays, times in seconds from t0
+    def arrays(self):
+        t0 = self.t0 if self.t0 is not None else 0.0
+        with self.lock:
+            throughput = list(self.throughput_rows)
+            events = sorted(self.event_rows, key=lambda row: row[2])
+            rtts = sorted(self.rtt_rows, key=lambda row: row[1])
+        return {'t0': np.array(t0),
+                'throughput_vm': np.array([row[0] for row in throughput], dtype=str),
+                'throughput_start': np.array([row[1] for row in throughput], dtype=np.float64) - t0,
+                'throughput_end': np.array([row[2] for row in throughput], dtype=np.float64) - t0,
+                'throughput_bps': np.array([row[3] for row in throughput], dtype=np.float64),
+                'throughput_retransmits': np.array([row[4] for row in throughput], dtype=np.int64),
+                'event_name': np.array([row[0] for row in events], dtype=str),
+                'event_planned': np.array([row[1] for row in events], dtype=np.float64) - t0,
+                'event_fired': np.array([row[2] for row in events], dtype=np.float64) - t0,
+                'event_finished': np.array([row[3] for row in events], dtype=np.float64) - t0,
+                'event_failed': np.array([row[4] for row in events], dtype=bool),
+                'rtt_uri': np.array([row[0] for row in rtts], dtype=str),
+                'rtt_sent': np.array([row[1] for row in rtts], dtype=np.float64) - t0,
+                'rtt': np.array([row[2] for row in rtts], dtype=np.float64),
+                'rtt_status': np.array([row[3] for row in rtts], dtype=np.int64)}
+
+    def save(self, filename):
+        np.savez_compressed(filename, **self.arrays())
+        print('timeline written to ' + filename)
+        return filename
+
+    def outages(self, vm_id, **kwargs):
+        return handoff_outages(self.arrays(), vm_id, **kwargs)
+
+    def print_outages(self, vm_id, **kwargs):
+        print_outages(self.outages(vm_id, **kwargs), vm_id)
+
+
+# arrays of a timeline saved with ExperimentTimeline.save
+def load_timeline(filename):
+    with np.load(filename) as data:
+        return {key: data[key] for key in data.files}
+
+
+# outage of the throughput of vm_id after each event of the timeline.
+# Each interval below threshold * baseline counts for the fraction of its duration that is missing,
+# e.g. a 100 ms interval at a quarter of the baseline adds 75 ms, so the outage is not a multiple of the interval.
+# returns one dict per event: name, fired, baseline_bps, min_bps, dip_start, dip_end and outage, in seconds.
+def handoff_outages(arrays, vm_id, baseline_window=BASELINE_WINDOW, window=OUTAGE_WINDOW,
+                    threshold=OUTAGE_THRESHOLD):
+    mask = arrays['throughput_vm'] == vm_id
+    start = arrays['throughput_start'][mask]
+    end = arrays['throughput_end'][mask]
+    bps = arrays['throughput_bps'][mask]
+
+    results = []
+    for name, fired in zip(arrays['event_name'], arrays['event_fired']):
+        before = bps[(end > fired - baseline_window) & (end <= fired)]
+        after = (end > fired) & (start < fired + window)
+        if not len(before) or not np.any(after):
+            results.append({'name': str(name), 'fired': float(fired), 'baseline_bps': None,
+                            'min_bps': None, 'dip_start': None, 'dip_end': None, 'outage': None})
+            continue
+        baseline = float(np.median(before))
+        dip = after & (bps < threshold * baseline)
+        missing = np.clip(1 - bps / baseline, 0, 1) * (end - start) if baseline > 0 else np.zeros(len(bps))
+        results.append({'name': str(name),
+                        'fired': float(fired),
+                        'baseline_bps': baseline,
+                        'min_bps': float(np.min(bps[after])),
+                        'dip_start': float(np.min(start[dip])) if np.any(dip) else None,
+                        'dip_end': float(np.max(end[dip])) if np.any(dip) else None,
+                        'outage': float(np.sum(missing[dip]))})
+    return results
+
+
+def print_outages(outages, vm_id):
+    for outage in outages:
+        line = 'vm' + vm_id + ' ' + outage['name'] + ' at ' + '{:.4f}'.format(outage['fired']) + ' s: '
+        if outage['outage'] is None:
+            line += 'no throughput samples around it'
+        elif outage['dip_start'] is None:
+            line += 'no outage'
+        else:
+            line += 'outage ' + '{:.1f}'.format(outage['outage'] * 1e3) + ' ms' \
+                    + ' between ' + '{:.3f}'.format(outage['dip_start']) \
+                    + ' and ' + '{:.3f}'.format(outage['dip_end']) + ' s' \
+                    + ', min ' + '{:.3g}'.format(outage['min_bps']) + ' bits/s'
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Outage of each handoff in a saved experiment timeline')
+    parser.add_argument('filename', help='.npz file written by ExperimentTimeline.save')
+    parser.add_argument('--window', type=float, default=OUTAGE_WINDOW, help='seconds searched after each event')
+    args = parser.parse_args()
+
+    timeline = load_timeline(args.filename)
+    for vm_id in sorted(set(timeline['throughput_vm'].tolist())):
+        print_outages(handoff_outages(timeline, vm_id, window=args.window), vm_id)
+    if len(timeline['rtt']):
+        print('controller rtt: ' + str(len(timeline['rtt'])) + ' requests, median '
+              + '{:.3f}'.format(np.median(timeline['rtt']) * 1e3) + ' ms, max '
+              + '{:.3f}'.format(np.max(timeline['rtt']) * 1e3) + ' ms')
@@ -0,0 +1,122 @@
+'''
+Index of the flow rules installed on the bridges, and allocator of their priorities.
+
+This module:
+- indexes the installed rules by (dpid, match), the match being (in_port, ip_src, ip_dst), with the
+  priorities installed for each match: the make before break layers of a flow are the priorities
+  of the same match
+- hands out priorities that do not conflict with the layers already installed: above all of them
+  (the new layer takes the traffic) or below (a standby layer)
+- registers the paths installed under a logical path ID, with the rules, the priority and the delete
+  payloads computed at install time, so deleting a path is a lookup instead of rebuilding the rules
+  and remembering the priority used by delete_strict.
+
+The index is kept up to date by the FlowReconciler it is given to (see flow_reconciler.py), so every
+rule sent through ssh_flow_management.py is in it.
+
+Usage (see install_path, delete_path and transition_path in ssh_flow_management.py):
+    priority = flow_index.priority_above(rules)
+    flow_index.register_path('vm2-vm3', PathEntry('vm2', 'vm3', 'long', priority, rules, payloads))
+    entry = flow_index.pop_path('vm2-vm3')
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import threading
+from collections import namedtuple
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# priorities handed out by the allocator
+PRIORITY_MIN = 1
+PRIORITY_MAX = 65535
+
+# path installed under a path ID: src, dst and path name in the topology, priority, rules (topology.FlowRule)
+# and the payloads that delete them
+PathEntry = namedtuple('PathEntry', ['src', 'dst', 'path_name', 'priority', 'rules', 'delete_payloads'])
+
+
+# key of a rule in the index, without its priority
+def rule_match(rule):
+    return rule.dpid, rule.in_port, rule.ip_src, rule.ip_dst
+
+
+class FlowIndex:
+    '''
+    Installed rules, {(dpid, in_port, ip_src, ip_dst): {priority: rule}}
+    and registered paths, {path ID: PathEntry}
+    '''
+
+    def __init__(self):
+        self.rules = {}
+        self.paths = {}
+        self.lock = threading.Lock()
+
+    def record(self, rules, action, priority):
+        with self.lock:
+            for rule in rules:
+                if action == 'ADD' or action == 'MODIFY':
+                    self.rules.setdefault(rule_match(rule), {})[priority] = rule
+                else:
+                    layers = self.rules.get(rule_match(rule))
+                    if layers is not None:
+                        layers.pop(priority, None)
+                        if not layers:
+                            del self.rules[rule_match(rule)]
+
+    # a bridge was cleared, its rules and the paths crossing it are forgotten
+    def clear(self, dpid):
+        with self.lock:
+            self.rules = {match: layers for match, layers in self.rules.items() if match[0] != dpid}
+            self.paths = {path_id: entry for path_id, entry in self.paths.items()
+                          if all(rule.dpid != dpid for rule in entry.rules)}
+
+    # layers installed for one match, {priority: rule}
+    def lookup(self, dpid, in_port, ip_src, ip_dst):
+        with self.lock:
+            return dict(self.rules.get((dpid, in_port, ip_src, ip_dst), {}))
+
+    # priorities installed on the matches of the rules
+    def priorities(self, rules):
+        with self.lock:
+            return {priority for rule in rules for priority in self.rules.get(rule_match(rule), {})}
+
+    # lowest priority above every layer installed on the matches of the rules, and at least minimum
+    def priority_above(self, rules, minimum=PRIORITY_MIN):
+        priority = max(self.priorities(rules) | {minimum - 1}) + 1
+        if priority > PRIORITY_MAX:
+            raise ValueError('no priority left above ' + str(PRIORITY_MAX))
+        return priority
+
+    # highest priority below every layer installed on the matches of the rules, and at most maximum
+    def priority_below(self, rules, maximum=PRIORITY_MAX):
+        priority = min(self.priorities(rules) | {maximum + 1}) - 1
+        if priority < PRIORITY_MIN:
+            raise ValueError('no priority left below ' + str(PRIORITY_MIN))
+        return priority
+
+    def register_path(self, path_id, entry):
+        with self.lock:
+            self.paths[path_id] = entry
+
+    def path(self, path_id):
+        with self.lock:
+            if path_id not in self.paths:
+                raise KeyError('no path installed with ID ' + str(path_id))
+            return self.paths[path_id]
+
+    def pop_path(self, path_id):
+        with self.lock:
+            if path_id not in self.paths:
+                raise KeyError('no path installed with ID ' + str(path_id))
+            return self.paths.pop(path_id)
+
+    def forget_paths(self):
+        with self.lock:
+            self.paths = {}
@@ -0,0 +1,175 @@
+'''
+Desired-state reconciliation of the flow tables of the bridges.
+
+This module:
+- keeps a local shadow of the flow table of each bridge, updated with every rule sent to the controller
+- given a target set of rules, computes the minimal diff against the shadow
+  (rules to add, to delete, and to modify when only the output port changes)
+- pushes only that diff, instead of clearing the bridges and installing everything again.
+
+A bridge whose state is unknown (never cleared nor reconciled) is cleared once the first
+time it is reconciled, after that only the deltas are sent. Only the rules acknowledged by the
+controller (200) go into the shadow, a bridge with a refused or lost request is unknown again
+and is cleared the next time it is reconciled.
+
+Rules are topology.FlowRule tuples together with their priority.
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import threading
+
+import requests
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+
+
+# key of a rule in the shadow table: a rule is identified by its match and its priority (as delete_strict does)
+def rule_key(rule, priority):
+    return priority, rule.in_port, rule.ip_src, rule.ip_dst
+
+
+# the controller acknowledged the request, None is a request that got no reply
+def accepted(response):
+    return response is not None and response.status_code == 200
+
+
+class FlowReconciler:
+    '''
+    Shadow of the flow tables, {dpid: {(priority, in_port, ip_src, ip_dst): (rule, priority)}}
+        client: OfctlClient used to push the changes
+        payload_function: builds the payload of one rule, same arguments as ofctl_flow_payload
+        index: optional flow_index.FlowIndex updated together with the shadow
+    '''
+
+    def __init__(self, client, payload_function, index=None):
+        self.client = client
+        self.payload_function = payload_function
+        self.index = index
+        self.shadow = {}
+        # bridges whose flow table is known
+        self.synced = set()
+        self.lock = threading.Lock()
+
+    def payload(self, rule, priority, action):
+        return self.payload_function(action=action, dpid=rule.dpid,
+                                     in_port=rule.in_port, out_port=rule.out_port,
+                                     ip_src=rule.ip_src, ip_dst=rule.ip_dst, priority=priority)
+
+    # update the shadow after rules were sent to the controller by someone else.
+    # responses: replies of the controller, one per rule, only the acknowledged rules are recorded and the
+    # bridges of the others become unknown. None records all the rules
+    def record(self, rules, action, priority, responses=None):
+        rules = list(rules)
+        if responses is not None:
+            self.desync({rule.dpid for rule, response in zip(rules, responses) if not accepted(response)})
+            rules = [rule for rule, response in zip(rules, responses) if accepted(response)]
+        with self.lock:
+            for rule in rules:
+                table = self.shadow.setdefault(rule.dpid, {})
+                if action == 'ADD' or action == 'MODIFY':
+                    table[rule_key(rule, priority)] = (rule, priority)
+                else:
+                    table.pop(rule_key(rule, priority), None)
+        if self.index is not None:
+            self.index.record(rules, action, priority)
+
+    # the flow tables of these bridges are no longer known, they are cleared at the next reconcile
+    def desync(self, dpids):
+        if dpids:
+            with self.lock:
+                self.synced -= set(dpids)
+            print('flow tables of bridges ' + ', '.join(str(dpid) for dpid in sorted(dpids))
+                  + ' out of sync, they will be cleared at the next reconcile')
+
+    # update the shadow after a bridge was cleared
+    def record_clear(self, dpid):
+        with self.lock:
+            self.shadow[dpid] = {}
+            self.synced.add(dpid)
+        if self.index is not None:
+            self.index.clear(dpid)
+
+    # clear a bridge on the controller and in the shadow
+    def clear(self, dpid):
+        r = self.client.clear_flows(dpid)
+        if accepted(r):
+            self.record_clear(dpid)
+        else:
+            print('clear of bridge ' + str(dpid) + ' refused by the controller: ' + str(r.status_code))
+        return r
+
+    # post [(rule, priority)] with post_function (e.g. client.add_flows), returns the ones acknowledged.
+    # the bridges of the requests refused or lost are unknown again
+    def post(self, post_function, items, action):
+        if not items:
+            return []
+        try:
+            responses = post_function([self.payload(rule, priority, action) for rule, priority in items])
+        except requests.RequestException as e:
+            print(str(action) + ' requests failed: ' + repr(e))
+            responses = [None] * len(items)
+        self.desync({rule.dpid for (rule, priority), response in zip(items, responses) if not accepted(response)})
+        return [item for item, response in zip(items, responses) if accepted(response)]
+
+    # diff between the shadow and the target rules [(rule, priority)] of the given bridges.
+    # returns the lists of (rule, priority) to add, modify and delete.
+    def diff(self, target, dpids):
+        wanted = {}
+        for rule, priority in target:
+            wanted.setdefault(rule.dpid, {})[rule_key(rule, priority)] = (rule, priority)
+
+        to_add, to_modify, to_delete = [], [], []
+        with self.lock:
+            for dpid in dpids:
+                current = self.shadow.get(dpid, {})
+                desired = wanted.get(dpid, {})
+                for key, (rule, priority) in desired.items():
+                    if key not in current:
+                        to_add.append((rule, priority))
+                    elif current[key][0].out_port != rule.out_port:
+                        to_modify.append((rule, priority))
+                for key, (rule, priority) in current.items():
+                    if key not in desired:
+                        to_delete.append((rule, priority))
+        return to_add, to_modify, to_delete
+
+    # bring the bridges dpids to the target rules [(rule, priority)], sending only the diff.
+    # new rules are installed before the old ones are deleted, so traffic always has a path.
+    def reconcile(self, target, dpids=None):
+        target = list(target)
+        if dpids is None:
+            dpids = sorted({rule.dpid for rule, priority in target} | set(self.shadow))
+
+        # bridges with unknown state are cleared once
+        for dpid in dpids:
+            if dpid not in self.synced:
+                self.clear(dpid)
+
+        to_add, to_modify, to_delete = self.diff(target, dpids)
+        to_add = self.post(self.client.add_flows, to_add, 'ADD')
+        to_modify = self.post(self.client.modify_flows, to_modify, 'ADD')
+        to_delete = self.post(self.client.delete_flows, to_delete, 'DELETE')
+
+        with self.lock:
+            for rule, priority in to_add + to_modify:
+                self.shadow.setdefault(rule.dpid, {})[rule_key(rule, priority)] = (rule, priority)
+            for rule, priority in to_delete:
+                self.shadow.get(rule.dpid, {}).pop(rule_key(rule, priority), None)
+        if self.index is not None:
+            for rule, priority in to_add + to_modify:
+                self.index.record([rule], 'ADD', priority)
+            for rule, priority in to_delete:
+                self.index.record([rule], 'DELETE', priority)
+
+        print('reconciled flows: ' + str(len(to_add)) + ' added, '
+              + str(len(to_modify)) + ' modified, '
+              + str(len(to_delete)) + ' deleted')
+        return to_add, to_modify, to_delete
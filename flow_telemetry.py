@@ -0,0 +1,276 @@
+'''
+Throughput of the paths from the flow and port counters of the switches, without packet captures.
+
+This module:
+- polls, in a background thread and at a fixed rate, the flow counters (stats/flow/<dpid>) and the
+  port counters (stats/port/<dpid>) of every bridge, all the requests of a sample sent concurrently
+- keeps the increase of every counter since the previous sample in a ring buffer of NumPy arrays,
+  so the memory does not grow with the duration of the experiment
+- gives the throughput of the watched paths (e.g. vm1-vm4 through trunk1 or trunk2, vm2-vm3 through the
+  long path or its backup) and of every port, in bits per second, as curves over time.
+
+The flow counters of a path are the ones of its rule on the bridge of the source host (forward direction)
+or of the destination host (reverse direction). The increases of the make before break layers (priorities)
+of a match are computed layer by layer and then added together, so the deletion of a layer does not count
+the other layers twice. A counter that goes down (rule deleted and installed again) restarts from its new value.
+
+The sampler sends two requests per bridge every interval. Give it its own OfctlClient (telemetry_client of
+ssh_flow_management.py), so they do not wait in the pool of the flow rules. They still load the controller
+and the switches during the handoffs, which may add to the install and confirmation latencies measured by
+the experiments, so telemetry is off by default in main_3.py and experiment_runner.py.
+
+Usage:
+    telemetry = FlowTelemetry(telemetry_client, dpids=[DPID_BR1, DPID_BR2, DPID_BR3, DPID_BR4], interval=0.05)
+    telemetry.watch_path('vm2-vm3 long', TOPOLOGY.rules('vm2', 'vm3', 'long'))
+    telemetry.start()
+    ...
+    telemetry.stop()
+    times, bps = telemetry.path_throughput('vm2-vm3 long')
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import datetime
+import threading
+import time
+
+import numpy as np
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# seconds between two samples
+TELEMETRY_INTERVAL = 0.05
+# samples kept in the ring buffer, 10 minutes at 50 ms
+RING_CAPACITY = 12000
+
+
+def telemetry_filename(test_type, directory=''):
+    return directory + 'telemetry)' + test_type + ')' + datetime.datetime.now().strftime("%m_%d_%Y-%H_%M_%S") + '.npz'
+
+
+class CounterRing:
+    '''
+    Ring buffer of the increases of a set of counters.
+        times: time.monotonic() of each sample
+        elapsed: seconds since the previous sample
+        values: (samples, counters) increase of every counter since the previous sample
+    columns maps the key of a counter to its column, columns are added when new counters appear.
+    '''
+
+    def __init__(self, capacity=RING_CAPACITY, width=64):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.elapsed = np.zeros(capacity)
+        self.values = np.zeros((capacity, width))
+        self.columns = {}
+        # number of samples written so far, the next one goes to count % capacity
+        self.count = 0
+
+    def column(self, key):
+        if key not in self.columns:
+            if len(self.columns) == self.values.shape[1]:
+                self.values = np.pad(self.values, ((0, 0), (0, self.values.shape[1])))
+            self.columns[key] = len(self.columns)
+        return self.columns[key]
+
+    def append(self, at, elapsed, increases):
+        row = self.count % self.capacity
+        self.times[row] = at
+        self.elapsed[row] = elapsed
+        self.values[row] = 0
+        for key, increase in increases.items():
+            self.values[row, self.column(key)] = increase
+        self.count += 1
+
+    # indices of the samples kept, oldest first
+    def order(self):
+        if self.count <= self.capacity:
+            return np.arange(self.count)
+        return (np.arange(self.capacity) + self.count) % self.capacity
+
+    # (times, elapsed, increases) of one counter, oldest first. a counter never seen gives zeros
+    def series(self, key):
+        order = self.order()
+        if key not in self.columns:
+            return self.times[order], self.elapsed[order], np.zeros(len(order))
+        return self.times[order], self.elapsed[order], self.values[order, self.columns[key]]
+
+    def clear(self):
+        self.count = 0
+
+
+# counters of the reply of stats/flow/<dpid>: {(dpid, in_port, out_port, ip_src, ip_dst, priority): (bytes, packets)}
+def flow_counters(tables):
+    counters = {}
+    for dpid, flows in tables.items():
+        for flow in flows:
+            match = flow.get('match', {})
+            for action in flow.get('actions', []):
+                if isinstance(action, str) and action.startswith('OUTPUT:') and action[7:].isdigit():
+                    key = (dpid, match.get('in_port'), int(action[7:]), match.get('nw_src'), match.get('nw_dst'),
+                           flow.get('priority'))
+                    total_bytes, total_packets = counters.get(key, (0, 0))
+                    counters[key] = (total_bytes + flow.get('byte_count', 0),
+                                     total_packets + flow.get('packet_count', 0))
+    return counters
+
+
+# counters of the reply of stats/port/<dpid>: {(dpid, port, 'rx' or 'tx'): (bytes, packets)}
+def port_counters(tables):
+    counters = {}
+    for dpid, ports in tables.items():
+        for port in ports:
+            if not isinstance(port.get('port_no'), int):
+                continue
+            for direction in ('rx', 'tx'):
+                counters[(dpid, port['port_no'], direction)] = (port.get(direction + '_bytes', 0),
+                                                                port.get(direction + '_packets', 0))
+    return counters
+
+
+class FlowTelemetry:
+    '''
+    Background sampler of the counters of the switches.
+        client: OfctlClient used to read the counters
+        dpids: bridges sampled
+        interval: seconds between two samples
+        ports: also sample the port counters
+    bytes and packets are CounterRing of the increases, keyed as port_counters and as flow_counters without
+    the priority (the layers of a match are added together).
+    '''
+
+    def __init__(self, client, dpids, interval=TELEMETRY_INTERVAL, capacity=RING_CAPACITY, ports=True):
+        self.client = client
+        self.dpids = list(dpids)
+        self.interval = interval
+        self.ports = ports
+        self.bytes = CounterRing(capacity)
+        self.packets = CounterRing(capacity)
+        # {path name: (forward rule, reverse rule)}
+        self.paths = {}
+        self.previous = None
+        self.previous_time = None
+        self.lock = threading.Lock()
+        self.running = threading.Event()
+        self.thread = None
+        # samples that took longer than the interval
+        self.late = 0
+
+    # throughput of a path, from its rules (topology.FlowRule as returned by Topology.rules):
+    # the first rule is the forward hop on the bridge of the source host, the reverse rule of the last hop
+    # is on the bridge of the destination host
+    def watch_path(self, name, rules):
+        rules = list(rules)
+        self.paths[name] = (rules[0], rules[-1])
+
+    # one sample of all the counters, returns {key: (bytes, packets)}
+    def read(self):
+        flows = {dpid: self.client.executor.submit(self.client.get_flows, dpid) for dpid in self.dpids}
+        ports = {dpid: self.client.executor.submit(self.client.get_ports, dpid) for dpid in self.dpids} \
+            if self.ports else {}
+        counters = flow_counters({dpid: future.result() for dpid, future in flows.items()})
+        counters.update(port_counters({dpid: future.result() for dpid, future in ports.items()}))
+        return counters
+
+    def sample(self):
+        counters = self.read()
+        now = time.monotonic()
+        with self.lock:
+            if self.previous is not None:
+                increases_bytes, increases_packets = {}, {}
+                for key, (total_bytes, total_packets) in counters.items():
+                    last_bytes, last_packets = self.previous.get(key, (0, 0))
+                    # flow counters are per priority, the increases of the layers of a match are added together
+                    column = key[:5] if len(key) == 6 else key
+                    # a counter that went down was reset, it counts from zero
+                    increases_bytes[column] = increases_bytes.get(column, 0) \
+                        + (total_bytes - last_bytes if total_bytes >= last_bytes else total_bytes)
+                    increases_packets[column] = increases_packets.get(column, 0) \
+                        + (total_packets - last_packets if total_packets >= last_packets else total_packets)
+                self.bytes.append(now, now - self.previous_time, increases_bytes)
+                self.packets.append(now, now - self.previous_time, increases_packets)
+            self.previous = counters
+            self.previous_time = now
+
+    def run(self):
+        deadline = time.monotonic()
+        while self.running.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                print('telemetry sample failed: ' + repr(e))
+            deadline += self.interval
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # do not try to catch up, the next sample starts now
+                self.late += 1
+                deadline = time.monotonic()
+
+    def start(self):
+        self.running.set()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+
+    # forget the samples, e.g. between two runs
+    def reset(self):
+        with self.lock:
+            self.bytes.clear()
+            self.packets.clear()
+            self.previous = None
+            self.previous_time = None
+            self.late = 0
+
+    # (times, bits per second) of a counter
+    def throughput(self, key):
+        with self.lock:
+            times, elapsed, increases = self.bytes.series(key)
+        bps = np.divide(increases * 8, elapsed, out=np.zeros(len(increases)), where=elapsed > 0)
+        return times, bps
+
+    # (times, bits per second) of a watched path, direction 'forward' or 'reverse'
+    def path_throughput(self, name, direction='forward'):
+        forward, reverse = self.paths[name]
+        rule = forward if direction == 'forward' else reverse
+        return self.throughput((rule.dpid, rule.in_port, rule.out_port, rule.ip_src, rule.ip_dst))
+
+    # (times, bits per second) of a port, direction 'rx' or 'tx'
+    def port_throughput(self, dpid, port, direction='tx'):
+        return self.throughput((dpid, port, direction))
+
+    # arrays of the watched paths, times in seconds from t0 (time.monotonic(), the first sample by default)
+    def arrays(self, t0=None):
+        with self.lock:
+            times = self.bytes.series(None)[0]
+        if t0 is None:
+            t0 = times[0] if len(times) else 0.0
+        arrays = {'time': times - t0, 't0': np.array(t0)}
+        for name in self.paths:
+            for direction in ('forward', 'reverse'):
+                arrays['path_' + name + '_' + direction] = self.path_throughput(name, direction)[1]
+        return arrays
+
+    def save(self, filename, t0=None):
+        np.savez(filename, **self.arrays(t0))
+
+    # mean throughput of each watched path, in Gbit/s
+    def print_summary(self):
+        for name in self.paths:
+            times, bps = self.path_throughput(name)
+            print('telemetry ' + name + ': ' + ('{:.3f}'.format(np.mean(bps) / 1e9) if len(bps) else '-')
+                  + ' Gbit/s mean, ' + ('{:.3f}'.format(np.max(bps) / 1e9) if len(bps) else '-')
+                  + ' Gbit/s max, ' + str(len(bps)) + ' samples')
+        if self.late:
+            print('telemetry: ' + str(self.late) + ' samples took longer than ' + str(self.interval) + ' s')
@@ -0,0 +1,136 @@
+'''
+Verification, on the switches, of the flow rules posted to the controller.
+
+A 200 from stats/flowentry/add only means that OFCTL_REST accepted the rule, not that the switch
+installed it. This module:
+- reads the flow table of every bridge involved with one stats/flow/<dpid> request per bridge, all of
+  them sent concurrently, and indexes it by (dpid, priority, in_port, ip_src, ip_dst)
+- checks a batch of expected rules (topology.FlowRule with their priority) against it: present, with the
+  expected output port, and optionally carrying traffic (packet counter above zero)
+- polls until the whole batch is confirmed with an adaptive interval: the first polls follow the post
+  after a few ms, the interval then grows (backoff) up to a maximum, and only the bridges still missing
+  rules are polled again. A handoff waits for "new path is live" for as long as it takes, tens of
+  ms in general, instead of a fixed dt.
+
+Usage:
+    verifier = FlowVerifier(flow_client)
+    result = verifier.wait([(rule, priority) for rule in rules], timeout=1.0)
+    print(result.confirmed, result.elapsed, result.polls)
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import time
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# polling of the flow tables, in seconds
+FIRST_POLL_INTERVAL = 0.002
+MAX_POLL_INTERVAL = 0.05
+BACKOFF = 1.5
+VERIFY_TIMEOUT = 1.0
+
+
+class VerificationResult:
+    '''
+    Outcome of the verification of a batch of rules.
+        confirmed: every rule was found (and carried traffic when required)
+        elapsed: seconds from the start of the verification to the last poll
+        polls: number of rounds of flow statistics requests
+        missing: [(rule, priority)] not confirmed
+        counters: {(rule, priority): (packet_count, byte_count)} of the rules found in the last poll
+    '''
+
+    def __init__(self, confirmed, elapsed, polls, missing, counters):
+        self.confirmed = confirmed
+        self.elapsed = elapsed
+        self.polls = polls
+        self.missing = missing
+        self.counters = counters
+
+
+# key of a flow of the reply of stats/flow/<dpid>, same fields as flow_reconciler.rule_key
+def flow_key(dpid, flow):
+    match = flow.get('match', {})
+    return dpid, flow.get('priority'), match.get('in_port'), match.get('nw_src'), match.get('nw_dst')
+
+
+def expected_key(rule, priority):
+    return rule.dpid, priority, rule.in_port, rule.ip_src, rule.ip_dst
+
+
+# output ports of the actions of a flow, given as 'OUTPUT:5' by OFCTL_REST
+def output_ports(flow):
+    ports = set()
+    for action in flow.get('actions', []):
+        if isinstance(action, str) and action.startswith('OUTPUT:'):
+            port = action.split(':', 1)[1]
+            ports.add(int(port) if port.isdigit() else port)
+    return ports
+
+
+class FlowVerifier:
+    '''
+    Bulk verification of flow rules from the flow statistics of the bridges.
+        client: OfctlClient used to read the flow tables
+    '''
+
+    def __init__(self, client):
+        self.client = client
+
+    # flow tables of the bridges, one request per bridge sent concurrently.
+    # returns {(dpid, priority, in_port, ip_src, ip_dst): flow}
+    def snapshot(self, dpids):
+        tables = self.client.get_flows_batch(dpids)
+        return {flow_key(dpid, flow): flow for dpid, flows in tables.items() for flow in flows}
+
+    # rules of expected [(rule, priority)] found in a snapshot, with their counters
+    @staticmethod
+    def check(expected, snapshot, require_traffic=False):
+        missing, counters = [], {}
+        for rule, priority in expected:
+            flow = snapshot.get(expected_key(rule, priority))
+            if flow is None or rule.out_port not in output_ports(flow):
+                missing.append((rule, priority))
+                continue
+            counters[(rule, priority)] = (flow.get('packet_count', 0), flow.get('byte_count', 0))
+            if require_traffic and not flow.get('packet_count', 0):
+                missing.append((rule, priority))
+        return missing, counters
+
+    # poll the bridges until every rule of expected [(rule, priority)] is installed, or timeout seconds.
+    # require_traffic: also wait until every rule has matched packets
+    def wait(self, expected, timeout=VERIFY_TIMEOUT, require_traffic=False,
+             first_interval=FIRST_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL, backoff=BACKOFF):
+        start = time.monotonic()
+        deadline = start + timeout
+        missing = list(expected)
+        counters = {}
+        interval = first_interval
+        polls = 0
+        while True:
+            # only the bridges with rules still missing are read again
+            snapshot = self.snapshot({rule.dpid for rule, priority in missing})
+            polls += 1
+            missing, found = self.check(missing, snapshot, require_traffic=require_traffic)
+            counters.update(found)
+            now = time.monotonic()
+            if not missing or now + interval > deadline:
+                return VerificationResult(not missing, now - start, polls, missing, counters)
+            time.sleep(interval)
+            interval = min(interval * backoff, max_interval)
+
+    # same as wait for the rules of one priority, e.g. the rules of a path
+    def wait_rules(self, rules, priority, timeout=VERIFY_TIMEOUT, require_traffic=False):
+        return self.wait([(rule, priority) for rule in rules], timeout=timeout, require_traffic=require_traffic)
+
+
+def print_verification(result, label='flows'):
+    print(label + (' confirmed' if result.confirmed else ' not confirmed (' + str(len(result.missing)) + ' missing)')
+          + ' after ' + '{:.2f}'.format(result.elapsed * 1e3) + ' ms, ' + str(result.polls) + ' polls')
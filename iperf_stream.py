@@ -0,0 +1,188 @@
+'''
+Streaming collection of the iperf3 results over SSH.
+
+This module:
+- takes the output of the iperf3 client started with per-interval reports flushed as they happen
+  (iperf_stream_command in ssh_flow_management.py), either line-delimited JSON (--json-stream,
+  iperf3 >= 3.17) or the text report (--forceflush)
+- reads the output of the client through its SSH channel while the test runs,
+  without waiting for the end of the test
+- parses each interval as soon as it arrives into a compact time series (arrays of floats),
+  so the throughput around the reconfiguration is available live and right after the run.
+
+The stdout of a pssh command is read by a gevent greenlet, so it is only consumed while the
+main thread waits cooperatively (VMSessionManager.idle), not while it is blocked in time.sleep.
+
+Usage:
+    results = sessions.run({'2': iperf_stream_command(t=20, ip_s='10.0.0.3')}, wait=False)
+    collector = IperfStreamCollector({'2': results['2']['output']})
+    collector.start()
+    sessions.idle(25)
+    print(collector.series['2'].summary())
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import json
+import re
+import time
+from array import array
+
+import gevent
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# report interval of iperf3, in seconds
+REPORT_INTERVAL = 0.1
+
+# multipliers of the units of the text report
+UNITS = {'': 1, 'K': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12}
+
+# one interval of the text report, e.g.
+# [  5]   0.00-0.10   sec   112 MBytes   941 Mbits/sec    0    405 KBytes
+INTERVAL_LINE = re.compile(r'^\[\s*(?P<id>\d+|SUM)\]\s+(?P<start>[\d.]+)-(?P<end>[\d.]+)\s+sec\s+'
+                           r'(?P<bytes>[\d.]+)\s+(?P<bytes_unit>[KMGT]?)Bytes\s+'
+                           r'(?P<rate>[\d.]+)\s+(?P<rate_unit>[KMGT]?)bits/sec'
+                           r'(?:\s+(?P<retransmits>\d+))?')
+
+
+class ThroughputSeries:
+    '''
+    Time series of the iperf3 intervals, one array per column.
+        start, end: interval boundaries in seconds from the start of the test (iperf3 clock)
+        received: time.monotonic() when the interval was read on this side
+        bits_per_second, bytes, retransmits: values of the interval
+    '''
+
+    def __init__(self):
+        self.start = array('d')
+        self.end = array('d')
+        self.received = array('d')
+        self.bits_per_second = array('d')
+        self.bytes = array('d')
+        self.retransmits = array('d')
+
+    def append(self, start, end, bits_per_second, n_bytes, retransmits=0, received=None):
+        self.start.append(start)
+        self.end.append(end)
+        self.received.append(time.monotonic() if received is None else received)
+        self.bits_per_second.append(bits_per_second)
+        self.bytes.append(n_bytes)
+        self.retransmits.append(retransmits)
+
+    def __len__(self):
+        return len(self.start)
+
+    # (start, end, bits_per_second) of the last interval, None before the first one
+    def last(self):
+        if not self.start:
+            return None
+        return self.start[-1], self.end[-1], self.bits_per_second[-1]
+
+    # intervals ending between t_from and t_to (iperf3 clock), as (start, end, bits_per_second)
+    def between(self, t_from, t_to):
+        return [(self.start[i], self.end[i], self.bits_per_second[i])
+                for i in range(len(self.start)) if t_from <= self.end[i] <= t_to]
+
+    def summary(self):
+        if not self.start:
+            return {'intervals': 0}
+        rates = self.bits_per_second
+        return {'intervals': len(rates),
+                'duration': self.end[-1] - self.start[0],
+                'mean_bps': sum(self.bytes) * 8 / (self.end[-1] - self.start[0]),
+                'min_bps': min(rates),
+                'min_at': self.end[rates.index(min(rates))],
+                'max_bps': max(rates),
+                'retransmits': int(sum(self.retransmits))}
+
+
+class IperfStreamParser:
+    '''
+    Parses the iperf3 client output line by line into a ThroughputSeries.
+    Accepts both the --json-stream events and the text report.
+    '''
+
+    def __init__(self, series=None, on_sample=None):
+        self.series = series if series is not None else ThroughputSeries()
+        self.on_sample = on_sample
+        self.end = None
+
+    def feed(self, line):
+        line = line.strip()
+        if not line:
+            return None
+        if line.startswith('{'):
+            return self.feed_json(line)
+        return self.feed_text(line)
+
+    def feed_json(self, line):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        if event.get('event') == 'interval':
+            total = event['data']['sum']
+            return self.add(total['start'], total['end'], total['bits_per_second'],
+                            total['bytes'], total.get('retransmits', 0))
+        if event.get('event') == 'end':
+            self.end = event['data']
+        return None
+
+    def feed_text(self, line):
+        match = INTERVAL_LINE.match(line)
+        # the final summary lines end with sender/receiver, they are not intervals
+        if match is None or line.endswith('sender') or line.endswith('receiver'):
+            return None
+        return self.add(float(match.group('start')), float(match.group('end')),
+                        float(match.group('rate')) * UNITS[match.group('rate_unit')],
+                        float(match.group('bytes')) * UNITS[match.group('bytes_unit')],
+                        int(match.group('retransmits') or 0))
+
+    def add(self, start, end, bits_per_second, n_bytes, retransmits):
+        self.series.append(start, end, bits_per_second, n_bytes, retransmits)
+        if self.on_sample is not None:
+            self.on_sample(start, end, bits_per_second)
+        return start, end, bits_per_second
+
+
+class IperfStreamCollector:
+    '''
+    Reads the output of several iperf3 clients at the same time, one greenlet per client.
+        outputs: {vm_id: pssh HostOutput of the iperf3 client}
+        on_sample: optional callback(vm_id, start, end, bits_per_second) for every interval
+    The time series are in self.series[vm_id].
+    '''
+
+    def __init__(self, outputs, on_sample=None):
+        self.outputs = outputs
+        self.series = {}
+        self.parsers = {}
+        for vm_id in outputs:
+            callback = None
+            if on_sample is not None:
+                callback = (lambda vm: lambda start, end, bps: on_sample(vm, start, end, bps))(vm_id)
+            self.parsers[vm_id] = IperfStreamParser(on_sample=callback)
+            self.series[vm_id] = self.parsers[vm_id].series
+        self.greenlets = []
+
+    def follow(self, vm_id):
+        for line in self.outputs[vm_id].stdout:
+            self.parsers[vm_id].feed(line)
+
+    def start(self):
+        self.greenlets = [gevent.spawn(self.follow, vm_id) for vm_id in self.outputs]
+        return self.greenlets
+
+    # wait for the end of the iperf3 outputs
+    def join(self, timeout=None):
+        gevent.joinall(self.greenlets, timeout=timeout)
+
+    def finished(self):
+        return all(greenlet.ready() for greenlet in self.greenlets)
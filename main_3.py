@@ -7,6 +7,7 @@ This script:
 - Connects via SSH to the virtual machines through the gateways node1 and node2
 - manipulates the flows from the ToR through RYU SDN controller app REST API OFCTL_REST
 - handles MEMS optical switch reconfiguration through SCPI protocol
+- builds the scenario of TEST_TYPE from the settings below and runs it with experiment_runner.py
 
 Experiment topology 3
 vm1 -------- bridge1 ------------------bridge4 ----------- vm4
@@ -24,31 +25,33 @@ vm2 -------- bridge2                    bridge3 ----------- vm3
 import libraries
 ====================================
 '''
-
-from ssh_flow_management import *
-import json
-import threading
-import time
+from experiment_runner import ExperimentRunner, check_scenario
 
 '''
 ====================================
 DEFINITIONS
 ====================================
 '''
-
-'''
-define gateways and vms in the json file
-gateways:   {ID: [IP, username, password]}
-vms:        {ID: [IP, username, password, Gateway ID]} where gw id is the host server ID for the VM
-'''
-
 NUM_EXPERIMENTS = 20
+
 IPERF_TIME = 20  # duration of the experiment, in seconds.
 #Except for bandwidth steering (dual),the following times are 5+1, 10+1, 15+1 to compensate the delay of initialization steps
 MAKE_BEFORE_BREAK_1 = 11 # open flow switch traffic to backup links before optical reconfiguration
 RECONFIGURATION_1 = 11.05
 MAKE_BEFORE_BREAK_2 = 12.05 # open_flow switch traffic to main links after optical reconfiguration
 dt = 0.05 # for soft flow handoff (add lower priority flow at T-dt before deleting higher priority flow at T)
+# atomic make before break: install the new path at higher priority, confirm it on the switches, then delete the old one.
+# the priorities are allocated by the flow index from the path registered by reconcile_flows as 'vm2-vm3'.
+# the handoff starts at T-dt and takes as long as needed, instead of a fixed dt between add and delete.
+# opt-in: off, the handoffs add and delete the flows at fixed times as before
+ATOMIC_HANDOFF = False
+# schedule the handoffs around RECONFIGURATION_1 from the measured latencies of the flow installs, deletes and
+# OTS switching (reconfiguration_planner.py) instead of MAKE_BEFORE_BREAK_1-dt and MAKE_BEFORE_BREAK_2-dt.
+# the latencies of every run are added to the profile and the plan is updated for the next one.
+# opt-in: off, the handoffs keep the fixed times above
+PLAN_RECONFIGURATION = False
+LATENCY_PROFILE_FILE = 'latency_profile.json'
+PROFILE_REPEATS = 20  # measurements before the first run when the profile file is empty
 BW_IPERF_1 = ''  #  data rate of stream of data #1, between vm2 and vm3
 BW_IPERF_2 = ''  #  data rate of stream of data #2, between vm1 and vm4
 
@@ -58,41 +61,38 @@ BW_IPERF_2 = ''  #  data rate of stream of data #2, between vm1 and vm4
 TEST_TYPE = 'dual_ost_v3'
 
 TCP_CAPTURE=True
+# summarize the captures on the VMs after each run and pull back only the summaries (a few kB),
+# the pcap files stay in the tcpdump directory of credentials.json on the VMs.
+# opt-in: off, the captures are left on the VMs as before
+REMOTE_SUMMARY = False
+
+# iperf3 per-interval reports streamed back while the test runs, in seconds.
+# --json-stream needs iperf3 >= 3.17 on the VMs, otherwise the text report is parsed
+IPERF_INTERVAL = 0.1
+IPERF_JSON_STREAM = True
+
+# directory of the timeline files (iperf samples, actions and controller round trip times of each run),
+# of the telemetry and of the capture summaries
+OUTPUT_DIRECTORY = ''
+
+# sample the flow and port counters of the bridges during each run (see flow_telemetry.py), in seconds.
+# off by default: the polling loads the controller and the switches during the handoffs of the experiment
+TELEMETRY = False
+TELEMETRY_INTERVAL = 0.05
+
+# start tcpdump and the iperf clients of all the VMs at the same instant, from the clock offsets of the VMs,
+# instead of one after the other with the SSH latency between them (see clock_sync.py).
+# opt-in: off, the commands are sent one VM after the other as before
+SYNCHRONIZED_START = False
 
 # ports for optical reconfiguration
 PORTS_OTS_BEFORE = [[21, 22, 23, 24], [54, 53, 56, 55]]
 PORTS_OTS_AFTER = [[22, 23], [55, 54]]
 
-# Load credentials file
-credentials = json.load(open('credentials.json'))
-
-# define the URL of the sdn controller app ofctl_rest
-OFCTL_REST_IP = credentials['ip']
-ADD_FLOW_URI = credentials['add_flow']
-CLEAR_FLOWS_URI = credentials['clear_flow']
-DELETE_FLOWS_URI = credentials['delete_flow']
-
-# datapath ID of virtual bridges in pica8 switch
-DPID_BR1 = int(credentials['dpid'][0])
-DPID_BR2 = int(credentials['dpid'][1])
-DPID_BR3 = int(credentials['dpid'][2])
-DPID_BR4 = int(credentials['dpid'][3])
-
-# define the gateway and vm credentials for ssh
-gateway_credentials = credentials['gateway_credentials']
-vm_credentials = credentials['vm_credentials']
-
-# IP of the optical switch for the TCP socket
-ip_ots = credentials["ip_ots"]
-port_ots = credentials["port_ots"]
-
-# tcpdump directory, do not forget to create this in the server before running tcpdump remotely
-TCP_TEST_DIRECTORY = credentials['tcpdump_file_datapath']
-
 '''
 ===========================================
 
-Experiment topology 2
+Experiment topology 3
 vm1 -------- bridge1 ------------------bridge4 ----------- vm4 
 				|							|
 				|____________   ____________|
@@ -103,145 +103,57 @@ vm2 -------- bridge2                    bridge3 ----------- vm3
 
 ===========================================
 '''
-# Open TCP socket with Optical switch and create connections
-s = ots_connect_tcp_socket(ip=ip_ots, port=port_ots)
-
-# Connect to gateways (host servers) and virtual machines (guest vm)
-gws, vms = connect_to_vms_pssh(gateway_credentials=gateway_credentials,
-                               vm_credentials=vm_credentials)
-
-#execute these dummy console commands on the servers to avoid a long execution time the next time another command is executed.
-hostname(vms['1'])
-hostname(vms['2'])
-hostname(vms['3'])
-hostname(vms['4'])
-
-#run iperf out of the for loop, so it is executed only once.
-#iperf_s(vms['3'])
-
-#wait a few seconds for ssh connections to be ready
-#time.sleep(3)
-
-
-
-for i in range(0, NUM_EXPERIMENTS):
-    start_overall=time.time()
-    print("*****starting experiment " + str(i + 1) + "*****")
-    # clear flow tables for all bridges
-    # Do not forget to check that all the bridges are connected to the controller.
-    start=time.time()
-    del_all_flows(DPID_BR1)
-    del_all_flows(DPID_BR2)
-    del_all_flows(DPID_BR3)
-    del_all_flows(DPID_BR4)
-    end=time.time()
-    print("elapsed time for resetting flows: " + str(end - start))
-    print("---reset flows on all bridges---")
-
-    # create optical links
-    start=time.time()
-    ots_connect_port(s, port_in=PORTS_OTS_BEFORE[0], port_out=PORTS_OTS_BEFORE[1])
-    end=time.time()
-    print("elapsed time for resetting optical connections: " + str(end - start))
-    print("---reset optical connections---")
-
-    start = time.time()
-    # link between servers 1 and 4 through bridges 1 and 4.
-    if 'dual' in TEST_TYPE:  # run tcpdump on vm1 if dual test for bandwidth steering experiment
-        edit_flows_vm1_vm4_short_path(action='ADD', priority=9)
-
-    # link between servers 2 and 3 through bridges 2,1,4,3, passing through optical switch (long path)
-    edit_flows_vm2_vm3_long_path(action='ADD', priority=8)
-    end=time.time()
-    print("elapsed time for installing initial flows on ToR: " + str(end - start))
-
-    # Now create the array that will store the thread timers for reconfiguration.
-    thread_instance = []
-
-    '''
-    Make before break
-    '''
-    start=time.time()
-    # 1. Send the traffic to backup links.
-    if 'mbb' in TEST_TYPE:
-        openflow_switch_traffic_1 = threading.Timer(MAKE_BEFORE_BREAK_1-dt,
-                                                    edit_flows_vm2_vm3_long_path_backup,
-                                                    args=("ADD", 6,))
-        openflow_switch_traffic_1_1 = threading.Timer(MAKE_BEFORE_BREAK_1,
-                                                    edit_flows_vm2_vm3_long_path,
-                                                    args=("DELETE", 8,))
-    # 2.  Reconfigure link between vm2 and vm3 by creating new links on optical switch
-    # https://stackoverflow.com/questions/25734595/python-threading-confusing-code-int-object-is-not-callable
-    reconfigure = threading.Timer(RECONFIGURATION_1,
-                                  ots_connect_port,
-                                  args=(s, PORTS_OTS_AFTER[0], PORTS_OTS_AFTER[1],))
-
-    # 3. Send the traffic back to reconfigured link through optical switch.
-    if 'mbb' in TEST_TYPE:
-        openflow_switch_traffic_2 = threading.Timer(MAKE_BEFORE_BREAK_2-dt,
-                                                    edit_flows_vm2_vm3_long_path,
-                                                    args=("ADD", 4,))
-        openflow_switch_traffic_2_1 = threading.Timer(MAKE_BEFORE_BREAK_2,
-                                                    edit_flows_vm2_vm3_long_path_backup,
-                                                    args=("DELETE", 6,))
-
-    end=time.time()
-    print("elapsed time for initializing threading timers: " + str(end - start))
-    # run packet capture
-    # This works once you add the user to a group with permissions to run tcpdump without sudo
-    # https://askubuntu.com/questions/530920/tcpdump-permissions-problem
-    ####tcpdump_vm(vms['1'],endpoints='vm1vm4', test_type=TEST_TYPE,t=IPERF_TIME+3, directory=TCP_TEST_DIRECTORY, bw=BW_IPERF_2)
-
-    if TCP_CAPTURE:
-        # tcpdump on tx
-        start=time.time()
-        tcpdump_vm(vms['2'],
-                   endpoints='vm2vm3)tx',
-                   test_type=TEST_TYPE,
-                   t=IPERF_TIME + 3,
-                   directory=TCP_TEST_DIRECTORY,
-                   bw=BW_IPERF_1)
-        if 'dual' in TEST_TYPE: #run tcpdump on vm1 if dual test for bandwidth steering experiment
-            tcpdump_vm(vms['1'],
-                       endpoints='vm1vm4)tx',
-                       test_type=TEST_TYPE,
-                       t=IPERF_TIME + 3,
-                       directory=TCP_TEST_DIRECTORY,
-                       bw=BW_IPERF_2)
-        end=time.time()
-        print("elapsed time for executing tcpdump: " + str(end - start))
-        # tcpdump on rx
-        # tcpdump_vm(vms['3'],endpoints='vm2vm3)rx', test_type=TEST_TYPE, t=IPERF_TIME+3,  directory=TCP_TEST_DIRECTORY, bw=BW_IPERF_1)
-
-
-    start = time.time()
-    # run iperf
-    if 'dual' in TEST_TYPE:  # run tcpdump on vm1 if dual test for bandwidth steering experiment
-        iperf_s(vms['4'])
-    iperf_s(vms['3'])
-    if 'dual' in TEST_TYPE:  # run tcpdump on vm1 if dual test for bandwidth steering experiment
-        iperf_c(vms['1'], t=IPERF_TIME, b=BW_IPERF_2, ip_s='10.0.0.4')
-    iperf_c(vms['2'], t=IPERF_TIME, b=BW_IPERF_1, ip_s='10.0.0.3')
-
-    end = time.time()
-    print("elapsed time for executing iperf commands: "+str(end-start))
-    # start threads after running iperf and tcpdump for accurate reconfiguration at the desired time
-    reconfigure.start()
-    if 'mbb' in TEST_TYPE:
-        openflow_switch_traffic_1.start()
-        openflow_switch_traffic_1_1.start()
-        openflow_switch_traffic_2.start()
-        openflow_switch_traffic_2_1.start()
-
-    thread_instance.extend([reconfigure])
-    if 'mbb' in TEST_TYPE:
-        thread_instance.extend([openflow_switch_traffic_1, openflow_switch_traffic_1_1,
-                                openflow_switch_traffic_2, openflow_switch_traffic_2_1])
-    #print(thread_instance)
-    for thread in thread_instance:
-        thread.join()
-
-    time.sleep(IPERF_TIME+5)
-    end_overall=time.time()
-    print("experiment took: "+str(end_overall-start_overall))
-    print("*****done experiment " + str(i+1) + "*****")
+# link between servers 2 and 3 through bridges 2,1,4,3, passing through optical switch (long path)
+flows = [{'src': 'vm2', 'dst': 'vm3', 'path': 'long', 'priority': 8, 'bandwidth': BW_IPERF_1}]
+if 'dual' in TEST_TYPE:  # link between servers 1 and 4 through bridges 1 and 4 for bandwidth steering experiment
+    flows.append({'src': 'vm1', 'dst': 'vm4', 'path': 'trunk1', 'priority': 9, 'bandwidth': BW_IPERF_2})
+
+# timeline of reconfiguration actions. handoff 1 and 2 are moved by the plan when PLAN_RECONFIGURATION is set
+timeline = []
+# 1. Send the traffic to backup links.
+if 'mbb' in TEST_TYPE and ATOMIC_HANDOFF:
+    timeline.append({'at': MAKE_BEFORE_BREAK_1 - dt, 'action': 'transition_path', 'args': ['vm2-vm3', 'long_backup'],
+                     'name': 'handoff to backup path', 'handoff': 1})
+elif 'mbb' in TEST_TYPE:
+    timeline.append({'at': MAKE_BEFORE_BREAK_1 - dt, 'action': 'edit_route_flows',
+                     'args': ['vm2', 'vm3', 'long_backup', 'ADD', 6], 'name': 'add backup path', 'handoff': 1})
+    timeline.append({'at': MAKE_BEFORE_BREAK_1, 'action': 'edit_route_flows',
+                     'args': ['vm2', 'vm3', 'long', 'DELETE', 8], 'name': 'delete long path',
+                     'handoff': 1, 'after_dt': True})
+# 2.  Reconfigure link between vm2 and vm3 by creating new links on optical switch
+timeline.append({'at': RECONFIGURATION_1, 'action': 'ots_connect', 'args': PORTS_OTS_AFTER, 'name': 'OTS connect'})
+# 3. Send the traffic back to reconfigured link through optical switch.
+if 'mbb' in TEST_TYPE and ATOMIC_HANDOFF:
+    timeline.append({'at': MAKE_BEFORE_BREAK_2 - dt, 'action': 'transition_path', 'args': ['vm2-vm3', 'long'],
+                     'name': 'handoff to long path', 'handoff': 2})
+elif 'mbb' in TEST_TYPE:
+    timeline.append({'at': MAKE_BEFORE_BREAK_2 - dt, 'action': 'edit_route_flows',
+                     'args': ['vm2', 'vm3', 'long', 'ADD', 4], 'name': 'add long path', 'handoff': 2})
+    timeline.append({'at': MAKE_BEFORE_BREAK_2, 'action': 'edit_route_flows',
+                     'args': ['vm2', 'vm3', 'long_backup', 'DELETE', 6], 'name': 'delete backup path',
+                     'handoff': 2, 'after_dt': True})
+
+plan = None
+if PLAN_RECONFIGURATION and 'mbb' in TEST_TYPE:
+    plan = {'mode': 'atomic' if ATOMIC_HANDOFF else 'legacy',
+            'profile': LATENCY_PROFILE_FILE,
+            'repeats': PROFILE_REPEATS,
+            'measure': ['vm2', 'vm3', 'long_backup']}
+
+scenario = check_scenario({'test_type': TEST_TYPE,
+                           'repetitions': NUM_EXPERIMENTS,
+                           'iperf_time': IPERF_TIME,
+                           'iperf_interval': IPERF_INTERVAL,
+                           'iperf_json_stream': IPERF_JSON_STREAM,
+                           'capture': TCP_CAPTURE,
+                           'remote_summary': REMOTE_SUMMARY,
+                           'telemetry': TELEMETRY,
+                           'telemetry_interval': TELEMETRY_INTERVAL,
+                           'synchronized_start': SYNCHRONIZED_START,
+                           'ots_before': PORTS_OTS_BEFORE,
+                           'output_directory': OUTPUT_DIRECTORY,
+                           'flows': flows,
+                           'timeline': timeline,
+                           'plan': plan}, name=TEST_TYPE)
+
+ExperimentRunner(scenario).run()
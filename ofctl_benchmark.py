@@ -0,0 +1,263 @@
+'''
+Benchmark of the flow rule installation through the OFCTL_REST API.
+
+This script:
+- starts a local stand-in OFCTL_REST server (ofctl_rest_simulator.py), no testbed needed,
+  optionally with a latency model of the controller (--latency, --jitter, --serialize)
+- installs the same flow rules in several modes:
+    sequential: a new TCP connection per rule (module-level requests.post)
+    pooled:     one rule at a time over the keep-alive client (OfctlClient)
+    concurrent: every rule posted on its own, up to POOL_SIZE in flight
+    batched:    rules posted by paths of BATCH_SIZE rules with post_batch (edit_path_flows)
+- deletes the rules of each mode (delete_strict) before the next one, so the bridge is left as it was
+- prints the throughput and the p50/p95/p99 latency per rule of each mode and writes them,
+  with a latency histogram, to a JSON file so runs can be compared
+- measures the throughput of the flow payload generation (--payloads): string concatenation,
+  json.dumps of a dict per rule, and the cached templates of ofctl_client.flow_payload
+
+Usage:
+    python ofctl_benchmark.py --rules 1000 --output results.json
+    python ofctl_benchmark.py --modes pooled batched --url http://ip_ryu_controller:8080/ --dpid 5
+    python ofctl_benchmark.py --payloads 100000
+    python ofctl_benchmark.py --latency 1 --jitter 0.2 --serialize
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import bisect
+import datetime
+import json
+import statistics
+import time
+
+import requests
+
+from ofctl_client import OfctlClient, ADD_FLOW_URI, POOL_SIZE, flow_payload, flow_payload_dict
+from ofctl_rest_simulator import LatencyModel, start_simulator, simulator_url
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+NUM_RULES = 500
+# bridge of the simulator. Against a real controller the bridge must be given (--dpid), a scratch one
+DPID = 1
+# match of the benchmark rules, in the benchmarking range of RFC 2544 (198.18.0.0/15): the rules never
+# match the traffic of the VMs (10.0.0.x), even on a bridge of the experiments
+BENCHMARK_IP_SRC = '198.18.0.1'
+BENCHMARK_IP_DST = '198.18.0.2'
+# rules per batch in the batched mode, the 8 rules of a 4-bridge path
+BATCH_SIZE = 8
+# upper edges of the latency histogram bins, in ms
+HISTOGRAM_BINS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+RESULTS_FILE = 'ofctl_benchmark_results.json'
+
+
+def benchmark_payloads(num_rules, dpid=DPID, action='ADD'):
+    return [flow_payload(dpid=dpid, action=action, in_port=1, out_port=5,
+                         ip_src=BENCHMARK_IP_SRC, ip_dst=BENCHMARK_IP_DST, priority=i % 65535)
+            for i in range(num_rules)]
+
+
+# delete the rules posted by a mode, out of the measurement
+def delete_benchmark_rules(base_url, num_rules, dpid=DPID):
+    client = OfctlClient(base_url)
+    responses = client.delete_flows(benchmark_payloads(num_rules, dpid=dpid, action='DELETE'))
+    client.close()
+    refused = sum(1 for response in responses if response.status_code != 200)
+    if refused:
+        print(str(refused) + ' benchmark rules could not be deleted from bridge ' + str(dpid))
+
+
+# payload built by string concatenation, as ofctl_flow_payload did before the cached templates
+def string_flow_payload(dpid, action, in_port, out_port, ip_src, ip_dst, priority=10):
+    if action == 'ADD':
+        type_str_begin = '"instructions": [{"type": "APPLY_ACTIONS",'
+        type_str_end = '}] '
+        output_match = ''
+    else:
+        type_str_begin = ''
+        type_str_end = ''
+        output_match = '"out_port": ' + str(out_port) + ','
+    return '{"dpid":' + str(dpid) + ', "table_id": 0, "priority": ' + str(priority) + \
+           ', "match":{"in_port":' + str(in_port) + ',' + output_match + \
+           '"dl_type":0x0800, "nw_src":"' + ip_src + '", "nw_dst":"' + ip_dst + '"},' + \
+           type_str_begin + '"actions": [{"port": ' + str(out_port) + ', "type": "OUTPUT"}]' + type_str_end + '}'
+
+
+def dict_flow_payload(dpid, action, in_port, out_port, ip_src, ip_dst, priority=10):
+    return json.dumps(flow_payload_dict(dpid, action, in_port, out_port, ip_src, ip_dst, priority)).encode('utf-8')
+
+
+# payloads per second of each builder. The same 8 rules of a path are built over and over with
+# changing priorities, as in flow_insertion_delay.py and the make before break layers.
+def run_payload_generation(num_payloads):
+    hops = [(1, 1, 5), (1, 5, 1), (4, 6, 4), (4, 4, 6), (2, 2, 22), (2, 22, 2), (3, 23, 3), (3, 3, 23)]
+    results = {}
+    for name, builder in [('string concatenation', string_flow_payload),
+                          ('dict + json.dumps', dict_flow_payload),
+                          ('cached template', flow_payload)]:
+        start = time.perf_counter()
+        for i in range(num_payloads):
+            dpid, in_port, out_port = hops[i % len(hops)]
+            builder(dpid=dpid, action='ADD', in_port=in_port, out_port=out_port,
+                    ip_src='10.0.0.1', ip_dst='10.0.0.4', priority=i % 100)
+        results[name] = num_payloads / (time.perf_counter() - start)
+        print(name + ': ' + '{:.0f}'.format(results[name]) + ' payloads/s')
+    return results
+
+
+# one new TCP connection per rule, as the module-level requests.post does
+def run_sequential(base_url, payloads):
+    latencies = []
+    for payload in payloads:
+        start = time.perf_counter()
+        requests.post(url=base_url + ADD_FLOW_URI, data=payload)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# one persistent connection reused for all the rules
+def run_pooled(base_url, payloads):
+    client = OfctlClient(base_url)
+    client.warm_up()
+    latencies = []
+    for payload in payloads:
+        start = time.perf_counter()
+        client.add_flow(payload)
+        latencies.append(time.perf_counter() - start)
+    client.close()
+    return latencies
+
+
+# every rule is posted on its own by the pooled client, up to POOL_SIZE rules in flight
+def run_concurrent(base_url, payloads):
+    client = OfctlClient(base_url)
+    client.warm_up()
+
+    def timed_post(payload):
+        start = time.perf_counter()
+        client.add_flow(payload)
+        return time.perf_counter() - start
+
+    latencies = list(client.executor.map(timed_post, payloads))
+    client.close()
+    return latencies
+
+
+# the rules are posted in batches of batch_size (a path), the latency of a rule is the time
+# until its whole batch is acknowledged, as seen by edit_path_flows
+def run_batched(base_url, payloads, batch_size=BATCH_SIZE):
+    client = OfctlClient(base_url)
+    client.warm_up()
+    latencies = []
+    for i in range(0, len(payloads), batch_size):
+        batch = payloads[i:i + batch_size]
+        start = time.perf_counter()
+        client.add_flows(batch)
+        latencies.extend([time.perf_counter() - start] * len(batch))
+    client.close()
+    return latencies
+
+
+MODES = {'sequential': run_sequential,
+         'pooled': run_pooled,
+         'concurrent': run_concurrent,
+         'batched': run_batched}
+
+
+# nearest-rank percentile of a sorted list
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+# number of latencies in each bin, the last bin holds everything above the last edge
+def latency_histogram(latencies, bins_ms=HISTOGRAM_BINS_MS):
+    counts = [0] * (len(bins_ms) + 1)
+    for latency in latencies:
+        counts[bisect.bisect_left(bins_ms, latency * 1e3)] += 1
+    return {'bins_ms': list(bins_ms), 'counts': counts}
+
+
+def summarize(latencies, wall_time):
+    values = sorted(latencies)
+    return {'rules': len(values),
+            'wall_time': wall_time,
+            'throughput': len(values) / wall_time if wall_time > 0 else None,
+            'latency_ms': {'mean': statistics.mean(values) * 1e3,
+                           'p50': percentile(values, 50) * 1e3,
+                           'p95': percentile(values, 95) * 1e3,
+                           'p99': percentile(values, 99) * 1e3,
+                           'max': values[-1] * 1e3},
+            'histogram': latency_histogram(values)}
+
+
+def run_benchmark(base_url, num_rules=NUM_RULES, modes=tuple(MODES), dpid=DPID):
+    payloads = benchmark_payloads(num_rules, dpid=dpid)
+    results = {}
+    for mode in modes:
+        start = time.perf_counter()
+        latencies = MODES[mode](base_url, payloads)
+        results[mode] = summarize(latencies, time.perf_counter() - start)
+        print_summary(mode, results[mode])
+        delete_benchmark_rules(base_url, num_rules, dpid=dpid)
+    return results
+
+
+def print_summary(name, summary):
+    latency = summary['latency_ms']
+    print(name + ': ' + '{:.0f}'.format(summary['throughput']) + ' rules/s'
+          + ', p50 ' + '{:.3f}'.format(latency['p50']) + ' ms'
+          + ', p95 ' + '{:.3f}'.format(latency['p95']) + ' ms'
+          + ', p99 ' + '{:.3f}'.format(latency['p99']) + ' ms'
+          + ', max ' + '{:.3f}'.format(latency['max']) + ' ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Flow insertion throughput and latency through OFCTL_REST')
+    parser.add_argument('--rules', type=int, default=NUM_RULES, help='number of flow rules per mode')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--url', default='', help='OFCTL_REST URL, a local simulator is started if empty')
+    parser.add_argument('--dpid', type=int, default=None,
+                        help='bridge receiving the rules, required with --url (use a scratch bridge)')
+    parser.add_argument('--output', default=RESULTS_FILE, help='JSON file with the results')
+    parser.add_argument('--payloads', type=int, default=0,
+                        help='only benchmark the generation of this number of payloads')
+    parser.add_argument('--latency', type=float, default=0.0, help='delay of the simulator replies, in ms')
+    parser.add_argument('--jitter', type=float, default=0.0, help='standard deviation of the delay, in ms')
+    parser.add_argument('--serialize', action='store_true', help='the simulator handles one request at a time')
+    args = parser.parse_args()
+
+    if args.payloads:
+        run_payload_generation(args.payloads)
+        raise SystemExit(0)
+
+    if args.url and args.dpid is None:
+        parser.error('--url needs the --dpid of a scratch bridge, the benchmark fills its flow table')
+    dpid = args.dpid if args.dpid is not None else DPID
+
+    if args.url:
+        base_url = args.url
+    else:
+        server = start_simulator(latency_model=LatencyModel(args.latency / 1e3, args.jitter / 1e3,
+                                                           serialize=args.serialize))
+        base_url = simulator_url(server)
+
+    results = {'url': base_url,
+               'rules': args.rules,
+               'dpid': dpid,
+               'batch_size': BATCH_SIZE,
+               'pool_size': POOL_SIZE,
+               'date': datetime.datetime.now().isoformat(),
+               'modes': run_benchmark(base_url, num_rules=args.rules, modes=args.modes, dpid=dpid)}
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('results written to ' + args.output)
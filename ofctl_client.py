@@ -0,0 +1,196 @@
+'''
+Client for the OFCTL_REST app of the Ryu controller.
+
+This module:
+- keeps a single persistent HTTP session with the controller, so every flow rule
+  reuses an already open (keep-alive) TCP connection instead of opening a new one.
+- pools the connections, so several threads can talk to the controller at the same time.
+- posts batches of flow rules concurrently, a whole path costs one round trip instead of one per rule.
+- builds the flow payloads as JSON bytes from cached templates, each rule is serialized once.
+
+The client does not read credentials.json, the URIs are passed by the caller
+(see ssh_flow_management.py), so it can also be used against a local stand-in
+server (see ofctl_rest_simulator.py).
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# default URIs of the OFCTL_REST app, same as in credentials.json
+ADD_FLOW_URI = 'stats/flowentry/add'
+DELETE_FLOW_URI = 'stats/flowentry/delete_strict'
+MODIFY_FLOW_URI = 'stats/flowentry/modify_strict'
+FLOW_STATS_URI = 'stats/flow/'
+PORT_STATS_URI = 'stats/port/'
+CLEAR_FLOWS_URI = 'stats/flowentry/clear/'
+
+# maximum number of connections kept open with the controller
+POOL_SIZE = 16
+
+# number of (dpid, match, action) payload templates kept in memory
+TEMPLATE_CACHE_SIZE = 4096
+
+# ethertype of IPv4, the flows match IPv4 traffic between two hosts
+ETH_TYPE_IP = 0x0800
+
+
+'''
+====================================
+Flow payloads
+====================================
+'''
+
+# payload of one flow rule as a dict, in the format expected by OFCTL_REST
+def flow_payload_dict(dpid, action, in_port, out_port, ip_src, ip_dst, priority=10):
+    payload = {'dpid': int(dpid),
+               'table_id': 0,
+               'priority': int(priority),
+               'match': {'in_port': int(in_port),
+                         'dl_type': ETH_TYPE_IP,
+                         'nw_src': ip_src,
+                         'nw_dst': ip_dst}}
+    if action == 'ADD':
+        payload['instructions'] = [{'type': 'APPLY_ACTIONS',
+                                    'actions': [{'port': int(out_port), 'type': 'OUTPUT'}]}]
+    else:
+        # out_port is not a match field, delete_strict takes it at the top level
+        payload['out_port'] = int(out_port)
+    return payload
+
+
+# pre-serialized payload of a (dpid, match, action), split around the priority,
+# which is the only field that changes between the layers of make before break.
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def flow_payload_template(dpid, action, in_port, out_port, ip_src, ip_dst):
+    payload = flow_payload_dict(dpid, action, in_port, out_port, ip_src, ip_dst)
+    del payload['priority']
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return b'{"priority":', b',' + body[1:]
+
+
+# serialized payload of one flow rule (bytes), the template is built only once per rule
+def flow_payload(dpid, action, in_port, out_port, ip_src, ip_dst, priority=10):
+    head, tail = flow_payload_template(dpid, action, in_port, out_port, ip_src, ip_dst)
+    return head + str(int(priority)).encode('utf-8') + tail
+
+
+class OfctlClient:
+    '''
+    Pooled keep-alive HTTP client for the OFCTL_REST app.
+        base_url: URL of the controller, e.g. 'http://ip_ryu_controller:8080/'
+        pool_size: maximum number of simultaneous connections kept open
+        timeout: timeout in seconds for each request, None waits forever
+    on_request, optional: callback(uri, sent, rtt, status_code) called after every request,
+        sent in time.monotonic() seconds and rtt in seconds, e.g. to log the controller round trip times
+    '''
+
+    def __init__(self, base_url,
+                 add_flow_uri=ADD_FLOW_URI,
+                 delete_flow_uri=DELETE_FLOW_URI,
+                 clear_flows_uri=CLEAR_FLOWS_URI,
+                 modify_flow_uri=MODIFY_FLOW_URI,
+                 pool_size=POOL_SIZE,
+                 timeout=None):
+        self.base_url = base_url
+        self.add_flow_uri = add_flow_uri
+        self.delete_flow_uri = delete_flow_uri
+        self.clear_flows_uri = clear_flows_uri
+        self.modify_flow_uri = modify_flow_uri
+        self.timeout = timeout
+
+        # one session for all the requests, connections are kept alive and reused.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # worker threads for the batches, one per pooled connection.
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self.on_request = None
+
+    def request(self, method, uri, payload=None):
+        sent = time.monotonic()
+        r = self.session.request(method, url=self.base_url + uri, data=payload, timeout=self.timeout)
+        if self.on_request is not None:
+            self.on_request(uri, sent, time.monotonic() - sent, r.status_code)
+        return r
+
+    def post(self, uri, payload):
+        return self.request('POST', uri, payload)
+
+    def add_flow(self, payload):
+        return self.post(self.add_flow_uri, payload)
+
+    def delete_flow(self, payload):
+        return self.post(self.delete_flow_uri, payload)
+
+    # post all the payloads at the same time and return when every one of them is acknowledged.
+    # the responses are returned in the same order as the payloads.
+    def post_batch(self, uri, payloads):
+        if len(payloads) <= 1:
+            return [self.post(uri, payload) for payload in payloads]
+        futures = [self.executor.submit(self.post, uri, payload) for payload in payloads]
+        return [future.result() for future in futures]
+
+    def modify_flow(self, payload):
+        return self.post(self.modify_flow_uri, payload)
+
+    def add_flows(self, payloads):
+        return self.post_batch(self.add_flow_uri, payloads)
+
+    def delete_flows(self, payloads):
+        return self.post_batch(self.delete_flow_uri, payloads)
+
+    def modify_flows(self, payloads):
+        return self.post_batch(self.modify_flow_uri, payloads)
+
+    # flow table of one bridge as reported by the switch, list of flows
+    def get_flows(self, dpid):
+        r = self.request('GET', FLOW_STATS_URI + str(dpid))
+        r.raise_for_status()
+        return r.json().get(str(dpid), [])
+
+    # flow tables of several bridges, one request per bridge sent concurrently: {dpid: flows}
+    def get_flows_batch(self, dpids):
+        dpids = list(dpids)
+        futures = [self.executor.submit(self.get_flows, dpid) for dpid in dpids]
+        return {dpid: future.result() for dpid, future in zip(dpids, futures)}
+
+    # counters of the ports of one bridge, list of {'port_no', 'rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets', ...}
+    def get_ports(self, dpid):
+        r = self.request('GET', PORT_STATS_URI + str(dpid))
+        r.raise_for_status()
+        return r.json().get(str(dpid), [])
+
+    # port counters of several bridges, one request per bridge sent concurrently: {dpid: ports}
+    def get_ports_batch(self, dpids):
+        dpids = list(dpids)
+        futures = [self.executor.submit(self.get_ports, dpid) for dpid in dpids]
+        return {dpid: future.result() for dpid, future in zip(dpids, futures)}
+
+    # clear all the flows of one bridge
+    def clear_flows(self, dpid):
+        return self.request('DELETE', self.clear_flows_uri + str(dpid))
+
+    # open the connection before the first flow rule, so the TCP handshake is not in the critical path.
+    def warm_up(self):
+        return self.request('GET', 'stats/switches')
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
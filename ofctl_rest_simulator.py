@@ -0,0 +1,280 @@
+'''
+Local stand-in for the OFCTL_REST app of the Ryu controller.
+
+This script:
+- runs an HTTP/1.1 (keep-alive) server that accepts the same flow requests as OFCTL_REST
+  stats/flowentry/add, stats/flowentry/modify_strict, stats/flowentry/delete_strict, stats/flowentry/clear/<dpid>
+  and the flow and port statistics stats/flow/<dpid>, stats/port/<dpid>
+- keeps the flow tables in memory, no switch is involved
+- delays the replies with a latency model (fixed part, random jitter, controller handling the
+  requests one at a time) and can make the new flows appear in the statistics only some time
+  after they were acknowledged, as a switch programming its tables would.
+
+Together with ots_simulator.py, the flow and OTS paths run on any Linux box: ofctl_benchmark.py, the flow
+helpers of ssh_flow_management.py (reconcile_flows, install_path, transition_path, ...) and ots_client.py.
+Point 'ip' of credentials.json to the simulator and 'ip_ots'/'port_ots' to the OTS simulator. The experiment
+scripts still need the gateways and the VMs for SSH, tcpdump and iperf.
+
+Usage:
+    python ofctl_rest_simulator.py --port 8080
+    python ofctl_rest_simulator.py --port 8080 --latency 2 --jitter 0.5 --install-delay 5 --serialize
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import ast
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+DEFAULT_PORT = 8080
+
+# match fields understood by the simulator
+MATCH_FIELDS = ('in_port', 'dl_type', 'dl_src', 'dl_dst', 'nw_src', 'nw_dst', 'nw_proto', 'tp_src', 'tp_dst')
+
+
+class LatencyModel:
+    '''
+    Delay of the replies of a simulated device, in seconds.
+        latency: fixed part
+        jitter: standard deviation of the random part (normal, the delay is never negative)
+        serialize: the requests are handled one at a time, as by the single event loop of Ryu,
+            so concurrent requests queue behind each other
+        seed: seed of the random generator, for repeatable runs
+    '''
+
+    def __init__(self, latency=0.0, jitter=0.0, serialize=False, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.serialize = serialize
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # held while a request is handled when the requests are serialized
+        self.queue = threading.Lock()
+
+    def sample(self):
+        if self.jitter <= 0:
+            return self.latency
+        with self.lock:
+            return max(0.0, self.random.gauss(self.latency, self.jitter))
+
+    # run function after the delay of the model, returns its result
+    def apply(self, function, *args):
+        delay = self.sample()
+        if self.serialize:
+            with self.queue:
+                time.sleep(delay)
+                return function(*args)
+        if delay > 0:
+            time.sleep(delay)
+        return function(*args)
+
+
+# flow tables of the simulated bridges: {dpid: {(priority, match): flow}}.
+# an added flow shows in the statistics install_delay seconds after it was acknowledged
+class FlowTables:
+    def __init__(self, install_delay=0.0):
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.install_delay = install_delay
+        # time.monotonic() from which each flow shows in the statistics, {(dpid, key): time}
+        self.visible_at = {}
+
+    # OFCTL_REST ignores unknown match fields (e.g. out_port), so they are not part of the key
+    @staticmethod
+    def key(flow):
+        match = {field: value for field, value in flow.get('match', {}).items() if field in MATCH_FIELDS}
+        return int(flow.get('priority', 0)), tuple(sorted(match.items()))
+
+    def add(self, flow):
+        with self.lock:
+            self.tables.setdefault(int(flow['dpid']), {})[self.key(flow)] = flow
+            if self.install_delay > 0:
+                self.visible_at[(int(flow['dpid']), self.key(flow))] = time.monotonic() + self.install_delay
+
+    # replaces the actions of an existing flow, a missing flow is not created (as OFPFC_MODIFY_STRICT)
+    def modify_strict(self, flow):
+        with self.lock:
+            table = self.tables.get(int(flow['dpid']), {})
+            if self.key(flow) in table:
+                table[self.key(flow)] = flow
+
+    def delete_strict(self, flow):
+        with self.lock:
+            self.tables.get(int(flow['dpid']), {}).pop(self.key(flow), None)
+            self.visible_at.pop((int(flow['dpid']), self.key(flow)), None)
+
+    def clear(self, dpid):
+        with self.lock:
+            self.tables.pop(int(dpid), None)
+            self.visible_at = {key: at for key, at in self.visible_at.items() if key[0] != int(dpid)}
+
+    # flow table in the format of the OFCTL_REST reply to stats/flow/<dpid>
+    def stats(self, dpid):
+        now = time.monotonic()
+        with self.lock:
+            flows = [flow for key, flow in self.tables.get(int(dpid), {}).items()
+                     if self.visible_at.get((int(dpid), key), 0) <= now]
+        reply = []
+        for flow in flows:
+            actions = []
+            for instruction in flow.get('instructions', []):
+                for action in instruction.get('actions', []):
+                    actions.append(action['type'] + ':' + str(action.get('port', '')))
+            for action in flow.get('actions', []):
+                actions.append(action['type'] + ':' + str(action.get('port', '')))
+            reply.append({'priority': int(flow.get('priority', 0)),
+                          'table_id': int(flow.get('table_id', 0)),
+                          'match': {field: value for field, value in flow.get('match', {}).items()
+                                    if field in MATCH_FIELDS},
+                          'actions': actions,
+                          'packet_count': 0,
+                          'byte_count': 0})
+        return reply
+
+    # ports used by the flows of a bridge in the format of the OFCTL_REST reply to stats/port/<dpid>.
+    # no traffic goes through the simulator, the counters stay at zero
+    def port_stats(self, dpid):
+        with self.lock:
+            flows = list(self.tables.get(int(dpid), {}).values())
+        ports = set()
+        for flow in flows:
+            if 'in_port' in flow.get('match', {}):
+                ports.add(int(flow['match']['in_port']))
+            for instruction in flow.get('instructions', []):
+                for action in instruction.get('actions', []):
+                    if 'port' in action:
+                        ports.add(int(action['port']))
+        return [{'port_no': port, 'rx_packets': 0, 'tx_packets': 0, 'rx_bytes': 0, 'tx_bytes': 0,
+                 'rx_dropped': 0, 'tx_dropped': 0, 'rx_errors': 0, 'tx_errors': 0}
+                for port in sorted(ports)]
+
+    def count(self, dpid=None):
+        with self.lock:
+            if dpid is not None:
+                return len(self.tables.get(int(dpid), {}))
+            return sum(len(table) for table in self.tables.values())
+
+
+class OfctlRestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests
+    protocol_version = 'HTTP/1.1'
+    # headers and body are sent in one segment, otherwise delayed ACKs add ~40 ms to the replies with a body
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def reply(self, status=200, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        # OFCTL_REST also parses the body with literal_eval, so payloads such as "dl_type":0x0800 are accepted
+        return ast.literal_eval(self.rfile.read(length).decode('utf-8'))
+
+    def do_POST(self):
+        tables = self.server.flow_tables
+        if self.path.endswith('/stats/flowentry/add'):
+            operation = tables.add
+        elif self.path.endswith('/stats/flowentry/modify_strict'):
+            operation = tables.modify_strict
+        elif self.path.endswith('/stats/flowentry/delete_strict'):
+            operation = tables.delete_strict
+        else:
+            self.reply(404)
+            return
+        try:
+            flow = self.read_body()
+            self.server.latency_model.apply(operation, flow)
+        except (ValueError, SyntaxError, KeyError):
+            self.reply(400)
+            return
+        self.reply(200)
+
+    def do_DELETE(self):
+        if '/stats/flowentry/clear/' in self.path:
+            self.server.latency_model.apply(self.server.flow_tables.clear, self.path.rsplit('/', 1)[1])
+            self.reply(200)
+        else:
+            self.reply(404)
+
+    def do_GET(self):
+        if self.path.endswith('/stats/switches'):
+            with self.server.flow_tables.lock:
+                body = str(sorted(self.server.flow_tables.tables)).encode('utf-8')
+            self.reply(200, body)
+        elif '/stats/flow/' in self.path:
+            dpid = self.path.rsplit('/', 1)[1]
+            flows = self.server.latency_model.apply(self.server.flow_tables.stats, dpid)
+            body = json.dumps({dpid: flows}).encode('utf-8')
+            self.reply(200, body)
+        elif '/stats/port/' in self.path:
+            dpid = self.path.rsplit('/', 1)[1]
+            ports = self.server.latency_model.apply(self.server.flow_tables.port_stats, dpid)
+            self.reply(200, json.dumps({dpid: ports}).encode('utf-8'))
+        else:
+            self.reply(404)
+
+    # do not print one line per request
+    def log_message(self, format, *args):
+        return None
+
+
+def make_simulator(host='127.0.0.1', port=0, latency_model=None, install_delay=0.0):
+    server = ThreadingHTTPServer((host, port), OfctlRestHandler)
+    server.daemon_threads = True
+    server.flow_tables = FlowTables(install_delay=install_delay)
+    server.latency_model = latency_model if latency_model is not None else LatencyModel()
+    return server
+
+
+# start the simulator in a background thread, port=0 picks a free port.
+# latency_model: LatencyModel of the replies, no delay by default
+# install_delay: seconds between the acknowledgement of a flow and its appearance in the statistics
+def start_simulator(host='127.0.0.1', port=0, latency_model=None, install_delay=0.0):
+    server = make_simulator(host, port, latency_model, install_delay)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# URL to use as OFCTL_REST_IP when talking to the simulator
+def simulator_url(server):
+    host, port = server.server_address[:2]
+    return 'http://' + host + ':' + str(port) + '/'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the Ryu OFCTL_REST app')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=0.0, help='fixed delay of the replies, in ms')
+    parser.add_argument('--jitter', type=float, default=0.0, help='standard deviation of the delay, in ms')
+    parser.add_argument('--install-delay', type=float, default=0.0,
+                        help='ms between the reply to a flow add and its appearance in the statistics')
+    parser.add_argument('--serialize', action='store_true', help='handle the requests one at a time')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = make_simulator(args.host, args.port,
+                            latency_model=LatencyModel(args.latency / 1e3, args.jitter / 1e3,
+                                                       serialize=args.serialize, seed=args.seed),
+                            install_delay=args.install_delay / 1e3)
+    print('ofctl_rest simulator listening on ' + simulator_url(server))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
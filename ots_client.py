@@ -0,0 +1,196 @@
+'''
+Client for the MEMS optical switch (OTS), SCPI over TCP.
+
+This module:
+- keeps one TCP connection with the optical switch for the whole experiment
+- sends the commands without waiting for the switch: the caller gets back an OtsCommand at once,
+  several commands may be in flight (pipelining)
+- reads the replies on a background thread and matches them, in order, to the commands that
+  ask for one (a query such as stat?), so the time between a command and its acknowledgement
+  is known for every reconfiguration, without blocking the caller.
+
+ots_connect_port in ssh_flow_management.py sends the command and never reads the reply,
+so it was not known whether, or when, the switch finished.
+
+Usage:
+    ots = OtsClient(ip_ots, port_ots)
+    command = ots.connect_port(PORTS_OTS_AFTER[0], PORTS_OTS_AFTER[1])
+    ...
+    command.wait(1)
+    print(command.latency(), command.reply)
+    ots.close()
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import collections
+import socket
+import threading
+import time
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# seconds to wait for the reply of a command before giving up
+REPLY_TIMEOUT = 2.0
+RECV_SIZE = 4096
+
+
+class OtsCommand:
+    '''
+    One command sent to the optical switch.
+        command: text of the command, without the line end
+        sent, acked: time.monotonic() when the command was sent and when its reply arrived
+        reply: text of the reply, None until it arrives or for the commands without reply
+        failed: the connection closed before the reply arrived
+    '''
+
+    def __init__(self, command, expects_reply=True):
+        self.command = command
+        self.expects_reply = expects_reply
+        self.sent = None
+        self.acked = None
+        self.reply = None
+        self.failed = False
+        self.event = threading.Event()
+        if not expects_reply:
+            self.event.set()
+
+    # wait for the reply, returns False on timeout or when the connection closed without reply
+    def wait(self, timeout=REPLY_TIMEOUT):
+        return self.event.wait(timeout) and not self.failed
+
+    # time between the command and its reply, in seconds
+    def latency(self):
+        if self.acked is None or self.sent is None:
+            return None
+        return self.acked - self.sent
+
+
+class OtsClient:
+    '''
+    Pipelined SCPI client of the optical switch.
+        ip, port: address of the switch
+        on_reply: optional callback(command) called by the reader thread for every reply
+    '''
+
+    def __init__(self, ip, port, on_reply=None, timeout=None):
+        self.ip = ip
+        self.port = port
+        self.on_reply = on_reply
+        self.timeout = timeout
+        # commands waiting for their reply, in the order they were sent
+        self.pending = collections.deque()
+        self.history = []
+        # replies that did not match any command
+        self.unmatched = []
+        self.lock = threading.Lock()
+        self.socket = None
+        self.reader = None
+        self.connect()
+
+    def connect(self):
+        self.socket = socket.create_connection((self.ip, self.port), timeout=self.timeout)
+        self.socket.settimeout(None)
+        # the commands are short, do not wait to fill a segment
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = threading.Thread(target=self.read_replies, daemon=True)
+        self.reader.start()
+
+    # send a command and return at once, the reply is matched by the reader thread.
+    # commands with a query (?) get a reply
+    def send(self, command, expects_reply=None):
+        if expects_reply is None:
+            expects_reply = '?' in command
+        ots_command = OtsCommand(command, expects_reply)
+        data = bytes(command + '\r\n', 'utf-8')
+        # the command is queued before it is sent, its reply cannot arrive before it is queued
+        with self.lock:
+            ots_command.sent = time.monotonic()
+            if expects_reply:
+                self.pending.append(ots_command)
+            self.history.append(ots_command)
+            self.socket.sendall(data)
+        return ots_command
+
+    # same command as ots_connect_port, the stat? query acknowledges the end of the switching
+    def connect_port(self, port_in, port_out):
+        port_in_str = ','.join(str(i) for i in port_in)
+        port_out_str = ','.join(str(i) for i in port_out)
+        return self.send(':oxc:swit:conn:only (@{0}),(@{1}); stat?'.format(port_in_str, port_out_str))
+
+    def disconnect_all(self):
+        return self.send(':oxc:swit:disc:all')
+
+    def read_replies(self):
+        buffer = b''
+        while True:
+            try:
+                data = self.socket.recv(RECV_SIZE)
+            except OSError:
+                break
+            if not data:
+                break
+            now = time.monotonic()
+            buffer += data
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                self.match_reply(line.decode('utf-8', errors='replace').strip(), now)
+        # the connection is closed, nobody will answer the pending commands
+        with self.lock:
+            while self.pending:
+                command = self.pending.popleft()
+                command.failed = True
+                command.event.set()
+
+    def match_reply(self, reply, acked):
+        with self.lock:
+            command = self.pending.popleft() if self.pending else None
+        if command is None:
+            self.unmatched.append(reply)
+            return
+        command.reply = reply
+        command.acked = acked
+        command.event.set()
+        if self.on_reply is not None:
+            self.on_reply(command)
+
+    # wait for the replies of all the commands sent so far, returns False on timeout
+    def wait_all(self, timeout=REPLY_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            commands = list(self.pending)
+        return all(command.wait(max(0.0, deadline - time.monotonic())) for command in commands)
+
+    # commands sent since the given time.monotonic(), all of them by default
+    def report(self, since=None):
+        return [{'command': command.command,
+                 'sent': command.sent,
+                 'acked': command.acked,
+                 'latency': command.latency(),
+                 'expects_reply': command.expects_reply,
+                 'reply': command.reply}
+                for command in self.history if since is None or command.sent >= since]
+
+    def print_report(self, since=None):
+        for row in self.report(since):
+            if row['latency'] is not None:
+                print('OTS ' + row['command'] + ': reply ' + repr(row['reply']) + ' after '
+                      + '{:.3f}'.format(row['latency'] * 1e3) + ' ms')
+            elif not row['expects_reply']:
+                print('OTS ' + row['command'] + ': sent')
+            else:
+                print('OTS ' + row['command'] + ': no reply')
+
+    def close(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        self.reader.join(1)
@@ -0,0 +1,147 @@
+'''
+Local stand-in for the MEMS optical switch (OTS).
+
+This script:
+- runs a TCP server that speaks the subset of SCPI used by the experiments:
+    :oxc:swit:conn:only (@in1,in2,...),(@out1,out2,...)   connect in1->out1, in2->out2, ... and nothing else
+    :oxc:swit:disc:all                                     remove all the connections
+    stat?                                                  reply 0 once the previous commands are done
+    :oxc:swit:conn:stat?                                   reply the connections, (@in,...),(@out,...)
+    *idn?                                                  reply the name of the simulator
+  several commands may be sent on one line, separated by ';', as ots_connect_port does
+- handles the commands of a connection in order, each switching taking a time given by a
+  LatencyModel (ofctl_rest_simulator.py), so the replies come back as late as the real switch's would.
+
+Usage:
+    python ots_simulator.py --port 3082 --switching-time 20 --jitter 2
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import re
+import socketserver
+import threading
+
+from ofctl_rest_simulator import LatencyModel
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+DEFAULT_PORT = 3082
+# switching time of a MEMS switch, in seconds
+SWITCHING_TIME = 0.02
+IDENTITY = 'OTS simulator'
+# reply to stat? when the switch is ready
+STATUS_OK = '0'
+# reply to an unknown command
+STATUS_ERROR = '-1'
+
+CONNECT_COMMAND = re.compile(r'^:oxc:swit:conn:only\s*\(@([\d,\s]*)\)\s*,\s*\(@([\d,\s]*)\)$', re.IGNORECASE)
+
+
+# state of the simulated switch: {port in: port out}
+class OpticalSwitch:
+    def __init__(self, switching=None):
+        self.lock = threading.Lock()
+        self.connections = {}
+        # one switching at a time, whatever the number of clients
+        self.switching = switching if switching is not None else LatencyModel(SWITCHING_TIME, serialize=True)
+        self.commands = 0
+
+    def connect_only(self, ports_in, ports_out):
+        with self.lock:
+            self.connections = dict(zip(ports_in, ports_out))
+            self.commands += 1
+
+    def disconnect_all(self):
+        with self.lock:
+            self.connections = {}
+            self.commands += 1
+
+    def connection_status(self):
+        with self.lock:
+            ports = sorted(self.connections.items())
+        return '(@' + ','.join(str(p[0]) for p in ports) + '),(@' + ','.join(str(p[1]) for p in ports) + ')'
+
+    # run one command, returns the reply or None for the commands without reply
+    def execute(self, command):
+        command = command.strip()
+        lower = command.lower()
+        if not command:
+            return None
+        match = CONNECT_COMMAND.match(command)
+        if match is not None:
+            ports_in = [int(port) for port in match.group(1).split(',') if port.strip()]
+            ports_out = [int(port) for port in match.group(2).split(',') if port.strip()]
+            if len(ports_in) != len(ports_out):
+                return STATUS_ERROR
+            self.switching.apply(self.connect_only, ports_in, ports_out)
+            return None
+        if lower == ':oxc:swit:disc:all':
+            self.switching.apply(self.disconnect_all)
+            return None
+        if lower == 'stat?':
+            return STATUS_OK
+        if lower == ':oxc:swit:conn:stat?':
+            return self.connection_status()
+        if lower == '*idn?':
+            return IDENTITY
+        return STATUS_ERROR
+
+
+class OtsHandler(socketserver.StreamRequestHandler):
+    # the replies are short, send them at once
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        for line in self.rfile:
+            for command in line.decode('utf-8', errors='replace').split(';'):
+                reply = self.server.switch.execute(command)
+                if reply is not None:
+                    self.wfile.write(bytes(reply + '\r\n', 'utf-8'))
+                    self.wfile.flush()
+
+
+class OtsServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_ots_simulator(host='127.0.0.1', port=0, switching=None):
+    server = OtsServer((host, port), OtsHandler)
+    server.switch = OpticalSwitch(switching)
+    return server
+
+
+# start the simulator in a background thread, port=0 picks a free port.
+# switching: LatencyModel of the switching time, SWITCHING_TIME by default
+def start_ots_simulator(host='127.0.0.1', port=0, switching=None):
+    server = make_ots_simulator(host, port, switching)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the MEMS optical switch (SCPI over TCP)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--switching-time', type=float, default=SWITCHING_TIME * 1e3, help='in ms')
+    parser.add_argument('--jitter', type=float, default=0.0, help='standard deviation of the switching time, in ms')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = make_ots_simulator(args.host, args.port,
+                                switching=LatencyModel(args.switching_time / 1e3, args.jitter / 1e3,
+                                                       serialize=True, seed=args.seed))
+    print('OTS simulator listening on ' + args.host + ':' + str(server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,534 @@
+'''
+Analysis of the tcpdump captures of the experiments.
+
+This module:
+- reads the pcap files written by tcpdump_vm/tcpdump_command (bw)endpoints)test_type)timestamp.pcap,
+  96-byte snap length) through a memory map, chunk by chunk, straight into NumPy arrays:
+  timestamp, length, IPs, ports, TCP seq/ack, flags and payload length of every packet
+- computes, for the main TCP flow of the capture, the throughput in fixed bins,
+  the retransmissions, the gaps between data packets and, around each reconfiguration time,
+  the outage and the time until the throughput recovers.
+- computes the same from the summaries made on the VMs by pcap_remote_summary.py (.psum files).
+
+The file is never loaded in memory nor turned into one Python object per packet. The records of a pcap
+file have variable size, their offsets are found by walking the record headers. When the packets are
+longer than the snap length, as the data packets of a 5-6 Gbit/s iperf test are, consecutive records all
+have the same size and their offsets are computed at once (stride fast path). The fields of all the
+records of a chunk are then gathered at once with NumPy fancy indexing.
+
+Usage:
+    python pcap_analysis.py ')vm2vm3)tx)single_mbb_v3_1)02_14_2022-10_00_00.pcap' --reconfiguration 11.05
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import mmap
+import struct
+from array import array
+
+import numpy as np
+
+from pcap_remote_summary import load_summary, SUMMARY_EXTENSION
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+PCAP_HEADER_SIZE = 24
+RECORD_HEADER_SIZE = 16
+# magic number of the pcap file: (byte order, timestamp resolution in seconds)
+PCAP_MAGIC = {b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+              b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+              b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+              b'\xa1\xb2\x3c\x4d': ('>', 1e-9)}
+# link types: offset of the ethertype and of the IP header in the packet
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+ETH_TYPE_IP = 0x0800
+ETH_TYPE_VLAN = 0x8100
+IP_PROTO_TCP = 6
+
+# records read and gathered at once
+CHUNK_PACKETS = 1 << 20
+# consecutive full-size records needed to switch to the stride fast path
+STRIDE_MIN = 64
+
+# throughput bins, in seconds
+BIN_SIZE = 0.01
+# a silence between two data packets longer than this is a gap, in seconds
+GAP_THRESHOLD = 0.005
+# the baseline of a reconfiguration is the median throughput in the BASELINE_WINDOW seconds before it
+BASELINE_WINDOW = 1.0
+# the outage and recovery are searched in the RECOVERY_WINDOW seconds after the reconfiguration
+RECOVERY_WINDOW = 3.0
+# a bin below OUTAGE_THRESHOLD times the baseline is part of the outage
+OUTAGE_THRESHOLD = 0.5
+# the throughput has recovered when it is back to RECOVERED_THRESHOLD times the baseline
+RECOVERED_THRESHOLD = 0.9
+
+# columns of the packet arrays and their types
+PACKET_COLUMNS = (('time', np.float64),
+                  ('length', np.uint32),
+                  ('tcp', np.bool_),
+                  ('src', np.uint32),
+                  ('dst', np.uint32),
+                  ('sport', np.uint16),
+                  ('dport', np.uint16),
+                  ('seq', np.uint32),
+                  ('ack', np.uint32),
+                  ('flags', np.uint8),
+                  ('payload', np.uint16))
+
+
+class PcapReader:
+    '''
+    Memory-mapped reader of a pcap file (not pcapng).
+        filename: path of the capture
+    Use as a context manager, or call close().
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = np.frombuffer(self.map, dtype=np.uint8)
+        self.size = len(self.map)
+        if self.size < PCAP_HEADER_SIZE or self.map[:4] not in PCAP_MAGIC:
+            self.close()
+            raise ValueError(filename + ' is not a pcap file')
+        self.byte_order, self.resolution = PCAP_MAGIC[self.map[:4]]
+        self.snaplen, self.linktype = struct.unpack_from(self.byte_order + 'II', self.map, 16)
+        if self.linktype not in (LINKTYPE_ETHERNET, LINKTYPE_RAW, LINKTYPE_LINUX_SLL):
+            self.close()
+            raise ValueError(filename + ': unsupported link type ' + str(self.linktype))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # the arrays must not point to the map anymore when it is closed
+        self.data = None
+        if not self.map.closed:
+            self.map.close()
+        self.file.close()
+
+    # fields of `size` bytes at the given positions, one value per position
+    def gather(self, positions, size, byte_order='>'):
+        positions = np.minimum(positions, self.size - size)
+        values = self.data[positions[:, None] + np.arange(size)]
+        return values.view(byte_order + 'u' + str(size)).ravel()
+
+    # offsets of the records, from `offset` on, with at most `limit` records.
+    # returns (offsets, offset of the next record)
+    def walk(self, offset, limit):
+        offsets = array('q')
+        incl_len_at = struct.Struct(self.byte_order + 'I').unpack_from
+        full = 0
+        while offset + RECORD_HEADER_SIZE <= self.size and len(offsets) < limit:
+            incl_len = incl_len_at(self.map, offset + 8)[0]
+            if offset + RECORD_HEADER_SIZE + incl_len > self.size:
+                break  # last record truncated, tcpdump was stopped while writing it
+            offsets.append(offset)
+            offset += RECORD_HEADER_SIZE + incl_len
+            # back to the fast path after a run of full-size records
+            full = full + 1 if incl_len == self.snaplen else 0
+            if full >= STRIDE_MIN:
+                break
+        return np.frombuffer(offsets, dtype=np.int64), offset
+
+    # offsets of all the records, by chunks of at most chunk_packets records
+    def record_offsets(self, chunk_packets=CHUNK_PACKETS):
+        offset = PCAP_HEADER_SIZE
+        record_size = RECORD_HEADER_SIZE + self.snaplen
+        while offset + RECORD_HEADER_SIZE <= self.size:
+            # stride fast path: check a few records first, then the whole chunk
+            n = min(chunk_packets, (self.size - offset) // record_size)
+            k = 0
+            for probe in (min(n, STRIDE_MIN), n):
+                candidates = offset + record_size * np.arange(probe, dtype=np.int64)
+                full = self.gather(candidates + 8, 4, self.byte_order) == self.snaplen
+                k = probe if full.all() else int(np.argmin(full))
+                if k < probe:
+                    break
+            if k >= STRIDE_MIN or (k == n and k > 0):
+                yield offset + record_size * np.arange(k, dtype=np.int64)
+                offset += record_size * k
+                continue
+            offsets, next_offset = self.walk(offset, chunk_packets)
+            if not len(offsets):
+                break
+            yield offsets
+            offset = next_offset
+
+    # packet arrays of the records at the given offsets
+    def parse(self, offsets):
+        columns = {}
+        ts_sec = self.gather(offsets, 4, self.byte_order).astype(np.float64)
+        ts_frac = self.gather(offsets + 4, 4, self.byte_order).astype(np.float64)
+        incl_len = self.gather(offsets + 8, 4, self.byte_order).astype(np.int64)
+        columns['time'] = ts_sec + ts_frac * self.resolution
+        columns['length'] = self.gather(offsets + 12, 4, self.byte_order)
+
+        packet = offsets + RECORD_HEADER_SIZE
+        if self.linktype == LINKTYPE_ETHERNET:
+            eth_type = self.gather(packet + 12, 2)
+            vlan = eth_type == ETH_TYPE_VLAN
+            eth_type = np.where(vlan, self.gather(packet + 16, 2), eth_type)
+            ip = packet + np.where(vlan, 18, 14)
+        elif self.linktype == LINKTYPE_LINUX_SLL:
+            eth_type = self.gather(packet + 14, 2)
+            ip = packet + 16
+        else:
+            eth_type = np.full(len(offsets), ETH_TYPE_IP)
+            ip = packet
+        end = packet + incl_len
+
+        version_ihl = self.gather(ip, 1)
+        is_ip = (eth_type == ETH_TYPE_IP) & (version_ihl >> 4 == 4) & (ip + 20 <= end)
+        ihl = (version_ihl & 0x0f).astype(np.int64) * 4
+        tcp = ip + ihl
+        is_tcp = is_ip & (self.gather(ip + 9, 1) == IP_PROTO_TCP) & (tcp + 14 <= end)
+
+        columns['tcp'] = is_tcp
+        columns['src'] = np.where(is_ip, self.gather(ip + 12, 4), 0)
+        columns['dst'] = np.where(is_ip, self.gather(ip + 16, 4), 0)
+        columns['sport'] = np.where(is_tcp, self.gather(tcp, 2), 0)
+        columns['dport'] = np.where(is_tcp, self.gather(tcp + 2, 2), 0)
+        columns['seq'] = np.where(is_tcp, self.gather(tcp + 4, 4), 0)
+        columns['ack'] = np.where(is_tcp, self.gather(tcp + 8, 4), 0)
+        columns['flags'] = np.where(is_tcp, self.gather(tcp + 13, 1), 0)
+        data_offset = (self.gather(tcp + 12, 1) >> 4).astype(np.int64) * 4
+        payload = self.gather(ip + 2, 2).astype(np.int64) - ihl - data_offset
+        columns['payload'] = np.where(is_tcp, np.clip(payload, 0, 0xffff), 0)
+        return {name: columns[name].astype(dtype, copy=False) for name, dtype in PACKET_COLUMNS}
+
+    # packet arrays of the file, one dict of arrays per chunk
+    def chunks(self, chunk_packets=CHUNK_PACKETS):
+        for offsets in self.record_offsets(chunk_packets):
+            yield self.parse(offsets)
+
+    # packet arrays of the whole file
+    def read(self, chunk_packets=CHUNK_PACKETS):
+        parts = list(self.chunks(chunk_packets))
+        if not parts:
+            return {name: np.zeros(0, dtype=dtype) for name, dtype in PACKET_COLUMNS}
+        return {name: np.concatenate([part[name] for part in parts]) for name, dtype in PACKET_COLUMNS}
+
+
+def read_pcap(filename, chunk_packets=CHUNK_PACKETS):
+    with PcapReader(filename) as reader:
+        return reader.read(chunk_packets)
+
+
+def ip_to_str(ip):
+    return '.'.join(str((int(ip) >> shift) & 0xff) for shift in (24, 16, 8, 0))
+
+
+# payload of each TCP flow of packet arrays: {(src, dst, sport, dport): bytes}
+def flow_volumes(packets):
+    data = packets['tcp'] & (packets['payload'] > 0)
+    if not np.any(data):
+        return {}
+    # one uint64 key per flow, (src, dst) first numbered, then combined with (sport, dport).
+    # np.unique of integers is much faster than np.unique of rows
+    ips = (packets['src'][data].astype(np.uint64) << np.uint64(32)) | packets['dst'][data]
+    ip_pairs, ip_index = np.unique(ips, return_inverse=True)
+    ports = (packets['sport'][data].astype(np.uint64) << np.uint64(16)) | packets['dport'][data]
+    keys = (ip_index.ravel().astype(np.uint64) << np.uint64(32)) | ports
+    flows, inverse = np.unique(keys, return_inverse=True)
+    volume = np.bincount(inverse.ravel(), weights=packets['payload'][data])
+    volumes = {}
+    for key, flow_volume in zip(flows.tolist(), volume.tolist()):
+        ip_pair = int(ip_pairs[key >> 32])
+        volumes[(ip_pair >> 32, ip_pair & 0xffffffff, (key >> 16) & 0xffff, key & 0xffff)] = flow_volume
+    return volumes
+
+
+# (src, dst, sport, dport) of the TCP flow carrying the most payload
+def main_flow(packets):
+    volumes = flow_volumes(packets)
+    return max(volumes, key=volumes.get) if volumes else None
+
+
+# packets of one direction of a flow
+def flow_mask(packets, flow):
+    src, dst, sport, dport = flow
+    return packets['tcp'] & (packets['src'] == src) & (packets['dst'] == dst) \
+        & (packets['sport'] == sport) & (packets['dport'] == dport)
+
+
+# sequence numbers without the 32-bit wrap around, as int64
+def unwrap_seq(seq):
+    if not len(seq):
+        return seq.astype(np.int64)
+    step = np.diff(seq.astype(np.int64))
+    step[step < -(1 << 31)] += 1 << 32
+    step[step > (1 << 31)] -= 1 << 32
+    return seq[0].astype(np.int64) + np.concatenate(([0], np.cumsum(step)))
+
+
+# data packets sent again: they start below the highest sequence number already sent
+def retransmissions(seq, payload):
+    seq = unwrap_seq(seq)
+    seq_end = seq + payload
+    highest = np.maximum.accumulate(seq_end)
+    return np.concatenate(([False], seq[1:] < highest[:-1]))
+
+
+# throughput in bins of bin_size seconds: (start of each bin, bits per second)
+def throughput(times, lengths, bin_size=BIN_SIZE, t_start=None, t_end=None):
+    t_start = times[0] if t_start is None else t_start
+    t_end = times[-1] if t_end is None else t_end
+    n_bins = int(np.ceil((t_end - t_start) / bin_size)) + 1
+    index = ((times - t_start) / bin_size).astype(np.int64)
+    inside = (index >= 0) & (index < n_bins)
+    bits = np.bincount(index[inside], weights=lengths[inside].astype(np.float64) * 8, minlength=n_bins)
+    return t_start + bin_size * np.arange(n_bins), bits / bin_size
+
+
+# silences longer than min_gap between consecutive packets: (start of each gap, duration)
+def gaps(times, min_gap=GAP_THRESHOLD):
+    silence = np.diff(times)
+    found = silence > min_gap
+    return times[:-1][found], silence[found]
+
+
+# outage and recovery of the binned throughput after a reconfiguration at t_event.
+# the outage is the time without throughput, each bin below threshold * baseline counts for its missing fraction.
+# the recovery time runs from t_event to the first bin back at recovered * baseline after the dip.
+def recovery(bins, bps, t_event, bin_size=BIN_SIZE, baseline_window=BASELINE_WINDOW, window=RECOVERY_WINDOW,
+             threshold=OUTAGE_THRESHOLD, recovered=RECOVERED_THRESHOLD):
+    before = bps[(bins >= t_event - baseline_window) & (bins + bin_size <= t_event)]
+    after = (bins + bin_size > t_event) & (bins < t_event + window)
+    result = {'time': t_event, 'baseline_bps': None, 'dip_start': None, 'outage': None, 'recovery_time': None}
+    if not len(before) or not np.any(after):
+        return result
+    baseline = float(np.median(before))
+    result['baseline_bps'] = baseline
+    if baseline <= 0:
+        return result
+    dip = after & (bps < threshold * baseline)
+    result['outage'] = float(np.sum(np.clip(1 - bps[dip] / baseline, 0, 1)) * bin_size)
+    if not np.any(dip):
+        result['recovery_time'] = 0.0
+        return result
+    first_dip = int(np.argmax(dip))
+    result['dip_start'] = float(bins[first_dip])
+    back = after & (np.arange(len(bps)) > first_dip) & (bps >= recovered * baseline)
+    if np.any(back):
+        result['recovery_time'] = float(bins[int(np.argmax(back))] - t_event)
+    return result
+
+
+class FlowStream:
+    '''
+    Statistics of the data packets of one flow, fed chunk by chunk so that only the bins and the gaps
+    stay in memory. Gaps, sequence numbers and retransmissions carry over between chunks.
+        t_start: time of the first packet of the capture, the times are relative to it
+    '''
+
+    def __init__(self, t_start, bin_size=BIN_SIZE, gap_threshold=GAP_THRESHOLD):
+        self.t_start = t_start
+        self.bin_size = bin_size
+        self.gap_threshold = gap_threshold
+        # bits in each bin since t_start
+        self.bits = np.zeros(0)
+        self.data_packets = 0
+        self.payload_bytes = 0
+        self.length_bytes = 0
+        self.retransmissions = 0
+        self.retransmitted_bytes = 0
+        self.gap_start = []
+        self.gap_duration = []
+        # last data packet of the previous chunks: time, raw and unwrapped sequence number, highest byte sent
+        self.last_time = None
+        self.last_seq = None
+        self.last_unwrapped = None
+        self.highest = None
+
+    def feed(self, times, lengths, seq, payload):
+        if not len(times):
+            return
+        times = times - self.t_start
+        self.data_packets += len(times)
+        self.payload_bytes += int(np.sum(payload, dtype=np.int64))
+        self.length_bytes += int(np.sum(lengths, dtype=np.int64))
+
+        previous = times if self.last_time is None else np.concatenate(([self.last_time], times))
+        gap_start, gap_duration = gaps(previous, self.gap_threshold)
+        self.gap_start.extend(gap_start.tolist())
+        self.gap_duration.extend(gap_duration.tolist())
+
+        # sequence numbers unwrapped from the last packet of the previous chunk
+        if self.last_seq is None:
+            unwrapped = unwrap_seq(seq)
+        else:
+            unwrapped = unwrap_seq(np.concatenate(([self.last_seq], seq)).astype(seq.dtype))
+            unwrapped = unwrapped[1:] + (self.last_unwrapped - unwrapped[0])
+        seq_end = unwrapped + payload
+        highest = np.maximum.accumulate(np.concatenate(([unwrapped[0] if self.highest is None else self.highest],
+                                                        seq_end)))
+        retransmitted = unwrapped < highest[:-1]
+        self.retransmissions += int(np.count_nonzero(retransmitted))
+        self.retransmitted_bytes += int(np.sum(payload[retransmitted], dtype=np.int64))
+
+        # packets before the first packet of the capture (timestamps out of order) are not binned
+        index = (times / self.bin_size).astype(np.int64)
+        inside = index >= 0
+        if np.any(inside):
+            bits = np.bincount(index[inside], weights=lengths[inside].astype(np.float64) * 8)
+            if len(bits) > len(self.bits):
+                self.bits = np.pad(self.bits, (0, len(bits) - len(self.bits)))
+            self.bits[:len(bits)] += bits
+
+        self.last_time = float(times[-1])
+        self.last_seq = seq[-1]
+        self.last_unwrapped = int(unwrapped[-1])
+        self.highest = int(highest[-1])
+
+    # (start of each bin, bits per second) up to the last data packet, as throughput(times, lengths, t_start=0)
+    def throughput(self):
+        n_bins = int(np.ceil(self.last_time / self.bin_size)) + 1 if self.last_time is not None else 1
+        bits = np.zeros(n_bins)
+        bits[:min(n_bins, len(self.bits))] = self.bits[:n_bins]
+        return self.bin_size * np.arange(n_bins), bits / self.bin_size
+
+
+# summary of a capture. reconfigurations are in seconds from the first packet of the capture.
+# the file is read twice by chunks, once for the main flow and once for its statistics, so the memory
+# does not grow with the size of the capture
+def analyze_capture(filename, reconfigurations=(), bin_size=BIN_SIZE, gap_threshold=GAP_THRESHOLD,
+                    flow=None, chunk_packets=CHUNK_PACKETS):
+    summary = {'filename': filename, 'packets': 0}
+    t_start = None
+    volumes = {}
+    with PcapReader(filename) as reader:
+        for packets in reader.chunks(chunk_packets):
+            if not len(packets['time']):
+                continue
+            if t_start is None:
+                t_start = packets['time'][0]
+            summary['packets'] += int(len(packets['time']))
+            if flow is None:
+                for key, volume in flow_volumes(packets).items():
+                    volumes[key] = volumes.get(key, 0) + volume
+    if not summary['packets']:
+        return summary
+    flow = max(volumes, key=volumes.get) if flow is None and volumes else flow
+    if flow is None:
+        return summary
+
+    stream = FlowStream(t_start, bin_size, gap_threshold)
+    with PcapReader(filename) as reader:
+        for packets in reader.chunks(chunk_packets):
+            data = flow_mask(packets, flow) & (packets['payload'] > 0)
+            stream.feed(packets['time'][data], packets['length'][data], packets['seq'][data], packets['payload'][data])
+    bins, bps = stream.throughput()
+
+    summary.update({'flow': ip_to_str(flow[0]) + ':' + str(flow[2]) + ' > ' + ip_to_str(flow[1]) + ':' + str(flow[3]),
+                    'start': float(t_start),
+                    'duration': stream.last_time if stream.last_time is not None else 0.0,
+                    'data_packets': stream.data_packets,
+                    'payload_bytes': stream.payload_bytes,
+                    'mean_bps': stream.length_bytes * 8 / stream.last_time
+                    if stream.last_time is not None and stream.last_time > 0 else None,
+                    'retransmissions': stream.retransmissions,
+                    'retransmitted_bytes': stream.retransmitted_bytes,
+                    'gaps': list(zip(stream.gap_start, stream.gap_duration)),
+                    'max_gap': max(stream.gap_duration) if stream.gap_duration else 0.0,
+                    'reconfigurations': [recovery(bins, bps, t_event, bin_size) for t_event in reconfigurations]})
+    return summary
+
+
+# same summary as analyze_capture, from the time series computed on the VM by pcap_remote_summary.
+# the gaps are runs of empty bins of the series, so their resolution is the bin of the series (1 ms).
+def analyze_summary(remote_summary, reconfigurations=(), bin_size=BIN_SIZE, gap_threshold=GAP_THRESHOLD,
+                    filename=''):
+    summary = {'filename': filename, 'packets': int(remote_summary['packets'])}
+    if not remote_summary['flows']:
+        return summary
+    flow = max(remote_summary['flows'], key=lambda f: sum(f['bytes']))
+    series_bin = remote_summary['bin_size']
+    byte_counts = np.array(flow['bytes'], dtype=np.float64)
+    retransmitted = np.array(flow['retransmits'], dtype=np.int64)
+
+    # bins of the analysis made of whole bins of the series
+    factor = max(1, int(round(bin_size / series_bin)))
+    n_bins = -(-len(byte_counts) // factor)
+    padded = np.zeros(n_bins * factor)
+    padded[:len(byte_counts)] = byte_counts
+    bps = padded.reshape(n_bins, factor).sum(axis=1) * 8 / (factor * series_bin)
+    bins = factor * series_bin * np.arange(n_bins)
+
+    # gaps: runs of empty bins between two bins with traffic
+    busy = np.flatnonzero(byte_counts > 0)
+    silence = (np.diff(busy) - 1) * series_bin
+    found = silence > gap_threshold
+    gap_start = (busy[:-1][found] + 1) * series_bin
+
+    summary.update({'flow': ip_to_str(flow['src']) + ':' + str(flow['sport'])
+                    + ' > ' + ip_to_str(flow['dst']) + ':' + str(flow['dport']),
+                    'start': float(remote_summary['t_start']),
+                    'duration': float(len(byte_counts) * series_bin),
+                    'data_packets': int(flow['packets']),
+                    'payload_bytes': None,
+                    'mean_bps': float(np.sum(byte_counts) * 8 / (len(byte_counts) * series_bin)),
+                    'retransmissions': int(np.sum(retransmitted)),
+                    'retransmitted_bytes': None,
+                    'gaps': [(float(start), float(duration)) for start, duration in zip(gap_start, silence[found])],
+                    'max_gap': float(np.max(silence[found])) if np.any(found) else 0.0,
+                    'reconfigurations': [recovery(bins, bps, t_event, factor * series_bin)
+                                         for t_event in reconfigurations]})
+    return summary
+
+
+def print_summary(summary):
+    print(summary['filename'] + ': ' + str(summary['packets']) + ' packets')
+    if 'flow' not in summary:
+        print('  no TCP data')
+        return
+    print('  flow ' + summary['flow'] + ', ' + '{:.3f}'.format(summary['duration']) + ' s, '
+          + str(summary['data_packets']) + ' data packets, '
+          + ('{:.3g}'.format(summary['mean_bps']) if summary['mean_bps'] is not None else '-') + ' bits/s')
+    retransmitted = ''
+    if summary['retransmitted_bytes'] is not None:
+        retransmitted = ' (' + str(summary['retransmitted_bytes']) + ' bytes)'
+    print('  ' + str(summary['retransmissions']) + ' retransmissions' + retransmitted
+          + ', ' + str(len(summary['gaps'])) + ' gaps, longest '
+          + '{:.1f}'.format(summary['max_gap'] * 1e3) + ' ms')
+    for result in summary['reconfigurations']:
+        line = '  reconfiguration at ' + '{:.3f}'.format(result['time']) + ' s: '
+        if result['outage'] is None:
+            line += 'no traffic around it'
+        else:
+            line += 'outage ' + '{:.1f}'.format(result['outage'] * 1e3) + ' ms, recovery '
+            line += '{:.1f}'.format(result['recovery_time'] * 1e3) + ' ms' if result['recovery_time'] is not None \
+                else 'not within the window'
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Throughput, retransmissions, gaps and recovery of a tcpdump capture')
+    parser.add_argument('filenames', nargs='+', help='pcap files, or their summaries (' + SUMMARY_EXTENSION + ')')
+    parser.add_argument('--reconfiguration', type=float, nargs='*', default=[],
+                        help='reconfiguration times, in seconds from the first packet of the capture')
+    parser.add_argument('--bin', type=float, default=BIN_SIZE, help='throughput bin, in seconds')
+    parser.add_argument('--gap', type=float, default=GAP_THRESHOLD, help='minimum gap, in seconds')
+    args = parser.parse_args()
+
+    for filename in args.filenames:
+        if filename.endswith(SUMMARY_EXTENSION):
+            print_summary(analyze_summary(load_summary(filename), reconfigurations=args.reconfiguration,
+                                          bin_size=args.bin, gap_threshold=args.gap, filename=filename))
+        else:
+            print_summary(analyze_capture(filename, reconfigurations=args.reconfiguration,
+                                          bin_size=args.bin, gap_threshold=args.gap))
@@ -0,0 +1,257 @@
+'''
+Summary of a tcpdump capture computed on the VM that wrote it.
+
+This module:
+- reduces a pcap file to a compact binary time series per TCP flow: bytes per bin (1 ms by default)
+  and number of retransmitted packets per bin, compressed with zlib. A 20 s capture of several GB
+  becomes a few tens of kB
+- runs on the VMs: it only uses the Python standard library, and remote_command() sends the module
+  itself through the SSH command line, so nothing has to be installed or copied on the VMs beforehand
+- collect_summaries() runs it on all the VMs at the same time over the existing sessions
+  (VMSessionManager) and pulls back only the summaries, in the output of the command (base64).
+
+The summaries are read back with load_summary, and analyzed with pcap_analysis.analyze_summary.
+
+Known limit: the packets are parsed one by one in pure Python (no numpy on the VMs), a few µs per packet,
+so a capture of several GB (millions of packets) takes tens of seconds of CPU on the VM. A smaller capture
+size (tcpdump -s) makes the file smaller but not the number of packets.
+
+Usage:
+    # on the host, after tcpdump has finished on the VMs
+    summaries = collect_summaries(sessions, {'2': capture_vm2, '1': capture_vm1})
+    # on a VM, by hand
+    python3 pcap_remote_summary.py capture.pcap --output capture.psum
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import base64
+import mmap
+import os
+import shlex
+import struct
+import sys
+import zlib
+from array import array
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# bins of the time series, in seconds
+SUMMARY_BIN = 0.001
+# flows kept in the summary, the ones with the most bytes
+MAX_FLOWS = 4
+SUMMARY_MAGIC = b'PSUM'
+SUMMARY_VERSION = 1
+SUMMARY_EXTENSION = '.psum'
+
+# magic, version, number of flows, time of the first packet (epoch), bin size, packets in the capture
+SUMMARY_HEADER = struct.Struct('<4sHHddQ')
+# src, dst, sport, dport, number of bins, data packets of the flow
+FLOW_HEADER = struct.Struct('<IIHHIQ')
+
+PCAP_MAGIC = {b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+              b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+              b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+              b'\xa1\xb2\x3c\x4d': ('>', 1e-9)}
+# offset of the IP header for each link type: ethernet, raw IP, linux cooked capture
+LINK_HEADER = {1: 14, 101: 0, 113: 16}
+
+
+class FlowSeries:
+    '''
+    Time series of one TCP flow.
+        bytes: bytes on the wire per bin
+        retransmits: retransmitted data packets per bin
+    '''
+
+    def __init__(self):
+        self.bytes = array('I')
+        self.retransmits = array('I')
+        self.packets = 0
+        # sequence numbers without the 32-bit wrap around
+        self.last_seq = None
+        self.seq = 0
+        self.highest = None
+
+    def add(self, index, length, seq, payload):
+        if index >= len(self.bytes):
+            grow = index + 1 - len(self.bytes)
+            self.bytes.extend([0] * grow)
+            self.retransmits.extend([0] * grow)
+        self.bytes[index] += length
+        self.packets += 1
+        if self.last_seq is None:
+            self.seq = seq
+        else:
+            step = (seq - self.last_seq) & 0xffffffff
+            self.seq += step - (1 << 32) if step >= (1 << 31) else step
+        self.last_seq = seq
+        if self.highest is not None and self.seq < self.highest:
+            self.retransmits[index] += 1
+        end = self.seq + payload
+        if self.highest is None or end > self.highest:
+            self.highest = end
+
+
+# time series of the TCP data flows of a pcap file
+def summarize_pcap(filename, bin_size=SUMMARY_BIN):
+    summary = {'t_start': 0.0, 'bin_size': bin_size, 'packets': 0, 'flows': {}}
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < 24:
+            return summary
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if data[:4] not in PCAP_MAGIC:
+                raise ValueError(filename + ' is not a pcap file')
+            byte_order, resolution = PCAP_MAGIC[data[:4]]
+            linktype = struct.unpack_from(byte_order + 'I', data, 20)[0]
+            if linktype not in LINK_HEADER:
+                raise ValueError(filename + ': unsupported link type ' + str(linktype))
+            record_header = struct.Struct(byte_order + 'IIII').unpack_from
+            ip_header = struct.Struct('>BxHxxxxxBxx4s4s').unpack_from
+            tcp_header = struct.Struct('>HHIxxxxB').unpack_from
+            eth_type_at = struct.Struct('>H').unpack_from
+
+            size = len(data)
+            offset = 24
+            t_start = None
+            flows = summary['flows']
+            while offset + 16 <= size:
+                ts_sec, ts_frac, incl_len, orig_len = record_header(data, offset)
+                packet = offset + 16
+                offset = packet + incl_len
+                if offset > size:
+                    break
+                summary['packets'] += 1
+                t = ts_sec + ts_frac * resolution
+                if t_start is None:
+                    t_start = t
+                ip = packet + LINK_HEADER[linktype]
+                if linktype == 1:
+                    eth_type = eth_type_at(data, packet + 12)[0]
+                    if eth_type == 0x8100:
+                        eth_type = eth_type_at(data, packet + 16)[0]
+                        ip += 4
+                    if eth_type != 0x0800:
+                        continue
+                if ip + 20 > offset:
+                    continue
+                version_ihl, ip_total, proto, src, dst = ip_header(data, ip)
+                ihl = (version_ihl & 0x0f) * 4
+                tcp = ip + ihl
+                if version_ihl >> 4 != 4 or proto != 6 or tcp + 13 > offset:
+                    continue
+                sport, dport, seq, data_offset = tcp_header(data, tcp)
+                payload = ip_total - ihl - (data_offset >> 4) * 4
+                if payload <= 0:
+                    continue
+                key = (src, dst, sport, dport)
+                flow = flows.get(key)
+                if flow is None:
+                    flow = flows[key] = FlowSeries()
+                # tcpdump may write a packet with a timestamp slightly before the first one, it goes in the first bin
+                flow.add(max(0, int((t - t_start) / bin_size)), orig_len, seq, payload)
+            summary['t_start'] = t_start if t_start is not None else 0.0
+        finally:
+            data.close()
+    return summary
+
+
+# binary summary, zlib compressed, with the max_flows flows carrying the most bytes
+def pack_summary(summary, max_flows=MAX_FLOWS):
+    flows = sorted(summary['flows'].items(), key=lambda item: -sum(item[1].bytes))[:max_flows]
+    parts = [SUMMARY_HEADER.pack(SUMMARY_MAGIC, SUMMARY_VERSION, len(flows),
+                                 summary['t_start'], summary['bin_size'], summary['packets'])]
+    for (src, dst, sport, dport), flow in flows:
+        parts.append(FLOW_HEADER.pack(struct.unpack('>I', src)[0], struct.unpack('>I', dst)[0],
+                                      sport, dport, len(flow.bytes), flow.packets))
+        for values in (flow.bytes, flow.retransmits):
+            values = array('I', values)
+            if sys.byteorder != 'little':
+                values.byteswap()
+            parts.append(values.tobytes())
+    return zlib.compress(b''.join(parts), 6)
+
+
+# summary from the bytes written by pack_summary:
+# {'t_start', 'bin_size', 'packets', 'flows': [{'src', 'dst', 'sport', 'dport', 'packets', 'bytes', 'retransmits'}]}
+# src and dst are the IPs as integers, bytes and retransmits are arrays of unsigned ints
+def unpack_summary(packed):
+    data = zlib.decompress(packed)
+    magic, version, n_flows, t_start, bin_size, packets = SUMMARY_HEADER.unpack_from(data, 0)
+    if magic != SUMMARY_MAGIC or version != SUMMARY_VERSION:
+        raise ValueError('not a pcap summary')
+    summary = {'t_start': t_start, 'bin_size': bin_size, 'packets': packets, 'flows': []}
+    offset = SUMMARY_HEADER.size
+    for i in range(n_flows):
+        src, dst, sport, dport, n_bins, flow_packets = FLOW_HEADER.unpack_from(data, offset)
+        offset += FLOW_HEADER.size
+        flow = {'src': src, 'dst': dst, 'sport': sport, 'dport': dport, 'packets': flow_packets}
+        for name in ('bytes', 'retransmits'):
+            values = array('I')
+            values.frombytes(data[offset:offset + 4 * n_bins])
+            if sys.byteorder != 'little':
+                values.byteswap()
+            flow[name] = values
+            offset += 4 * n_bins
+        summary['flows'].append(flow)
+    return summary
+
+
+def load_summary(filename):
+    with open(filename, 'rb') as f:
+        return unpack_summary(f.read())
+
+
+# shell command running this module on a VM, the summary of the capture is written base64 encoded to stdout.
+# the source of the module is sent in the command itself, python3 reads it from stdin.
+def remote_command(capture, bin_size=SUMMARY_BIN, python='python3'):
+    with open(os.path.abspath(__file__), 'rb') as f:
+        source = base64.b64encode(zlib.compress(f.read(), 9)).decode('ascii')
+    return 'echo ' + source + ' | base64 -d | ' + python + ' -c ' \
+        + shlex.quote('import sys, zlib; exec(zlib.decompress(sys.stdin.buffer.read()))') \
+        + ' ' + shlex.quote(capture) + ' --bin ' + str(bin_size)
+
+
+# summaries of the captures {vm_id: remote path of the pcap}, computed on all the VMs at the same time.
+# each summary is also written to directory as <name of the capture>.psum. returns {vm_id: summary}
+def collect_summaries(sessions, captures, bin_size=SUMMARY_BIN, directory=''):
+    results = sessions.run({vm_id: remote_command(capture, bin_size) for vm_id, capture in captures.items()})
+    summaries = {}
+    total = 0
+    for vm_id, result in sorted(results.items()):
+        if result['exception'] is not None or result['exit_code'] != 0 or not result['stdout']:
+            print('could not summarize the capture of vm' + vm_id + ': '
+                  + (repr(result['exception']) if result['exception'] is not None else ' | '.join(result['stdout'] or [])))
+            continue
+        packed = base64.b64decode(''.join(result['stdout']))
+        total += len(packed)
+        filename = os.path.join(directory, os.path.basename(captures[vm_id]) + SUMMARY_EXTENSION)
+        with open(filename, 'wb') as f:
+            f.write(packed)
+        summaries[vm_id] = unpack_summary(packed)
+    print('pulled ' + str(len(summaries)) + ' capture summaries, ' + str(total) + ' bytes')
+    return summaries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Binary time series summary of a tcpdump capture')
+    parser.add_argument('filename', help='pcap file')
+    parser.add_argument('--bin', type=float, default=SUMMARY_BIN, help='bin of the time series, in seconds')
+    parser.add_argument('--flows', type=int, default=MAX_FLOWS, help='maximum number of flows kept')
+    parser.add_argument('--output', default='', help='summary file, base64 on stdout if empty')
+    args = parser.parse_args()
+
+    packed = pack_summary(summarize_pcap(args.filename, bin_size=args.bin), max_flows=args.flows)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(packed)
+    else:
+        sys.stdout.write(base64.b64encode(packed).decode('ascii') + '\n')
@@ -0,0 +1,243 @@
+'''
+Planner of the optical (OTS) and OpenFlow make before break reconfiguration.
+
+This module:
+- keeps the measured latencies of a path install (until confirmed on the switches), of a path
+  delete and of the OTS switching (command to acknowledgement), from a measurement before the
+  experiments or from the actions of the previous runs
+- simulates, by Monte Carlo over those latencies, the traffic interruption of the vm2-vm3 flow
+  for a schedule: handoff to the backup path `lead` seconds before the OTS command, and back to
+  the long path `lag` seconds after it
+- searches the lead, lag (and dt for the legacy add/delete handoff) that minimize the expected
+  interruption, a small cost per second spent on the backup path breaking the ties
+- returns the plan as the times of the actions, which experiment_runner.py turns into TimelineActions
+  run by the TimelineScheduler, as any other experiment.
+
+Model, times relative to the OTS command at 0, the long path is down from 0 to the switching time S:
+    atomic handoff (transition): the traffic moves to the new path once it is installed (install latency I)
+    legacy handoff: the new path is added at a lower priority, the old one deleted dt later,
+        the traffic moves when the delete is done (delete latency D), nothing forwards in between
+        if the delete finished before the add.
+The two handoffs only depend on (lead, dt) and (lag, dt) respectively, so they are searched separately.
+dt is searched on a coarse grid first, then refined around the best coarse value.
+
+Usage:
+    profile = LatencyProfile.load('latency_profile.json')
+    plan = plan_reconfiguration(profile, reconfiguration=11.05, mode='atomic')
+    print_plan(plan)
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import argparse
+import json
+import os
+
+import numpy as np
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+LATENCY_KINDS = ('install', 'delete', 'ots')
+PROFILE_FILE = 'latency_profile.json'
+# Monte Carlo draws per schedule
+NUM_DRAWS = 4000
+# step of the grid of lead, lag and dt, in seconds
+GRID_STEP = 0.001
+# cost of one second on the backup path, in seconds of interruption
+BACKUP_WEIGHT = 0.001
+# margin added to the GRID_PERCENTILE of the latencies to bound the grid, in seconds. The grid follows a high
+# percentile instead of the largest sample, one outlier (e.g. an OTS timeout) would make it seconds long
+GRID_MARGIN = 0.01
+GRID_PERCENTILE = 99
+# points of the lead and lag grid at most, the step grows beyond
+MAX_GRID_POINTS = 200
+# points of the coarse dt grid of the legacy mode, the best coarse dt is then refined with the step of the grid
+MAX_DT_POINTS = 20
+MODES = ('atomic', 'legacy')
+
+
+class LatencyProfile:
+    '''
+    Measured latencies in seconds, {kind: [samples]} for the kinds in LATENCY_KINDS:
+        install: path install until confirmed on the switches
+        delete: path delete
+        ots: OTS command until its acknowledgement
+    '''
+
+    def __init__(self, samples=None):
+        self.samples = {kind: [] for kind in LATENCY_KINDS}
+        if samples is not None:
+            for kind, values in samples.items():
+                self.samples[kind].extend(values)
+
+    def add(self, kind, seconds):
+        if seconds is not None:
+            self.samples[kind].append(float(seconds))
+
+    # latencies of the TimelineActions of a run: the timing returned by transition
+    # and the OTS commands (objects with latency())
+    def add_actions(self, actions):
+        for action in actions:
+            result = action.result
+            if isinstance(result, dict) and result.get('confirmed'):
+                self.add('install', result['install'] + result['confirm'])
+                self.add('delete', result['remove'])
+            elif hasattr(result, 'latency'):
+                self.add('ots', result.latency())
+
+    def array(self, kind):
+        return np.array(self.samples[kind], dtype=np.float64)
+
+    def ready(self):
+        return all(self.samples[kind] for kind in LATENCY_KINDS)
+
+    def save(self, filename=PROFILE_FILE):
+        with open(filename, 'w') as f:
+            json.dump(self.samples, f)
+
+    @staticmethod
+    def load(filename=PROFILE_FILE):
+        if not os.path.exists(filename):
+            return LatencyProfile()
+        with open(filename) as f:
+            return LatencyProfile(json.load(f))
+
+
+# measure the latencies: repeats path installs and deletes and OTS commands.
+#   measure_path: function returning (install, delete) in seconds, e.g. measure_route_install
+#   ots_command: function sending a command to the OTS and returning an OtsCommand (with wait and latency)
+def measure_profile(measure_path, ots_command, repeats=20, profile=None):
+    profile = LatencyProfile() if profile is None else profile
+    for i in range(repeats):
+        install, delete = measure_path()
+        profile.add('install', install)
+        profile.add('delete', delete)
+        command = ots_command()
+        command.wait()
+        profile.add('ots', command.latency())
+    return profile
+
+
+class ReconfigurationPlan:
+    '''
+    Times of the actions, in seconds from the start of the experiment.
+        handoff_1: start of the handoff to the backup path
+        ots: OTS command
+        handoff_2: start of the handoff back to the long path
+        dt: legacy mode, delay between the add and the delete of a handoff
+    expected_outage, p95_outage and p_no_outage come from the simulation of the plan.
+    '''
+
+    def __init__(self, mode, reconfiguration, lead, lag, dt, outages):
+        self.mode = mode
+        self.ots = reconfiguration
+        self.lead = lead
+        self.lag = lag
+        self.dt = dt
+        self.handoff_1 = reconfiguration - lead
+        self.handoff_2 = reconfiguration + lag
+        self.expected_outage = float(np.mean(outages))
+        self.p95_outage = float(np.percentile(outages, 95))
+        self.p_no_outage = float(np.mean(outages <= 0))
+
+
+# interruption of the first handoff for each draw, as a function of lead (and dt)
+def first_handoff_outage(lead, dt, install, delete, switching, mode):
+    moved = -lead + install
+    if mode == 'atomic':
+        # on the long path while it is down, until the backup path is installed
+        return np.clip(np.minimum(moved, switching), 0, None)
+    removed = -lead + dt + delete
+    no_path = np.clip(moved - removed, 0, None)
+    on_broken_long = np.clip(np.minimum(removed, switching), 0, None)
+    return no_path + on_broken_long
+
+
+# interruption of the second handoff for each draw, as a function of lag (and dt)
+def second_handoff_outage(lag, dt, install, delete, switching, mode):
+    installed = lag + install
+    if mode == 'atomic':
+        # back on the long path before the switching is over
+        return np.clip(switching - installed, 0, None)
+    removed = lag + dt + delete
+    no_path = np.clip(installed - removed, 0, None)
+    on_long = np.maximum(installed, removed)
+    return no_path + np.clip(switching - on_long, 0, None)
+
+
+# expected interruption over the grid, returns (best value, its outages for each draw)
+def search(outage_function, values, dt, install, delete, switching, mode):
+    best = None
+    for value in values:
+        outages = outage_function(value, dt, install, delete, switching, mode)
+        cost = np.mean(outages) + BACKUP_WEIGHT * value
+        if best is None or cost < best[0]:
+            best = (cost, value, outages)
+    return best
+
+
+# plan minimizing the expected interruption, reconfiguration is the time of the OTS command.
+def plan_reconfiguration(profile, reconfiguration, mode='atomic', num_draws=NUM_DRAWS, step=GRID_STEP, seed=None):
+    if mode not in MODES:
+        raise ValueError('unknown mode ' + str(mode))
+    if not profile.ready():
+        raise ValueError('the latency profile needs samples of ' + ', '.join(LATENCY_KINDS))
+    rng = np.random.default_rng(seed)
+    # bootstrap draws, the same draws for every schedule of the grid
+    draws = {name: rng.choice(profile.array(kind), size=num_draws)
+             for name, kind in (('install_1', 'install'), ('delete_1', 'delete'), ('ots', 'ots'),
+                                ('install_2', 'install'), ('delete_2', 'delete'))}
+
+    longest = max(np.percentile(profile.array(kind), GRID_PERCENTILE) for kind in LATENCY_KINDS)
+    span = 2 * longest + GRID_MARGIN
+    step = max(step, span / MAX_GRID_POINTS)
+    grid = np.arange(0, span, step)
+
+    def evaluate(dts, best=None):
+        for dt in dts:
+            first = search(first_handoff_outage, grid, dt, draws['install_1'], draws['delete_1'], draws['ots'], mode)
+            second = search(second_handoff_outage, grid, dt, draws['install_2'], draws['delete_2'], draws['ots'], mode)
+            cost = first[0] + second[0]
+            if best is None or cost < best[0]:
+                best = (cost, dt, first, second)
+        return best
+
+    if mode == 'legacy':
+        stride = int(np.ceil(len(grid) / MAX_DT_POINTS))
+        best = evaluate(grid[::stride])
+        # the neighbours of the best coarse dt, on the grid
+        best = evaluate(grid[(grid > best[1] - stride * step) & (grid < best[1] + stride * step)], best)
+    else:
+        best = evaluate([0.0])
+    cost, dt, first, second = best
+    return ReconfigurationPlan(mode, reconfiguration, lead=float(first[1]), lag=float(second[1]), dt=float(dt),
+                               outages=first[2] + second[2])
+
+
+def print_plan(plan):
+    print('reconfiguration plan (' + plan.mode + '): handoff to backup at ' + '{:.4f}'.format(plan.handoff_1)
+          + ' s, OTS at ' + '{:.4f}'.format(plan.ots)
+          + ' s, handoff back at ' + '{:.4f}'.format(plan.handoff_2) + ' s'
+          + (', dt ' + '{:.1f}'.format(plan.dt * 1e3) + ' ms' if plan.mode == 'legacy' else ''))
+    print('  expected interruption ' + '{:.2f}'.format(plan.expected_outage * 1e3) + ' ms'
+          + ', p95 ' + '{:.2f}'.format(plan.p95_outage * 1e3) + ' ms'
+          + ', no interruption in ' + '{:.1f}'.format(plan.p_no_outage * 100) + '% of the draws')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Schedule of the OTS and make before break actions')
+    parser.add_argument('--profile', default=PROFILE_FILE, help='JSON file of the measured latencies')
+    parser.add_argument('--reconfiguration', type=float, default=11.05, help='time of the OTS command, in seconds')
+    parser.add_argument('--mode', default='atomic', choices=MODES)
+    parser.add_argument('--draws', type=int, default=NUM_DRAWS)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    print_plan(plan_reconfiguration(LatencyProfile.load(args.profile), args.reconfiguration, mode=args.mode,
+                                    num_draws=args.draws, seed=args.seed))
@@ -22,7 +22,7 @@ import libraries
 import json
 import multiprocessing
 import threading
-import requests
+import shlex
 import socket
 from fabric import Connection  # this library uses threading
 from jumpssh import SSHSession  # this library is blocking
@@ -30,6 +30,14 @@ from pssh.config import HostConfig #This library worked.
 from pssh.clients import ParallelSSHClient
 import pssh.clients
 import datetime
+import time
+from ofctl_client import OfctlClient, flow_payload
+from topology import load_topology, path_rules, TOPOLOGY_FILE
+from flow_reconciler import FlowReconciler
+from flow_index import FlowIndex, PathEntry
+from flow_verification import FlowVerifier
+from bandwidth_steering import BandwidthSteering, Demand
+from iperf_stream import REPORT_INTERVAL
 
 '''
 ====================================
@@ -56,6 +64,16 @@ ADD_FLOW_URI = credentials['add_flow']
 CLEAR_FLOWS_URI = credentials['clear_flow']
 DELETE_FLOWS_URI = credentials['delete_flow']
 
+# persistent (keep-alive) pooled connection to the controller, shared by all the flow methods below
+flow_client = OfctlClient(OFCTL_REST_IP,
+                          add_flow_uri=ADD_FLOW_URI,
+                          delete_flow_uri=DELETE_FLOWS_URI,
+                          clear_flows_uri=CLEAR_FLOWS_URI)
+
+# separate connections and threads for the counters of flow_telemetry.py, so its polling does not queue
+# in front of the flow rules of the handoffs. It still loads the controller, see flow_telemetry.py
+telemetry_client = OfctlClient(OFCTL_REST_IP, pool_size=8)
+
 # datapath ID of virtual bridges in pica8 switch
 DPID_BR1 = int(credentials['dpid'][0])
 DPID_BR2 = int(credentials['dpid'][1])
@@ -66,6 +84,9 @@ DPID_BR4 = int(credentials['dpid'][3])
 gateway_credentials = credentials['gateway_credentials']
 vm_credentials = credentials['vm_credentials']
 
+# topology of the experiment: bridges, links and hosts. Paths are compiled from it (see topology.py)
+TOPOLOGY = load_topology(credentials.get('topology_file', TOPOLOGY_FILE), dpids=credentials['dpid'])
+
 # tcpdump directory
 #TCP_TEST_DIRECTORY = credentials['tcpdump_file_datapath'],
 TCP_TEST_DIRECTORY = "Desktop/pcap_files/"
@@ -182,16 +203,36 @@ def connect_to_vms_pssh(gateway_credentials=gateway_credentials, vm_credentials=
     return gateway_session, vm_session
 
 
+# iperf client command
+def iperf_c_command(t=IPERF_TIME, b='', ip_s='10.0.0.4'):
+    cmd = 'iperf3 -c ' + ip_s + ' -t ' + str(t)
+    if b != '':
+        cmd += ' -b ' + str(b)
+    return cmd
+
+
+# iperf client command with the per-interval reports flushed as they happen, read live by iperf_stream.py
+def iperf_stream_command(t=IPERF_TIME, b='', ip_s='10.0.0.4', interval=REPORT_INTERVAL, json_stream=True):
+    cmd = iperf_c_command(t=t, b=b, ip_s=ip_s) + ' -i ' + str(interval)
+    if json_stream:
+        cmd += ' --json-stream'
+    else:
+        cmd += ' --forceflush'
+    return cmd
+
+
+# iperf server command, the server exits after one test
+def iperf_s_command():
+    return 'iperf3 -s -1'
+
+
 # run iperf client
 def iperf_c(vm, t=IPERF_TIME, b='', ip_s='10.0.0.4'):
     #output = vm.run_command('hostname')
     print('running iperf client')
     #for line in output[0].stdout:
     #    print(line)
-    cmd = 'iperf3 -c ' + ip_s + ' -t ' + str(t)
-    if b != '':
-        cmd += ' -b ' + str(b)
-    vm.run_command(cmd)
+    vm.run_command(iperf_c_command(t=t, b=b, ip_s=ip_s))
     print('---done---')
     return None
 
@@ -202,7 +243,7 @@ def iperf_s(vm):
     print('running iperf server')
     #for line in output[0].stdout:
     #    print(line)
-    vm.run_command('iperf3 -s -1')
+    vm.run_command(iperf_s_command())
     print('---done---')
     return None
 
@@ -215,6 +256,38 @@ def hostname(vm):
     print('---done---')
     return None
 
+# tcpdump command, returns the command and the path of the capture file on the vm
+# filename structure: 'bandwidth)endpoints)test_type)mm_dd_yyyy-hh-mm-ss.pcap'
+# https://www.programiz.com/python-programming/datetime/strftime
+def tcpdump_command(endpoints,
+                    test_type='single',
+                    directory=TCP_TEST_DIRECTORY,
+                    t=IPERF_TIME+3,
+                    bw=BW_IPERF,
+                    vm_nic='enp2s0',
+                    capture_size=96):
+    filename = bw + ")"+endpoints + ")" + test_type + ")"+datetime.datetime.now().strftime("%m_%d_%Y-%H_%M_%S")+'.pcap'
+    command='timeout ' + str(t)
+    command+= ' tcpdump -i ' + vm_nic
+    command+= ' -s '+ str(capture_size)
+    # the path is quoted, the ')' of the filename is a shell metacharacter
+    command+= ' -w ' + shlex.quote(directory + filename)
+    return command, directory + filename
+
+
+# capture command run in the background of the shell, its PID written next to the capture, so that only
+# this capture is stopped at the end of the run (stop_capture_command). The shell waits for it, the command
+# still ends with the capture
+def background_capture_command(command, capture):
+    return command + ' & echo $! > ' + shlex.quote(capture + '.pid') + '; wait $!'
+
+
+# SIGINT to the capture started by background_capture_command: timeout passes it to tcpdump, which writes the
+# end of the capture and exits
+def stop_capture_command(capture):
+    pid_file = shlex.quote(capture + '.pid')
+    return 'kill -INT $(cat ' + pid_file + '); rm -f ' + pid_file
+
 # run tcpdump
 # https://parallel-ssh.readthedocs.io/en/latest/advanced.html?highlight=sudo#run-with-sudo
 def tcpdump_vm(vm, endpoints,
@@ -229,20 +302,13 @@ def tcpdump_vm(vm, endpoints,
     print('running tcpdump')
     #for line in output[0].stdout:
     #    print(line)
-    # filename structure: 'bandwidth)endpoints)test_type)mm_dd_yyyy-hh-mm-ss.pcap'
-    # https://www.programiz.com/python-programming/datetime/strftime
-
-    filename = bw + ")"+endpoints + ")" + test_type + ")"+datetime.datetime.now().strftime("%m_%d_%Y-%H_%M_%S")+'.pcap'
-    command='timeout ' + str(t)
-    command+= ' tcpdump -i ' + vm_nic
-    command+= ' -s '+ str(capture_size)
-    command+= ' -w ' + directory
-    command+= filename
+    command, capture_file = tcpdump_command(endpoints, test_type=test_type, directory=directory,
+                                            t=t, bw=bw, vm_nic=vm_nic, capture_size=capture_size)
     print(command)
     #out = vm.run_command(command)
     vm.run_command(command)
     print('---done---')
-    return None
+    return capture_file
 
 '''
 ===========================================
@@ -250,76 +316,206 @@ Section 2: HTTP requests to the OFCTL_REST.py app of the Ryu controller
 on controller1 server
 ===========================================
 '''
-# this method helps to create the payload required to add a flow.
+# this method helps to create the payload required to add or delete a flow.
+# the payload is JSON (bytes) built from a cached template, see ofctl_client.flow_payload
 def ofctl_flow_payload(dpid, action,
                        in_port, out_port,
                        ip_src, ip_dst, priority=10):
+    return flow_payload(dpid=dpid, action=action,
+                        in_port=in_port, out_port=out_port,
+                        ip_src=ip_src, ip_dst=ip_dst, priority=priority)
+
+
+# index of the installed rules by match, priority allocator and paths installed by path ID (see flow_index.py)
+flow_index = FlowIndex()
+
+# shadow of the flow tables of the bridges, updated by every flow method below (see flow_reconciler.py)
+flow_reconciler = FlowReconciler(flow_client, ofctl_flow_payload, index=flow_index)
+
+# checks on the switches that the rules posted to the controller are installed (see flow_verification.py)
+flow_verifier = FlowVerifier(flow_client)
+
+# paths and priorities of the host pairs steered over the trunks (see bandwidth_steering.py),
+# e.g. bandwidth_steering.steer([Demand('vm1', 'vm4', 4e9), Demand('vm2', 'vm3', 6e9)])
+bandwidth_steering = BandwidthSteering(TOPOLOGY, flow_client, flow_reconciler, ofctl_flow_payload,
+                                       verifier=flow_verifier)
+
+
+'''
+Paths between the virtual machines, as lists of hops (dpid, in_port, out_port), compiled from the topology file.
+in_port and out_port are given in the direction ip_src -> ip_dst, the reverse flow swaps them.
+'''
+PATH_VM1_VM4_TRUNK1 = TOPOLOGY.path('vm1', 'vm4', 'trunk1')
+PATH_VM1_VM4_TRUNK2 = TOPOLOGY.path('vm1', 'vm4', 'trunk2')
+PATH_VM2_VM3_LONG = TOPOLOGY.path('vm2', 'vm3', 'long')
+PATH_VM2_VM3_LONG_BACKUP = TOPOLOGY.path('vm2', 'vm3', 'long_backup')
+PATH_VM2_VM3_SHORT = TOPOLOGY.path('vm2', 'vm3', 'short')
+
+
+# add or delete a set of flow rules (see topology.FlowRule) with the same priority.
+# All the rules are posted concurrently, returns once all of them are acknowledged by the controller.
+def edit_flow_rules(rules, action='ADD', priority=1):
+    rules = list(rules)
+    payloads = [ofctl_flow_payload(action=action, dpid=rule.dpid,
+                                   in_port=rule.in_port, out_port=rule.out_port,
+                                   ip_src=rule.ip_src, ip_dst=rule.ip_dst, priority=priority)
+                for rule in rules]
     if action == 'ADD':
-        type_str_begin = '"instructions": [{"type": "APPLY_ACTIONS",'
-        type_str_end = '}] '
-        output_match = ''
-    elif action == 'DELETE':
-        type_str_begin = ''
-        type_str_end = ''
-        output_match = '"out_port": ' + str(out_port) + ','  # this field is not a valid match field, so should remove.
-
-    payload = '{"dpid":' + str(dpid) + ',\
-                "table_id": 0,\
-                "priority": ' + str(priority) + ',\
-                "match":{\
-                    "in_port":' + str(in_port) + ',' \
-              + output_match + \
-              '"dl_type":0x0800,\
-              "nw_src":"' + ip_src + '",\
-                    "nw_dst":"' + ip_dst + '" \
-                },' + type_str_begin + '\
-                        "actions": [\
-                            {\
-                                "port": ' + str(out_port) + ',\
-                                "type": "OUTPUT"\
-                            }\
-                        ]' \
-              + type_str_end + \
-              '}'
-
-    # r = requests.post(url=OFCTL_REST_IP+ADD_FLOW_URI, data=payload)
-    return payload
+        responses = flow_client.add_flows(payloads)
+    else:
+        responses = flow_client.delete_flows(payloads)
+    failed = [r.status_code for r in responses if r.status_code != 200]
+    if failed:
+        print(str(len(failed)) + ' of ' + str(len(responses)) + ' ' + str(action)
+              + ' requests refused by the controller: ' + str(sorted(set(failed))))
+    flow_reconciler.record(rules, action, priority, responses)
+    return responses
+
+
+# add or delete the forward and reverse flows of every hop of a path.
+def edit_path_flows(path, ip_src, ip_dst, action='ADD', priority=1):
+    responses = edit_flow_rules(path_rules(path, ip_src, ip_dst), action=action, priority=priority)
+    print(str(action) + ' flows on bridges ' + ', '.join(str(hop[0]) for hop in path)
+          + ' for ips ' + str(ip_src) + ', ' + str(ip_dst)
+          + ' with priority ' + str(priority))
+    return responses
+
+
+# add or delete the flows of a path of the topology between two hosts, e.g. ('vm2', 'vm3', 'long').
+# the rules of the path are compiled once and cached by the topology.
+def edit_route_flows(src, dst, path_name='shortest', action='ADD', priority=1):
+    responses = edit_flow_rules(TOPOLOGY.rules(src, dst, path_name), action=action, priority=priority)
+    print(str(action) + ' flows of path ' + path_name + ' between ' + src + ' and ' + dst
+          + ' with priority ' + str(priority))
+    return responses
+
+
+# True once every rule is in the flow table reported by its bridge, with its output port.
+# one flow statistics request per bridge, all of them sent concurrently.
+def flows_installed(rules, priority):
+    expected = [(rule, priority) for rule in rules]
+    missing, counters = flow_verifier.check(expected, flow_verifier.snapshot({rule.dpid for rule in rules}))
+    return not missing
+
+
+# poll the bridges until every rule is installed, with an adaptive interval (see flow_verification.py).
+# require_traffic: also wait for packets on every rule. returns False after timeout seconds
+def wait_flows_installed(rules, priority, timeout=1.0, require_traffic=False):
+    return flow_verifier.wait_rules(rules, priority, timeout=timeout, require_traffic=require_traffic).confirmed
+
+
+# time to install and confirm a path of the topology, then to delete it, in seconds.
+# used to measure the latencies of the controller and switches, with a priority below the one in use
+# so the traffic is not affected. returns (install, delete), install is None if it was not confirmed
+def measure_route_install(src, dst, path_name, priority=1, confirm_timeout=1.0):
+    rules = TOPOLOGY.rules(src, dst, path_name)
+    start = time.monotonic()
+    edit_flow_rules(rules, action='ADD', priority=priority)
+    confirmed = wait_flows_installed(rules, priority, timeout=confirm_timeout)
+    installed = time.monotonic()
+    edit_flow_rules(rules, action='DELETE', priority=priority)
+    deleted = time.monotonic()
+    return (installed - start if confirmed else None), deleted - installed
+
+
+# make before break between two paths (lists of hops) between ip_src and ip_dst:
+#   1. install the new path with a higher priority than the old one, the traffic moves to it
+#   2. confirm on the switches that the new rules are installed
+#   3. remove the old path
+# if the new path is not confirmed within confirm_timeout seconds, the old path is kept.
+# returns the duration in seconds of each phase.
+def transition(old_path, new_path, ip_src, ip_dst, old_priority, new_priority=None, confirm_timeout=1.0):
+    if new_priority is None:
+        new_priority = old_priority + 1
+    new_rules = path_rules(new_path, ip_src, ip_dst)
+    timing = {'install': None, 'confirm': None, 'remove': None, 'total': None, 'confirmed': False}
+
+    start = time.monotonic()
+    edit_flow_rules(new_rules, action='ADD', priority=new_priority)
+    installed = time.monotonic()
+    timing['install'] = installed - start
+
+    timing['confirmed'] = wait_flows_installed(new_rules, new_priority, timeout=confirm_timeout)
+    confirmed = time.monotonic()
+    timing['confirm'] = confirmed - installed
+
+    if timing['confirmed']:
+        edit_flow_rules(path_rules(old_path, ip_src, ip_dst), action='DELETE', priority=old_priority)
+        timing['remove'] = time.monotonic() - confirmed
+    else:
+        print('new path not confirmed after ' + str(confirm_timeout) + ' s, keeping the old path')
+    timing['total'] = time.monotonic() - start
+
+    print('transition for ips ' + str(ip_src) + ', ' + str(ip_dst)
+          + ' from priority ' + str(old_priority) + ' to ' + str(new_priority)
+          + ': install ' + '{:.2f}'.format(timing['install'] * 1e3) + ' ms'
+          + ', confirm ' + '{:.2f}'.format(timing['confirm'] * 1e3) + ' ms'
+          + ', total ' + '{:.2f}'.format(timing['total'] * 1e3) + ' ms')
+    return timing
+
+
+# transition between two paths of the topology, e.g. transition_route('vm2', 'vm3', 'long', 'long_backup', 8)
+def transition_route(src, dst, old_path_name, new_path_name, old_priority, new_priority=None, confirm_timeout=1.0):
+    return transition(TOPOLOGY.path(src, dst, old_path_name), TOPOLOGY.path(src, dst, new_path_name),
+                      ip_src=TOPOLOGY.ip(src), ip_dst=TOPOLOGY.ip(dst),
+                      old_priority=old_priority, new_priority=new_priority,
+                      confirm_timeout=confirm_timeout)
+
+
+# entry of the flow index for a path of the topology installed with a priority
+def path_entry(src, dst, path_name, priority):
+    rules = TOPOLOGY.rules(src, dst, path_name)
+    payloads = [ofctl_flow_payload(action='DELETE', dpid=rule.dpid,
+                                   in_port=rule.in_port, out_port=rule.out_port,
+                                   ip_src=rule.ip_src, ip_dst=rule.ip_dst, priority=priority)
+                for rule in rules]
+    return PathEntry(src, dst, path_name, priority, rules, payloads)
+
+
+# install a path of the topology under a path ID, e.g. install_path('vm2-vm3', 'vm2', 'vm3', 'long').
+# the priority is allocated above the rules already installed for the same matches, unless given.
+# returns the priority
+def install_path(path_id, src, dst, path_name='shortest', priority=None):
+    rules = TOPOLOGY.rules(src, dst, path_name)
+    if priority is None:
+        priority = flow_index.priority_above(rules)
+    edit_flow_rules(rules, action='ADD', priority=priority)
+    flow_index.register_path(path_id, path_entry(src, dst, path_name, priority))
+    print('installed path ' + str(path_id) + ' (' + path_name + ' between ' + src + ' and ' + dst
+          + ') with priority ' + str(priority))
+    return priority
+
+
+# delete the path installed under a path ID, with the payloads built when it was installed
+def delete_path(path_id):
+    entry = flow_index.pop_path(path_id)
+    responses = flow_client.delete_flows(entry.delete_payloads)
+    flow_reconciler.record(entry.rules, 'DELETE', entry.priority, responses)
+    print('deleted path ' + str(path_id) + ' with priority ' + str(entry.priority))
+    return responses
+
+
+# make before break of the path installed under a path ID to another path between the same hosts,
+# e.g. transition_path('vm2-vm3', 'long_backup'). The new path gets a priority above the old path and
+# above the rules already installed for its matches. returns the timing of transition
+def transition_path(path_id, new_path_name, confirm_timeout=1.0):
+    entry = flow_index.path(path_id)
+    new_priority = max(entry.priority + 1,
+                       flow_index.priority_above(TOPOLOGY.rules(entry.src, entry.dst, new_path_name)))
+    timing = transition_route(entry.src, entry.dst, entry.path_name, new_path_name,
+                              old_priority=entry.priority, new_priority=new_priority,
+                              confirm_timeout=confirm_timeout)
+    if timing['confirmed']:
+        flow_index.register_path(path_id, path_entry(entry.src, entry.dst, new_path_name, new_priority))
+    return timing
 
 
 # TEMPORARY METHOD TO ADD THE FLOWS FOR VM1 TO VM4 through TRUNK1 (higher priority) and TRUNK2 (lower priority),
 def add_flows_vm1_vm4():
-    # Add flows for bridge 0:
-    # Trunk1:
-    flow1_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR1, in_port=1, out_port=5, ip_src='10.0.0.1',
-                                       ip_dst='10.0.0.4', priority=10)
-    flow2_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR1, in_port=5, out_port=1, ip_src='10.0.0.4',
-                                       ip_dst='10.0.0.1', priority=10)
-    # Trunk2:
-    flow3_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR1, in_port=1, out_port=7, ip_src='10.0.0.1',
-                                       ip_dst='10.0.0.4', priority=5)
-    flow4_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR1, in_port=7, out_port=1, ip_src='10.0.0.4',
-                                       ip_dst='10.0.0.1', priority=5)
-
-    # Add flows for bridge 1:
     # Trunk1:
-    flow5_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR4, in_port=6, out_port=4, ip_src='10.0.0.1',
-                                       ip_dst='10.0.0.4', priority=10)
-    flow6_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR4, in_port=4, out_port=6, ip_src='10.0.0.4',
-                                       ip_dst='10.0.0.1', priority=10)
+    r = edit_path_flows(PATH_VM1_VM4_TRUNK1, ip_src='10.0.0.1', ip_dst='10.0.0.4', action='ADD', priority=10)
     # Trunk2:
-    flow7_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR4, in_port=8, out_port=4, ip_src='10.0.0.1',
-                                       ip_dst='10.0.0.4', priority=5)
-    flow8_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR4, in_port=4, out_port=8, ip_src='10.0.0.4',
-                                       ip_dst='10.0.0.1', priority=5)
-    # Now add all the flows
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow1_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow2_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow3_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow4_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow5_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow6_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow7_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow8_payload)
+    r = edit_path_flows(PATH_VM1_VM4_TRUNK2, ip_src='10.0.0.1', ip_dst='10.0.0.4', action='ADD', priority=5)
     print('adding flows')
     return None
 
@@ -337,25 +533,33 @@ def add_flows_vm1_vm4_v2():
 
 # clear flows per bridge
 def del_all_flows(dpid):
-    r = requests.delete(url=OFCTL_REST_IP + CLEAR_FLOWS_URI + str(dpid))
+    r = flow_reconciler.clear(dpid)
     return None
 
+
+# bring the bridges to the given paths [(src, dst, path name, priority)], e.g. [('vm2', 'vm3', 'long', 8)].
+# Only the difference with the current flow tables is sent. Bridges not listed in dpids are not touched,
+# all the bridges of the topology by default. Each path is registered in the flow index under the path ID
+# '<src>-<dst>', e.g. 'vm2-vm3', for delete_path and transition_path.
+def reconcile_flows(routes, dpids=None):
+    if dpids is None:
+        dpids = list(TOPOLOGY.bridges.values())
+    target = [(rule, priority)
+              for src, dst, path_name, priority in routes
+              for rule in TOPOLOGY.rules(src, dst, path_name)]
+    result = flow_reconciler.reconcile(target, dpids=dpids)
+    flow_index.forget_paths()
+    for src, dst, path_name, priority in routes:
+        flow_index.register_path(src + '-' + dst, path_entry(src, dst, path_name, priority))
+    # the steered pairs start from these paths, the flows of the other pairs were removed
+    bandwidth_steering.adopt(routes, replace=True)
+    return result
+
 # TEMPORARY METHOD TO DELETE THE FLOWS FOR VM1 TO VM4 BETWEEN TRUNK1
 # must use delete_strict URI to consider deleting flows matching priority.
 def del_flows_trunk1(priority=10):
-    flow1_payload = ofctl_flow_payload(dpid=DPID_BR1, in_port=1, out_port=5, ip_src='10.0.0.1', ip_dst='10.0.0.4',
-                                       action='DELETE', priority=priority)
-    flow2_payload = ofctl_flow_payload(dpid=DPID_BR1, in_port=5, out_port=1, ip_src='10.0.0.4', ip_dst='10.0.0.1',
-                                       action='DELETE', priority=priority)
-    flow3_payload = ofctl_flow_payload(dpid=DPID_BR4, in_port=6, out_port=4, ip_src='10.0.0.1', ip_dst='10.0.0.4',
-                                       action='DELETE', priority=priority)
-    flow4_payload = ofctl_flow_payload(dpid=DPID_BR4, in_port=4, out_port=6, ip_src='10.0.0.4', ip_dst='10.0.0.1',
-                                       action='DELETE', priority=priority)
-
-    r = requests.post(url=OFCTL_REST_IP + DELETE_FLOWS_URI, data=flow1_payload)
-    r = requests.post(url=OFCTL_REST_IP + DELETE_FLOWS_URI, data=flow2_payload)
-    r = requests.post(url=OFCTL_REST_IP + DELETE_FLOWS_URI, data=flow3_payload)
-    r = requests.post(url=OFCTL_REST_IP + DELETE_FLOWS_URI, data=flow4_payload)
+    r = edit_path_flows(PATH_VM1_VM4_TRUNK1, ip_src='10.0.0.1', ip_dst='10.0.0.4',
+                        action='DELETE', priority=priority)
     print('removing flows trunk1  with priority ' + str(priority))
     return
 
@@ -363,143 +567,53 @@ def del_flows_trunk1(priority=10):
 # TEMPORARY METHOD TO DELETE THE FLOWS FOR VM1 TO VM4 BETWEEN TRUNK2
 # must use delete_strict URI to consider deleting flows matching priority.
 def del_flows_trunk2(priority=7):
-    flow1_payload = ofctl_flow_payload(dpid=DPID_BR1, in_port=1, out_port=7, ip_src='10.0.0.1', ip_dst='10.0.0.4',
-                                       action='DELETE', priority=priority)
-    flow2_payload = ofctl_flow_payload(dpid=DPID_BR1, in_port=7, out_port=1, ip_src='10.0.0.4', ip_dst='10.0.0.1',
-                                       action='DELETE', priority=priority)
-    flow3_payload = ofctl_flow_payload(dpid=DPID_BR4, in_port=8, out_port=4, ip_src='10.0.0.1', ip_dst='10.0.0.4',
-                                       action='DELETE', priority=priority)
-    flow4_payload = ofctl_flow_payload(dpid=DPID_BR4, in_port=4, out_port=8, ip_src='10.0.0.4', ip_dst='10.0.0.1',
-                                       action='DELETE', priority=priority)
-
-    r = requests.post(url=OFCTL_REST_IP + DELETE_FLOWS_URI, data=flow1_payload)
-    r = requests.post(url=OFCTL_REST_IP + DELETE_FLOWS_URI, data=flow2_payload)
-    r = requests.post(url=OFCTL_REST_IP + DELETE_FLOWS_URI, data=flow3_payload)
-    r = requests.post(url=OFCTL_REST_IP + DELETE_FLOWS_URI, data=flow4_payload)
+    r = edit_path_flows(PATH_VM1_VM4_TRUNK2, ip_src='10.0.0.1', ip_dst='10.0.0.4',
+                        action='DELETE', priority=priority)
     print('removing flows trunk2 with priority ' + str(priority))
     return
 
 # TEMPORARY METHOD TO ADD THE FLOWS FOR VM1 TO VM4 BETWEEN TRUNK1 ONLY
 # must use delete_strict URI to consider deleting flows matching priority.
 def add_flows_trunk1(priority=3):
-    # Add flows for bridge 0:
-    # Trunk1:
-    flow1_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR1, in_port=1, out_port=5, ip_src='10.0.0.1',
-                                       ip_dst='10.0.0.4', priority=priority)
-    flow2_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR1, in_port=5, out_port=1, ip_src='10.0.0.4',
-                                       ip_dst='10.0.0.1', priority=priority)
-
-    # Add flows for bridge 1:
-    # Trunk1:
-    flow5_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR4, in_port=6, out_port=4, ip_src='10.0.0.1',
-                                       ip_dst='10.0.0.4', priority=priority)
-    flow6_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR4, in_port=4, out_port=6, ip_src='10.0.0.4',
-                                       ip_dst='10.0.0.1', priority=priority)
-
-    # Now add all the flows
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow1_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow2_payload)
-
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow5_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow6_payload)
-
+    r = edit_path_flows(PATH_VM1_VM4_TRUNK1, ip_src='10.0.0.1', ip_dst='10.0.0.4',
+                        action='ADD', priority=priority)
     print('adding flows')
     return None
 
 def add_flows_trunk2(priority=5):
-    # Add flows for bridge 0:
-    # Trunk1:
-    flow1_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR1, in_port=1, out_port=7, ip_src='10.0.0.1',
-                                       ip_dst='10.0.0.4', priority=priority)
-    flow2_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR1, in_port=7, out_port=1, ip_src='10.0.0.4',
-                                       ip_dst='10.0.0.1', priority=priority)
-
-    # Add flows for bridge 1:
-    # Trunk1:
-    flow5_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR4, in_port=8, out_port=4, ip_src='10.0.0.1',
-                                       ip_dst='10.0.0.4', priority=priority)
-    flow6_payload = ofctl_flow_payload(action='ADD', dpid=DPID_BR4, in_port=4, out_port=8, ip_src='10.0.0.4',
-                                       ip_dst='10.0.0.1', priority=priority)
-
-    # Now add all the flows
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow1_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow2_payload)
-
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow5_payload)
-    r = requests.post(url=OFCTL_REST_IP + ADD_FLOW_URI, data=flow6_payload)
-
+    r = edit_path_flows(PATH_VM1_VM4_TRUNK2, ip_src='10.0.0.1', ip_dst='10.0.0.4',
+                        action='ADD', priority=priority)
     print('adding flows trunk 2 with priority ' + str(priority))
     return None
 
 def edit_bidirectional_flows(dpid,in_port,out_port,ip_src,ip_dst,action='ADD',priority=1):
-    forward_flow_payload = ofctl_flow_payload(action=action, dpid=dpid,
-                                              in_port=in_port, out_port=out_port,
-                                              ip_src=ip_src,ip_dst=ip_dst, priority=priority)
-
-    reverse_flow_payload = ofctl_flow_payload(action=action, dpid=dpid,
-                                              in_port=out_port, out_port=in_port,
-                                              ip_src=ip_dst, ip_dst=ip_src, priority=priority)
-
-    # Now add all the flows
-    if action == 'ADD':
-        URI = ADD_FLOW_URI
-    else:
-        URI = DELETE_FLOWS_URI
-    r = requests.post(url=OFCTL_REST_IP + URI, data=forward_flow_payload)
-    r = requests.post(url=OFCTL_REST_IP + URI, data=reverse_flow_payload)
+    # the forward and reverse flows are posted concurrently
+    edit_flow_rules(path_rules([(dpid, in_port, out_port)], ip_src, ip_dst), action=action, priority=priority)
     print(str(action)+' flows on bridge '+str(dpid) + " for ips@ports "
           + str(ip_src)+'@'+ str(in_port) + ', '
           + str(ip_dst)+'@'+ str(out_port)
           + ' with priority ' + str(priority))
     return None
 
+# the flows of all the bridges of the path are edited at once
 def edit_flows_vm1_vm4_short_path(action='ADD',priority=9):
-    # edit flows for bridge 1:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR1, in_port=1, out_port=5,
-                             ip_src='10.0.0.1', ip_dst='10.0.0.4', priority=priority)
-    # edit flows for bridge 4:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR4, in_port=6, out_port=4,
-                             ip_src='10.0.0.1', ip_dst='10.0.0.4', priority=priority)
+    edit_path_flows(PATH_VM1_VM4_TRUNK1, ip_src='10.0.0.1', ip_dst='10.0.0.4',
+                    action=action, priority=priority)
     return None
 
 def edit_flows_vm2_vm3_long_path(action='ADD',priority=8):
-    # edit flows for bridge 2:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR2, in_port=2, out_port=22,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
-    # edit flows for bridge 3:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR3, in_port=23, out_port=3,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
-    # edit flows for bridge 1:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR1, in_port=21, out_port=5,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
-    # edit flows for bridge 4:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR4, in_port=6, out_port=24,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
-
+    edit_path_flows(PATH_VM2_VM3_LONG, ip_src='10.0.0.2', ip_dst='10.0.0.3',
+                    action=action, priority=priority)
     return None
 
 def edit_flows_vm2_vm3_long_path_backup(action='ADD',priority=10):
-    # edit flows for bridge 2:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR2, in_port=2, out_port=10,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
-    # edit flows for bridge 3:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR3, in_port=12, out_port=3,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
-    # edit flows for bridge 1:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR1, in_port=9, out_port=5,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
-    # edit flows for bridge 4:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR4, in_port=6, out_port=11,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
+    edit_path_flows(PATH_VM2_VM3_LONG_BACKUP, ip_src='10.0.0.2', ip_dst='10.0.0.3',
+                    action=action, priority=priority)
     return None
 
 def edit_flows_vm2_vm3_short_path(action='ADD', priority=6):
-    # Add flows for bridge 2:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR2, in_port=2, out_port=7,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
-    # Add flows for bridge 3:
-    edit_bidirectional_flows(action=action, dpid=DPID_BR3, in_port=8, out_port=3,
-                             ip_src='10.0.0.2', ip_dst='10.0.0.3', priority=priority)
+    edit_path_flows(PATH_VM2_VM3_SHORT, ip_src='10.0.0.2', ip_dst='10.0.0.3',
+                    action=action, priority=priority)
     return None
 
 '''
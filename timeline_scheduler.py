@@ -0,0 +1,150 @@
+'''
+Deadline-driven scheduler for the reconfiguration actions of an experiment.
+
+This module:
+- takes a timeline of actions (flow add/delete, OTS connect, ...) keyed by their offset,
+  in seconds, from the start of the experiment
+- runs all of them from a single asyncio event loop against the monotonic clock,
+  instead of one threading.Timer (one OS thread) per action
+- records the planned and actual firing time of each action, so the jitter is measured.
+
+The actions are blocking calls (HTTP, sockets), so the loop only decides when they fire
+and hands them to a worker thread, a slow action does not delay the next one.
+
+Usage:
+    scheduler = TimelineScheduler([TimelineAction(11 - dt, edit_flows_vm2_vm3_long_path_backup, args=('ADD', 6)),
+                                   TimelineAction(11, edit_flows_vm2_vm3_long_path, args=('DELETE', 8))])
+    scheduler.start()
+    scheduler.join()
+    scheduler.print_report()
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# the loop sleeps until SPIN_TIME before the deadline, then spins on the clock for the last part,
+# giving the loop back at every turn (asyncio.sleep(0)).
+# asyncio.sleep alone wakes up 1-2 ms late.
+SPIN_TIME = 0.002
+MAX_WORKERS = 8
+
+
+class TimelineAction:
+    '''
+    One action of the timeline.
+        offset: seconds from the start of the experiment
+        function, args, kwargs: the call to make
+        name: label for the report, the function name by default
+    After the run, planned, fired and finished hold the times relative to the start of the experiment.
+    '''
+
+    def __init__(self, offset, function, args=(), kwargs=None, name=''):
+        self.offset = offset
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.name = name if name else function.__name__
+        self.planned = offset
+        self.fired = None
+        self.finished = None
+        self.result = None
+        self.error = None
+
+    # how late the action was fired, in seconds
+    def lateness(self):
+        if self.fired is None:
+            return None
+        return self.fired - self.planned
+
+
+class TimelineScheduler:
+    def __init__(self, actions, spin_time=SPIN_TIME, max_workers=MAX_WORKERS):
+        self.actions = sorted(actions, key=lambda action: action.offset)
+        self.spin_time = spin_time
+        self.max_workers = max_workers
+        # start of the experiment, in time.monotonic() seconds
+        self.t0 = None
+        self.thread = None
+
+    def add(self, offset, function, args=(), kwargs=None, name=''):
+        action = TimelineAction(offset, function, args=args, kwargs=kwargs, name=name)
+        self.actions.append(action)
+        self.actions.sort(key=lambda a: a.offset)
+        return action
+
+    async def wait_until(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining > self.spin_time:
+            await asyncio.sleep(remaining - self.spin_time)
+        # yield to the loop at every turn of the spin, so the other actions due in the same window still fire
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0)
+
+    async def run_action(self, action, executor):
+        loop = asyncio.get_running_loop()
+        await self.wait_until(self.t0 + action.offset)
+        action.fired = time.monotonic() - self.t0
+        try:
+            action.result = await loop.run_in_executor(executor,
+                                                       lambda: action.function(*action.args, **action.kwargs))
+        except Exception as e:
+            action.error = e
+            print('action ' + action.name + ' failed: ' + str(e))
+        action.finished = time.monotonic() - self.t0
+
+    async def run_timeline(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            await asyncio.gather(*[self.run_action(action, executor) for action in self.actions])
+
+    # run the timeline and block until every action has finished.
+    # t0 is the start of the experiment in time.monotonic() seconds, now by default.
+    def run(self, t0=None):
+        self.t0 = time.monotonic() if t0 is None else t0
+        asyncio.run(self.run_timeline())
+        return self.actions
+
+    # run the timeline in a background thread, same as starting the threading timers.
+    def start(self, t0=None):
+        self.t0 = time.monotonic() if t0 is None else t0
+        self.thread = threading.Thread(target=self.run, args=(self.t0,), daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    # planned and actual times of each action, relative to the start of the experiment
+    def report(self):
+        return [{'name': action.name,
+                 'planned': action.planned,
+                 'fired': action.fired,
+                 'finished': action.finished,
+                 'lateness': action.lateness(),
+                 'error': None if action.error is None else str(action.error)}
+                for action in self.actions]
+
+    def print_report(self):
+        for row in self.report():
+            if row['fired'] is None:
+                print(row['name'] + ': planned ' + '{:.4f}'.format(row['planned']) + ' s, not fired')
+                continue
+            print(row['name'] + ': planned ' + '{:.4f}'.format(row['planned'])
+                  + ' s, fired ' + '{:.4f}'.format(row['fired'])
+                  + ' s (late ' + '{:.3f}'.format(row['lateness'] * 1e3) + ' ms)'
+                  + ', finished ' + '{:.4f}'.format(row['finished']) + ' s')
@@ -0,0 +1,208 @@
+'''
+Declarative description of the experiment topology.
+
+This module:
+- loads a topology file (bridges, links with their ports, hosts with their IPs), see topology.json
+- builds the graph of bridges in memory and precomputes, for every pair of hosts,
+  the shortest path, a backup path (disjoint from the shortest one when possible)
+  and the named paths listed in the file
+- compiles the flow rules of a path once and caches them, so a reroute is a dictionary lookup.
+
+A path is returned as a list of hops (dpid, in_port, out_port), given in the direction
+src -> dst, which is the format used by edit_path_flows in ssh_flow_management.py.
+
+topology file:
+    bridges:  {name: {"dpid": DPID} or {"dpid_index": index in credentials['dpid']}}
+    hosts:    {name: {"ip": IP, "bridge": bridge name, "port": bridge port of the host}}
+    links:    [{"name": name, "a": [bridge, port], "b": [bridge, port], "type": "electrical" or "optical",
+                "capacity": bits per second (optional)}]
+    paths:    {"src-dst": {path name: [link names from src to dst]}}
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import json
+from collections import namedtuple
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+TOPOLOGY_FILE = 'topology.json'
+
+# one OpenFlow rule: traffic from ip_src to ip_dst entering dpid on in_port goes out through out_port
+FlowRule = namedtuple('FlowRule', ['dpid', 'in_port', 'out_port', 'ip_src', 'ip_dst'])
+
+Host = namedtuple('Host', ['name', 'ip', 'bridge', 'port'])
+# capacity in bits per second, None when not given in the topology file
+Link = namedtuple('Link', ['name', 'bridge_a', 'port_a', 'bridge_b', 'port_b', 'type', 'capacity'],
+                  defaults=(None,))
+
+
+# forward and reverse rules of every hop of a path
+def path_rules(path, ip_src, ip_dst):
+    rules = []
+    for dpid, in_port, out_port in path:
+        rules.append(FlowRule(dpid, in_port, out_port, ip_src, ip_dst))
+        rules.append(FlowRule(dpid, out_port, in_port, ip_dst, ip_src))
+    return tuple(rules)
+
+
+class Topology:
+    def __init__(self, bridges, hosts, links, named_paths=None):
+        # {bridge name: dpid}
+        self.bridges = bridges
+        # {host name: Host}
+        self.hosts = hosts
+        # {link name: Link}
+        self.links = links
+        # {(src, dst): {path name: [link names]}}
+        self.named_paths = named_paths if named_paths is not None else {}
+
+        # adjacency list of the bridges: {bridge: [(link name, neighbour bridge)]}
+        self.adjacency = {bridge: [] for bridge in bridges}
+        for link in links.values():
+            self.adjacency[link.bridge_a].append((link.name, link.bridge_b))
+            self.adjacency[link.bridge_b].append((link.name, link.bridge_a))
+
+        # precomputed paths, as link names: {(src, dst): {path name: [link names]}}
+        self.routes = {}
+        # compiled hops and rules: {(src, dst, path name): ...}
+        self.hops_cache = {}
+        self.rules_cache = {}
+        for src in hosts:
+            for dst in hosts:
+                if src != dst:
+                    self.routes[(src, dst)] = self.compute_routes(src, dst)
+
+    # all the simple paths between two bridges, as lists of link names, shortest first
+    def bridge_paths(self, bridge_src, bridge_dst, max_paths=None):
+        paths = []
+        stack = [(bridge_src, [], {bridge_src})]
+        while stack:
+            bridge, links, visited = stack.pop()
+            if bridge == bridge_dst:
+                paths.append(links)
+                continue
+            for link_name, neighbour in self.adjacency[bridge]:
+                if neighbour not in visited:
+                    stack.append((neighbour, links + [link_name], visited | {neighbour}))
+        paths.sort(key=lambda links: (len(links), links))
+        if max_paths is not None:
+            return paths[:max_paths]
+        return paths
+
+    def host_paths(self, src, dst, max_paths=None):
+        return self.bridge_paths(self.hosts[src].bridge, self.hosts[dst].bridge, max_paths=max_paths)
+
+    def compute_routes(self, src, dst):
+        routes = {}
+        candidates = self.host_paths(src, dst)
+        if candidates:
+            shortest = candidates[0]
+            routes['shortest'] = shortest
+            # backup: the shortest path sharing the fewest links with the shortest one
+            others = candidates[1:]
+            if others:
+                routes['backup'] = min(others, key=lambda links: len(set(links) & set(shortest)))
+        # named paths are given from src to dst, the reverse direction reverses the links
+        for name, links in self.named_paths.get((src, dst), {}).items():
+            routes[name] = list(links)
+        for name, links in self.named_paths.get((dst, src), {}).items():
+            routes[name] = list(reversed(links))
+        return routes
+
+    # path names available between two hosts
+    def path_names(self, src, dst):
+        return list(self.routes[(src, dst)].keys())
+
+    # register a path (list of link names) between two hosts under a name, returns the name of the
+    # already registered path with the same links if there is one
+    def add_route(self, src, dst, name, links):
+        routes = self.routes[(src, dst)]
+        for existing, existing_links in routes.items():
+            if list(existing_links) == list(links):
+                return existing
+        routes[name] = list(links)
+        return name
+
+    # list of hops (dpid, in_port, out_port) from src to dst for a list of link names
+    def links_to_hops(self, src, dst, links):
+        hops = []
+        bridge = self.hosts[src].bridge
+        in_port = self.hosts[src].port
+        for link_name in links:
+            link = self.links[link_name]
+            if link.bridge_a == bridge:
+                out_port, next_bridge, next_in_port = link.port_a, link.bridge_b, link.port_b
+            elif link.bridge_b == bridge:
+                out_port, next_bridge, next_in_port = link.port_b, link.bridge_a, link.port_a
+            else:
+                raise ValueError('link ' + link_name + ' is not connected to bridge ' + bridge)
+            hops.append((self.bridges[bridge], in_port, out_port))
+            bridge, in_port = next_bridge, next_in_port
+        if bridge != self.hosts[dst].bridge:
+            raise ValueError('path from ' + src + ' does not end on the bridge of ' + dst)
+        hops.append((self.bridges[bridge], in_port, self.hosts[dst].port))
+        return hops
+
+    # hops of a precomputed path, compiled once
+    def path(self, src, dst, name='shortest'):
+        key = (src, dst, name)
+        if key not in self.hops_cache:
+            routes = self.routes[(src, dst)]
+            if name not in routes:
+                raise KeyError('no path ' + name + ' between ' + src + ' and ' + dst)
+            self.hops_cache[key] = self.links_to_hops(src, dst, routes[name])
+        return self.hops_cache[key]
+
+    # forward and reverse flow rules of a precomputed path, compiled once
+    def rules(self, src, dst, name='shortest'):
+        key = (src, dst, name)
+        if key not in self.rules_cache:
+            self.rules_cache[key] = path_rules(self.path(src, dst, name), self.hosts[src].ip, self.hosts[dst].ip)
+        return self.rules_cache[key]
+
+    def ip(self, host):
+        return self.hosts[host].ip
+
+
+# load the topology file. dpids is the list credentials['dpid'], used by the bridges given by dpid_index
+def load_topology(filename=TOPOLOGY_FILE, dpids=None):
+    with open(filename) as f:
+        description = json.load(f)
+
+    bridges = {}
+    for name, bridge in description['bridges'].items():
+        if 'dpid' in bridge:
+            bridges[name] = int(bridge['dpid'])
+        elif dpids is not None:
+            bridges[name] = int(dpids[bridge['dpid_index']])
+        else:
+            raise ValueError('bridge ' + name + ' uses dpid_index but no dpid list was given')
+
+    hosts = {}
+    for name, host in description['hosts'].items():
+        if host['bridge'] not in bridges:
+            raise ValueError('host ' + name + ' is connected to unknown bridge ' + host['bridge'])
+        hosts[name] = Host(name, host['ip'], host['bridge'], int(host['port']))
+
+    links = {}
+    for link in description['links']:
+        for end in (link['a'], link['b']):
+            if end[0] not in bridges:
+                raise ValueError('link ' + link['name'] + ' is connected to unknown bridge ' + end[0])
+        links[link['name']] = Link(link['name'], link['a'][0], int(link['a'][1]),
+                                   link['b'][0], int(link['b'][1]), link.get('type', 'electrical'),
+                                   float(link['capacity']) if 'capacity' in link else None)
+
+    named_paths = {}
+    for pair, paths in description.get('paths', {}).items():
+        src, dst = pair.split('-')
+        named_paths[(src, dst)] = paths
+
+    return Topology(bridges, hosts, links, named_paths)
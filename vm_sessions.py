@@ -0,0 +1,240 @@
+'''
+SSH sessions to all the experiment VMs through a single parallel-ssh client.
+
+This module:
+- builds one multi-host ParallelSSHClient for all the VMs, each host with its own
+  credentials and proxy (the gateway, i.e. host server, of the VM)
+- runs a command, or a different command per VM, on any subset of the VMs in one parallel call
+- returns the per-VM results (stdout, exit code) and timings in one structure.
+- opens and authenticates all the gateway and VM sessions concurrently at startup, keeps them
+  alive with SSH keepalives, and before each experiment run checks them (VMs and gateways) and
+  reconnects only the dead ones, so the first real command of every run does not pay the connection time.
+
+connect_to_vms_pssh in ssh_flow_management.py creates one single-host client per VM,
+so commands were issued one VM at a time.
+
+Usage:
+    sessions = VMSessionManager(gateway_credentials, vm_credentials)
+    sessions.connect()
+    sessions.ensure_alive()
+    results = sessions.run('hostname')
+    sessions.run({'2': tcpdump_cmd_vm2, '1': tcpdump_cmd_vm1}, wait=False)
+'''
+
+'''
+====================================
+import libraries
+====================================
+'''
+import time
+
+import gevent
+from pssh.clients import ParallelSSHClient
+from pssh.config import HostConfig
+from pssh.exceptions import Timeout
+
+'''
+====================================
+DEFINITIONS
+====================================
+'''
+# command run on the VMs that are not part of a call, a single client always runs on all its hosts
+NOOP_COMMAND = 'true'
+
+# interval of the SSH keepalive messages, in seconds
+KEEPALIVE_SECONDS = 10
+# a session that does not answer the health check within this time, in seconds, is reconnected
+HEALTH_CHECK_TIMEOUT = 5
+
+
+class VMSessionManager:
+    '''
+    One parallel SSH client for all the VMs.
+        gateway_credentials: {ID: [IP, username, password]}
+        vm_credentials: {ID: [IP, username, password, Gateway ID]}
+    VMs are referred to by their ID in vm_credentials, e.g. '1'.
+    '''
+
+    def __init__(self, gateway_credentials, vm_credentials, timeout=None, keepalive_seconds=KEEPALIVE_SECONDS):
+        self.gateway_credentials = gateway_credentials
+        self.vm_credentials = vm_credentials
+        self.vm_ids = list(vm_credentials.keys())
+        self.gateway_ids = list(gateway_credentials.keys())
+        self.timeout = timeout
+        self.keepalive_seconds = keepalive_seconds
+        self.client = self.make_client()
+        self.gateway_client = self.make_gateway_client()
+        # outputs of the calls that did not wait, kept so the channels of the commands still running are not closed
+        self.pending = []
+
+    # per-host configuration: credentials of the VM and of its gateway as proxy.
+    # the alias is the VM ID, it identifies the output of each VM (two VMs may share an IP)
+    def host_config(self, vm_id):
+        vm = self.vm_credentials[vm_id]
+        gateway = self.gateway_credentials[str(vm[3])]
+        return HostConfig(user=vm[1],
+                          password=vm[2],
+                          alias=vm_id,
+                          timeout=self.timeout,
+                          keepalive_seconds=self.keepalive_seconds,
+                          proxy_host=gateway[0],
+                          proxy_user=gateway[1],
+                          proxy_password=gateway[2])
+
+    def make_client(self):
+        return ParallelSSHClient(hosts=[self.vm_credentials[vm_id][0] for vm_id in self.vm_ids],
+                                 host_config=[self.host_config(vm_id) for vm_id in self.vm_ids])
+
+    # sessions to the gateways (host servers) themselves
+    def make_gateway_client(self):
+        return ParallelSSHClient(hosts=[self.gateway_credentials[gw_id][0] for gw_id in self.gateway_ids],
+                                 host_config=[HostConfig(user=self.gateway_credentials[gw_id][1],
+                                                         password=self.gateway_credentials[gw_id][2],
+                                                         alias=gw_id,
+                                                         timeout=self.timeout,
+                                                         keepalive_seconds=self.keepalive_seconds)
+                                              for gw_id in self.gateway_ids])
+
+    # open and authenticate the sessions to all the gateways and VMs at the same time.
+    # returns {'vm': {vm_id: error}, 'gateway': {gw_id: error}}, error is None for the sessions that are up.
+    def connect(self):
+        start = time.monotonic()
+        vm_greenlets = self.client.connect_auth()
+        gateway_greenlets = self.gateway_client.connect_auth()
+        gevent.joinall(vm_greenlets + gateway_greenlets, timeout=self.timeout)
+        status = {'vm': {vm_id: greenlet.exception for vm_id, greenlet in zip(self.vm_ids, vm_greenlets)},
+                  'gateway': {gw_id: greenlet.exception for gw_id, greenlet in zip(self.gateway_ids, gateway_greenlets)}}
+        for kind in ('gateway', 'vm'):
+            for host_id, error in status[kind].items():
+                if error is not None:
+                    print('could not connect to ' + kind + ' ' + host_id + ': ' + repr(error))
+        print('connected to gateways and vms in ' + '{:.1f}'.format((time.monotonic() - start) * 1e3) + ' ms')
+        return status
+
+    # run a no-op on every host of a client, returns the IDs (aliases) of the hosts whose session is dead or
+    # did not answer in time
+    @staticmethod
+    def dead_hosts(client, timeout=HEALTH_CHECK_TIMEOUT):
+        output = client.run_command(NOOP_COMMAND, stop_on_errors=False)
+        try:
+            client.join(output, timeout=timeout)
+        except Timeout:
+            pass
+        dead = []
+        for host_output in output:
+            if host_output.exception is not None \
+                    or not host_output.client.finished(host_output.channel) \
+                    or host_output.exit_code != 0:
+                dead.append(host_output.alias)
+        return dead
+
+    # IDs of the dead sessions, {'vm': [vm_id], 'gateway': [gw_id]}, the VMs and the gateways are checked together
+    def check_health(self, timeout=HEALTH_CHECK_TIMEOUT):
+        checks = {'vm': gevent.spawn(self.dead_hosts, self.client, timeout),
+                  'gateway': gevent.spawn(self.dead_hosts, self.gateway_client, timeout)}
+        gevent.joinall(list(checks.values()))
+        return {kind: greenlet.get() for kind, greenlet in checks.items()}
+
+    # drop the sessions of the given hosts of a client and open them again, the other sessions are not touched.
+    # pssh drops the session of every host whose entry changes when the hosts of the client are assigned,
+    # so the dead hosts are taken out of the list and put back, then connect_auth opens their sessions again
+    # with the same configuration (host_config). The old sessions are closed when they are garbage collected.
+    # returns {host_id: error}, error is None for the sessions that are up again
+    def reopen(self, client, host_ids, dead_ids):
+        hosts = list(client.hosts)
+        client.hosts = ['' if host_id in dead_ids else host for host_id, host in zip(host_ids, hosts)]
+        client.hosts = hosts
+        greenlets = client.connect_auth()
+        gevent.joinall(greenlets, timeout=self.timeout)
+        return {host_id: greenlet.exception for host_id, greenlet in zip(host_ids, greenlets) if host_id in dead_ids}
+
+    # reopen the sessions of the given VMs and gateways, returns {'vm': {vm_id: error}, 'gateway': {gw_id: error}}
+    def reconnect(self, vm_ids=(), gateway_ids=()):
+        status = {'vm': {}, 'gateway': {}}
+        if gateway_ids:
+            status['gateway'] = self.reopen(self.gateway_client, self.gateway_ids, gateway_ids)
+        if vm_ids:
+            status['vm'] = self.reopen(self.client, self.vm_ids, vm_ids)
+        for kind in ('gateway', 'vm'):
+            for host_id, error in status[kind].items():
+                if error is not None:
+                    print('could not reconnect to ' + kind + ' ' + host_id + ': ' + repr(error))
+        return status
+
+    # check the sessions of the VMs and of the gateways before an experiment run and reconnect the dead ones.
+    # returns {'vm': [vm_id], 'gateway': [gw_id]} of the sessions found dead
+    def ensure_alive(self, timeout=HEALTH_CHECK_TIMEOUT):
+        start = time.monotonic()
+        dead = self.check_health(timeout=timeout)
+        if dead['gateway']:
+            print('reconnecting to gateways ' + ', '.join(dead['gateway']))
+        if dead['vm']:
+            print('reconnecting to vms ' + ', '.join(dead['vm']))
+        if dead['gateway'] or dead['vm']:
+            self.reconnect(vm_ids=dead['vm'], gateway_ids=dead['gateway'])
+        print('checked ssh sessions in ' + '{:.1f}'.format((time.monotonic() - start) * 1e3) + ' ms')
+        return dead
+
+    # wait without blocking the SSH event loop, so keepalives are sent and pending outputs are read.
+    # time.sleep would block the sessions for the whole wait.
+    @staticmethod
+    def idle(seconds):
+        gevent.sleep(seconds)
+
+    # commands: a string run on vm_ids (all the VMs by default), or {vm_id: command}.
+    # wait=False returns as soon as the commands are started, e.g. for iperf and tcpdump.
+    # returns {vm_id: {'host', 'command', 'started', 'finished', 'exit_code', 'stdout', 'exception', 'output'}},
+    # times in seconds from the beginning of the call.
+    def run(self, commands, vm_ids=None, wait=True):
+        if isinstance(commands, str):
+            commands = {vm_id: commands for vm_id in (vm_ids if vm_ids is not None else self.vm_ids)}
+        host_args = [(commands.get(vm_id, NOOP_COMMAND),) for vm_id in self.vm_ids]
+
+        start = time.monotonic()
+        output = self.client.run_command('%s', host_args=host_args, stop_on_errors=False)
+        started = time.monotonic() - start
+
+        results = {}
+        for host_output in output:
+            vm_id = host_output.alias
+            if vm_id not in commands:
+                continue
+            results[vm_id] = {'host': host_output.host,
+                              'command': commands[vm_id],
+                              'started': started,
+                              'finished': None,
+                              'exit_code': None,
+                              'stdout': None,
+                              'exception': host_output.exception,
+                              'output': host_output}
+        if not wait:
+            self.pending.append(output)
+        else:
+            for vm_id, result in results.items():
+                host_output = result['output']
+                if host_output.exception is None:
+                    result['stdout'] = list(host_output.stdout)
+                    host_output.client.wait_finished(host_output)
+                    result['exit_code'] = host_output.exit_code
+                result['finished'] = time.monotonic() - start
+        return results
+
+    # wait for the commands started with wait=False to finish, e.g. tcpdump at the end of a run
+    def wait_pending(self, timeout=None):
+        for output in self.pending:
+            self.client.join(output, timeout=timeout)
+        self.pending = []
+
+    # print the results of a call, one line per VM
+    @staticmethod
+    def print_results(results):
+        for vm_id, result in sorted(results.items()):
+            line = 'vm' + vm_id + ' (' + result['host'] + ')'
+            if result['exception'] is not None:
+                line += ' failed: ' + repr(result['exception'])
+            else:
+                if result['stdout']:
+                    line += ': ' + ' | '.join(result['stdout'])
+                if result['finished'] is not None:
+                    line += ' [' + '{:.1f}'.format(result['finished'] * 1e3) + ' ms]'
+            print(line)